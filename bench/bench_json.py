@@ -0,0 +1,85 @@
+import json
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from fastapi.encoders import jsonable_encoder
+
+import fastjson
+import replay
+from bench import make_cassette
+from sources import altenar, superbet
+from sources.base import USER_TZ
+
+LIVE_KEY = replay.request_key(altenar.LIVE_API)
+SUPERBET_KEY = replay.request_key(superbet.SUPERBET_HISTORY_API.format("", ""))
+
+CASSETTE = Path(os.getenv("UPSTREAM_CASSETTE", make_cassette.DEFAULT_PATH))
+
+
+def bodies(cassette, key: str):
+    return [e["body"].encode("utf-8") for e in cassette.entries if e["key"] == key]
+
+
+def per_call_ms(fn, items, rounds: int) -> float:
+    elapsed = timeit.timeit(lambda: [fn(b) for b in items], number=rounds)
+    return elapsed / (len(items) * rounds) * 1000
+
+
+def history_page(size: int = 30):
+    now = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+    return [{
+        "event_id": f"sb-{9_000_000 + i}", "league_mapped": "BATTLE - 8 MIN", "duration": "4x4 min",
+        "home_raw": "Spain (Nikkitta)", "away_raw": "France (KRaken)", "home_nick": "Nikkitta",
+        "away_nick": "KRaken", "home_score_ht": 1, "away_score_ht": 0, "home_score_ft": 3, "away_score_ft": 2,
+        "started_at": (now - timedelta(minutes=15 + i)).astimezone(USER_TZ),
+        "finished_at": (now - timedelta(minutes=i)).astimezone(USER_TZ), "source": "superbet_api",
+    } for i in range(size)]
+
+
+def render_before(docs) -> bytes:
+    # Caminho anterior: isoformat no Python + jsonable_encoder + JSONResponse (json da stdlib)
+    results = [{**d, "finished_at": d["finished_at"].isoformat(), "started_at": d["started_at"].isoformat()}
+               for d in docs]
+    content = jsonable_encoder({"results": results, "page": 1, "total": 2000, "next_cursor": None})
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def render_after(docs) -> bytes:
+    return fastjson.dumps({"results": docs, "page": 1, "total": 2000, "next_cursor": None})
+
+
+def main(rounds: int = 20) -> int:
+    if not fastjson.ORJSON_AVAILABLE:
+        print("orjson não instalado: fastjson usa o json da stdlib, nada a comparar")
+        return 0
+    if not CASSETTE.exists() and CASSETTE == make_cassette.DEFAULT_PATH:
+        make_cassette.write(CASSETTE)
+    cassette = replay.Cassette.load(CASSETTE)
+
+    import orjson
+    print(f"Cassete: {CASSETTE}")
+    for label, items in (("GetLiveEvents", bodies(cassette, LIVE_KEY)),
+                         ("Superbet by-date", bodies(cassette, SUPERBET_KEY))):
+        if not items:
+            continue
+        size_kb = sum(len(b) for b in items) / len(items) / 1024
+        std_ms = per_call_ms(json.loads, items, rounds)
+        fast_ms = per_call_ms(orjson.loads, items, rounds)
+        print(f"{label:>18} ({size_kb:6.1f} KB): stdlib {std_ms:7.3f} ms/tick | orjson {fast_ms:7.3f} ms/tick "
+              f"| economia {std_ms - fast_ms:7.3f} ms/tick")
+
+    page = history_page()
+    assert json.loads(render_before(page)) == json.loads(render_after(page))
+    calls = 2000
+    before_us = timeit.timeit(lambda: render_before(page), number=calls) / calls * 1e6
+    after_us = timeit.timeit(lambda: render_after(page), number=calls) / calls * 1e6
+    print(f"{'/api/history (30)':>18}: antes {before_us:7.1f} µs/req | orjson {after_us:7.1f} µs/req "
+          f"| economia {before_us - after_us:7.1f} µs/req")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
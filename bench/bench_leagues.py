@@ -0,0 +1,51 @@
+import sys
+import timeit
+from pathlib import Path
+
+import leagues
+from bench import legacy
+
+CORPUS = Path(__file__).parent / "data" / "league_names.txt"
+
+
+def load_corpus():
+    pairs = []
+    for line in CORPUS.read_text(encoding="utf-8").splitlines():
+        if line.strip():
+            name, _, duration = line.partition("|")
+            pairs.append((name, duration or "8 min"))
+    return pairs
+
+
+def check_parity(pairs) -> int:
+    mismatches = 0
+    for name, duration in pairs:
+        old = legacy.map_league_name(name, duration)
+        new = leagues.map_league_name(name, duration)
+        if old != new:
+            mismatches += 1
+            print(f"❌ {name!r} ({duration}): antigo={old!r} novo={new!r}")
+    return mismatches
+
+
+def main(rounds: int = 500):
+    pairs = load_corpus()
+    mismatches = check_parity(pairs)
+    print(f"Paridade: {len(pairs) - mismatches}/{len(pairs)} ligas iguais")
+
+    legacy_s = timeit.timeit(
+        lambda: [legacy.map_league_name(n, d) for n, d in pairs], number=rounds)
+    rules_s = timeit.timeit(
+        lambda: [leagues._apply_rules(n, d) for n, d in pairs], number=rounds)
+    memo_s = timeit.timeit(
+        lambda: [leagues.map_league_name(n, d) for n, d in pairs], number=rounds)
+
+    calls = len(pairs) * rounds
+    for label, elapsed in (("antigo", legacy_s), ("tabela (sem memo)", rules_s), ("tabela (memo)", memo_s)):
+        print(f"{label:>20}: {elapsed / calls * 1e6:8.2f} µs/liga")
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+import sys
+import timeit
+from pathlib import Path
+
+from bench import legacy
+from nicks import _canonical, extract_pure_nick_canonical
+
+CORPUS = Path(__file__).parent / "data" / "raw_names.txt"
+
+
+def load_corpus():
+    return [line.rstrip("\n") for line in CORPUS.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+
+def check_parity(names) -> int:
+    mismatches = 0
+    for name in names:
+        old = legacy.extract_pure_nick_canonical(name)
+        new = extract_pure_nick_canonical(name)
+        if old != new:
+            mismatches += 1
+            print(f"❌ {name!r}: antigo={old!r} novo={new!r}")
+    return mismatches
+
+
+def main(rounds: int = 200):
+    names = load_corpus()
+    mismatches = check_parity(names)
+    print(f"Paridade: {len(names) - mismatches}/{len(names)} nomes iguais")
+
+    legacy_s = timeit.timeit(
+        lambda: [legacy.extract_pure_nick_canonical(n) for n in names], number=rounds)
+
+    def cold():
+        _canonical.cache_clear()
+        for n in names:
+            extract_pure_nick_canonical(n)
+    cold_s = timeit.timeit(cold, number=rounds)
+
+    warm_s = timeit.timeit(
+        lambda: [extract_pure_nick_canonical(n) for n in names], number=rounds)
+
+    calls = len(names) * rounds
+    for label, elapsed in (("antigo", legacy_s), ("compilado (sem cache)", cold_s), ("compilado (memo)", warm_s)):
+        print(f"{label:>24}: {elapsed / calls * 1e6:8.2f} µs/nome")
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
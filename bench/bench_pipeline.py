@@ -0,0 +1,166 @@
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import timeit
+from pathlib import Path
+
+# Tudo offline: MongoDB em memória; precisa vir antes do import do main
+os.environ.setdefault("MONGO_URI", "mongomock://")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import leagues  # noqa: E402
+import main  # noqa: E402
+import nicks  # noqa: E402
+import replay  # noqa: E402
+from bench import make_cassette  # noqa: E402
+from caches import LiveCache  # noqa: E402
+from sources import altenar, superbet  # noqa: E402
+
+# UPSTREAM_CASSETTE=... usa uma gravação real (UPSTREAM_MODE=record); senão gera o sintético
+CASSETTE = Path(os.getenv("UPSTREAM_CASSETTE", make_cassette.DEFAULT_PATH))
+
+
+def reset_live_state() -> None:
+    main.altenar.live_fingerprints = {}
+    main.altenar.live_rows.clear()
+    main.altenar.live_cache = LiveCache(max_entries=altenar.LIVE_CACHE_MAX, ttl_seconds=altenar.LIVE_CACHE_TTL)
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct), len(ordered) - 1)]
+
+
+def live_bodies(cassette):
+    key = replay.request_key(altenar.LIVE_API)
+    return [e for e in cassette.entries if e["key"] == key]
+
+
+def bench_ingest(cassette, rounds: int = 5) -> None:
+    # Só o diff do feed (ingest_live_events), com o JSON já decodificado
+    polls = [json.loads(e["body"]) for e in live_bodies(cassette)]
+    events = sum(len(p.get("events", [])) for p in polls)
+    best = float("inf")
+    for _ in range(rounds):
+        reset_live_state()
+        t0 = time.perf_counter()
+        for data in polls:
+            main.altenar.ingest_live_events(data)
+        best = min(best, time.perf_counter() - t0)
+    print(f"Ingestão live: {events} eventos em {len(polls)} polls -> "
+          f"{events / best:,.0f} eventos/s ({best / len(polls) * 1000:.2f} ms/poll)")
+
+
+async def bench_detection(cassette) -> None:
+    # Poll -> detecção por desaparecimento -> resolver (details/tracker) -> bulk_write no Mongo em memória
+    reset_live_state()
+    cassette.rewind()
+    detected: dict = {}
+    latencies = []
+
+    def on_flush(batch):
+        now = time.perf_counter()
+        for doc in batch:
+            started = detected.pop(doc["event_id"], None)
+            if started is not None:
+                latencies.append(now - started)
+
+    main.match_writer.listeners.append(on_flush)
+    tasks = [asyncio.create_task(worker()) for _, worker in main.altenar.workers()]
+    tasks.append(asyncio.create_task(main.pipeline.run()))
+
+    # Intervalo gravado entre o último poll com o evento e o poll que notou o sumiço
+    recorded = live_bodies(cassette)
+    polls = len(recorded)
+    t0 = time.perf_counter()
+    for _ in range(polls):
+        changes = await main.altenar.poll_live()
+        now = time.perf_counter()
+        for event_id in changes.removed:
+            detected[event_id] = now
+        await asyncio.sleep(0)
+    await main.altenar.finished_queue.join()
+    await main.pipeline.drain()
+    await main.match_writer.flush()
+    elapsed = time.perf_counter() - t0
+
+    for task in tasks:
+        task.cancel()
+    main.match_writer.listeners.remove(on_flush)
+
+    gaps = [b["t"] - a["t"] for a, b in zip(recorded, recorded[1:])]
+    print(f"Pipeline Altenar: {polls} polls em {elapsed:.2f}s ({polls / elapsed:,.0f} polls/s)")
+    if latencies:
+        print(f"Detecção -> gravado ({len(latencies)} jogos): média {statistics.mean(latencies) * 1000:.1f} ms, "
+              f"p50 {percentile(latencies, 0.5) * 1000:.1f} ms, p95 {percentile(latencies, 0.95) * 1000:.1f} ms, "
+              f"máx {max(latencies) * 1000:.1f} ms")
+    if gaps:
+        print(f"Intervalo entre polls gravado: média {statistics.mean(gaps):.1f}s (soma-se à latência acima)")
+
+
+async def bench_superbet(cassette) -> None:
+    cassette.rewind()
+    await main.superbet.refresh_struct()
+    key = replay.request_key(superbet.SUPERBET_HISTORY_API.format("", ""))
+    polls = sum(1 for e in cassette.entries if e["key"] == key)
+    events = saved = 0
+    pipeline_task = asyncio.create_task(main.pipeline.run())
+    t0 = time.perf_counter()
+    for entry in (e for e in cassette.entries if e["key"] == key):
+        events += entry["body"].count('"eventId"')
+        saved += await main.superbet.poll_history()
+    elapsed = time.perf_counter() - t0
+    pipeline_task.cancel()
+    print(f"Histórico Superbet: {events} eventos em {polls} polls -> {events / elapsed:,.0f} eventos/s "
+          f"({saved} novos gravados)")
+
+
+def bench_functions(rounds: int = 200) -> None:
+    names = sorted({name for entry in main.altenar.live_rows.values() for name in (entry["home_raw"], entry["away_raw"])}
+                   | set(make_cassette.NAMES.read_text(encoding="utf-8").split("\n")) - {""})
+    pairs = [(name, "8 min") for name in make_cassette.LIVE_LEAGUES] + \
+            [(name, f"{d} min") for _, name, d in make_cassette.SUPERBET_TOURNAMENTS]
+
+    def cold_nicks():
+        nicks._canonical.cache_clear()
+        for n in names:
+            nicks.extract_pure_nick_canonical(n)
+
+    def cold_leagues():
+        leagues._memo.clear()
+        for n, d in pairs:
+            leagues.map_league_name(n, d)
+
+    rows = (
+        ("extract_pure_nick_canonical (frio)", timeit.timeit(cold_nicks, number=rounds), len(names)),
+        ("extract_pure_nick_canonical (memo)", timeit.timeit(
+            lambda: [nicks.extract_pure_nick_canonical(n) for n in names], number=rounds), len(names)),
+        ("map_league_name (frio)", timeit.timeit(cold_leagues, number=rounds), len(pairs)),
+        ("map_league_name (memo)", timeit.timeit(
+            lambda: [leagues.map_league_name(n, d) for n, d in pairs], number=rounds), len(pairs)),
+    )
+    for label, elapsed, count in rows:
+        print(f"{label:>36}: {elapsed / (count * rounds) * 1e6:8.2f} µs/chamada")
+
+
+async def run() -> int:
+    if not CASSETTE.exists() and CASSETTE == make_cassette.DEFAULT_PATH:
+        make_cassette.write(CASSETTE)
+    cassette = replay.install("replay", CASSETTE)
+    print(f"Cassete: {CASSETTE} ({len(cassette.entries)} respostas)")
+    bench_ingest(cassette)
+    await bench_detection(cassette)
+    await bench_superbet(cassette)
+    bench_functions()
+    await main.upstream.close_clients()
+    print(f"Respostas servidas: {cassette.stats()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run()))
@@ -0,0 +1,78 @@
+import json
+import sys
+import time
+import tracemalloc
+
+import fastjson
+import jsonstream
+from bench import make_cassette
+from sources.superbet import SUPERBET_STREAM_MIN_BYTES
+
+CHUNK = 16 * 1024
+
+
+def build_body(window: int) -> tuple:
+    # Janela com `window` eventos no formato do by-date; todos menos os 5 últimos já vistos
+    entries = make_cassette.build(polls=max(window // 2, 40), concurrent=40)
+    events = []
+    for entry in entries:
+        if "events/by-date" in entry["url"]:
+            events = fastjson.loads(entry["body"])["data"]
+    events = (events * (window // max(len(events), 1) + 1))[:window]
+    events = [{**e, "eventId": 7_000_000 + i} for i, e in enumerate(events)]
+    body = fastjson.dumps({"error": False, "data": events})
+    seen = {str(e["eventId"]) for e in events[:-5]}
+    return body, seen
+
+
+def full_parse(body: bytes, seen: set) -> int:
+    new = 0
+    for event in fastjson.loads(body).get("data", []):
+        if str(event.get("eventId")) not in seen:
+            new += 1
+    return new
+
+
+def full_parse_stdlib(body: bytes, seen: set) -> int:
+    return sum(1 for e in json.loads(body).get("data", []) if str(e.get("eventId")) not in seen)
+
+
+def stream_parse(body: bytes, seen: set) -> int:
+    new = 0
+    chunks = (body[i:i + CHUNK] for i in range(0, len(body), CHUNK))
+    for raw in jsonstream.iter_array_sync(chunks, "data"):
+        if jsonstream.peek_field(raw, "eventId") in seen:
+            continue
+        fastjson.loads(raw)
+        new += 1
+    return new
+
+
+def measure(fn, body: bytes, seen: set, rounds: int = 20) -> tuple:
+    tracemalloc.start()
+    fn(body, seen)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        result = fn(body, seen)
+    return (time.perf_counter() - t0) / rounds * 1000, peak / 1024, result
+
+
+def main() -> int:
+    print(f"{'janela':>8} {'KB':>8} | {'stdlib ms':>10} | {'orjson ms':>10} {'pico KB':>9} | "
+          f"{'stream ms':>10} {'pico KB':>9} | adapter")
+    for window in (100, 400, 1600, 6400):
+        body, seen = build_body(window)
+        stdlib_ms, _, _ = measure(full_parse_stdlib, body, seen)
+        full_ms, full_kb, full_new = measure(full_parse, body, seen)
+        stream_ms, stream_kb, stream_new = measure(stream_parse, body, seen)
+        assert full_new == stream_new == 5
+        path = "stream" if len(body) >= SUPERBET_STREAM_MIN_BYTES else "orjson"
+        print(f"{window:>8} {len(body) / 1024:>8.0f} | {stdlib_ms:>10.2f} | {full_ms:>10.2f} {full_kb:>9.0f} | "
+              f"{stream_ms:>10.2f} {stream_kb:>9.0f} | {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+import random
+import sys
+import timeit
+
+import timeline
+from hub import BroadcastHub
+from read_model import LiveSnapshot
+from scheduler import PollScheduler
+from sources.altenar import AltenarAdapter
+
+# liveTime nos formatos vistos no feed: minuto solto ("23'", "45+2'") não diz o tempo
+PARSE_CASES = [
+    ("1º tempo 23'", (timeline.FIRST_HALF, 23)),
+    ("1º tempo 45+2'", (timeline.FIRST_HALF, 47)),
+    ("2º tempo 71'", (timeline.SECOND_HALF, 71)),
+    ("2º tempo 90+3'", (timeline.SECOND_HALF, 93)),
+    ("1st half 12'", (timeline.FIRST_HALF, 12)),
+    ("2nd half 88'", (timeline.SECOND_HALF, 88)),
+    ("Intervalo", (timeline.HALF_TIME, None)),
+    ("Half time", (timeline.HALF_TIME, None)),
+    ("10'", (timeline.UNKNOWN, 10)),
+    ("23'", (timeline.UNKNOWN, 23)),
+    ("71'", (timeline.UNKNOWN, 71)),
+    ("45+2'", (timeline.UNKNOWN, 47)),
+    ("", (timeline.UNKNOWN, None)),
+]
+
+STYLES = ("pt", "en", "bare", "mixed")
+
+
+def label(style: str, period: int, minute: int, rng: random.Random) -> str:
+    if period == timeline.HALF_TIME:
+        return "Half time" if style == "en" else "Intervalo"
+    clock = f"{minute}'"
+    if period == timeline.FIRST_HALF and minute > 45:
+        clock = f"45+{minute - 45}'"
+    elif minute > 90:
+        clock = f"90+{minute - 90}'"
+    if style == "bare" or (style == "mixed" and rng.random() < 0.4):
+        return clock
+    if style == "en":
+        return f"{'1st' if period == timeline.FIRST_HALF else '2nd'} half {clock}"
+    return f"{'1º' if period == timeline.FIRST_HALF else '2º'} tempo {clock}"
+
+
+def feed_ht(seen) -> tuple:
+    # O que dá para saber só pelo feed, dado [(tempo do tick, placar)]:
+    # placar no 1º intervalo; senão no último tick antes do 1º "2º tempo" depois de um "1º tempo";
+    # senão no último "1º tempo"; senão desconhecido (0-0)
+    for period, score in seen:
+        if period == timeline.HALF_TIME:
+            return score
+    last_first = None
+    for i, (period, score) in enumerate(seen):
+        if period == timeline.FIRST_HALF:
+            last_first = i
+        elif period == timeline.SECOND_HALF and last_first is not None:
+            return seen[i - 1][1]
+    return seen[last_first][1] if last_first is not None else (0, 0)
+
+
+def build_feed(matches: int = 400, seed: int = 11):
+    # Um poll por ~5 min de jogo; acréscimos nos dois tempos; gols aleatórios
+    rng = random.Random(seed)
+    polls: list = []
+    expected = {}
+    truth = {}
+    for n in range(matches):
+        event_id = str(900000 + n)
+        style = STYLES[n % len(STYLES)]
+        offset = rng.randint(0, 40)
+        ticks = [(timeline.FIRST_HALF, m) for m in range(3, 46, 5)] + [(timeline.FIRST_HALF, 45 + rng.randint(1, 4))]
+        ticks += [(timeline.HALF_TIME, 45)] if rng.random() < 0.5 else []
+        ticks += [(timeline.SECOND_HALF, m) for m in range(48, 91, 5)] + [(timeline.SECOND_HALF, 90 + rng.randint(1, 5))]
+        score = [0, 0]
+        seen = []
+        for i, (period, minute) in enumerate(ticks):
+            if period != timeline.HALF_TIME and rng.random() < 0.2:
+                score[rng.randint(0, 1)] += 1
+            text = label(style, period, minute, rng)
+            if period == timeline.FIRST_HALF:
+                truth[event_id] = tuple(score)
+            seen.append((timeline.parse_live_time(text)[0], tuple(score)))
+            while len(polls) <= offset + i:
+                polls.append([])
+            polls[offset + i].append({
+                "id": event_id, "sportId": 66, "score": list(score), "liveTime": text,
+                "competitorIds": [1, 2], "champId": 1, "name": f"Home{n} vs. Away{n}",
+            })
+        expected[event_id] = feed_ht(seen)
+    data = [{"events": events, "competitors": [{"id": 1, "name": "Home"}, {"id": 2, "name": "Away"}],
+             "champs": [{"id": 1, "name": "Valhalla Cup"}]} for events in polls]
+    return data, expected, truth
+
+
+def legacy_ht(polls) -> dict:
+    # Regra antiga: qualquer "1" (ou "int") no liveTime = 1º tempo
+    ht = {}
+    for data in polls:
+        for event in data["events"]:
+            text = event["liveTime"].lower()
+            if "1" in text or "int" in text:
+                ht[event["id"]] = tuple(event["score"])
+            ht.setdefault(event["id"], (0, 0))
+    return ht
+
+
+def main(rounds: int = 2000) -> int:
+    failures = 0
+    for text, want in PARSE_CASES:
+        got = timeline.parse_live_time(text)
+        if got != want:
+            failures += 1
+            print(f"❌ parse {text!r}: esperado={want} obtido={got}")
+    print(f"parse_live_time: {len(PARSE_CASES) - failures}/{len(PARSE_CASES)} casos")
+
+    polls, expected, truth = build_feed()
+    adapter = AltenarAdapter(None, PollScheduler(), BroadcastHub(), LiveSnapshot())
+    final = {}
+    for data in polls:
+        adapter.ingest_live_events(data)
+        for event in data["events"]:
+            final[event["id"]] = adapter.live_cache.get(event["id"])
+
+    mismatches = 0
+    for event_id, entry in final.items():
+        got = (entry.ht_home, entry.ht_away)
+        if got != expected[event_id]:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"❌ HT {event_id}: esperado={expected[event_id]} obtido={got}")
+    print(f"HT vs o que o feed permite saber: {len(final) - mismatches}/{len(final)} iguais ({', '.join(STYLES)})")
+
+    old = legacy_ht(polls)
+    new_right = sum((e.ht_home, e.ht_away) == truth[i] for i, e in final.items())
+    old_right = sum(old[i] == truth[i] for i in final)
+    print(f"HT vs real: novo {new_right}/{len(final)}, regra antiga {old_right}/{len(final)}")
+
+    sizes = [len(e.timeline) for e in final.values()]
+    print(f"Linha do tempo: média {sum(sizes) / len(sizes):.1f} bytes, máx {max(sizes)}")
+    texts = [e["liveTime"] for data in polls for e in data["events"]]
+    elapsed = timeit.timeit(lambda: [timeline.parse_live_time(t) for t in texts], number=max(1, rounds // 100))
+    print(f"parse_live_time: {elapsed / (len(texts) * max(1, rounds // 100)) * 1e6:.2f} µs/tick")
+
+    return 1 if failures or mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
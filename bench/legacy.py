@@ -0,0 +1,110 @@
+import re
+
+# Implementações antigas, mantidas só para paridade e comparação nos benchmarks
+
+
+def extract_pure_nick_canonical(raw: str) -> str:
+    if not raw or not isinstance(raw, str):
+        return ""
+
+    # Common team names and abbreviations
+    common_teams = [
+        'Spain', 'France', 'Germany', 'Italy', 'Brazil', 'Argentina', 'Portugal', 'Netherlands', 'England', 'Belgium',
+        'Real Madrid', 'Barcelona', 'FC Bayern', 'Man City', 'Man Utd', 'Liverpool', 'PSG', 'Juventus', 'Arsenal', 'Chelsea',
+        'Borussia Dortmund', 'Bayer Leverkusen', 'Napoli', 'AC Milan', 'Inter', 'Inter de Milão', 'Atletico Madrid', 'Sevilla',
+        'Piemonte Calcio', 'Latium', 'Genoa', 'Roma', 'RB Leipzig', 'Real Sociedad', 'Athletic Club', 'Aston Villa', 'Spurs'
+    ]
+    known_acronyms = ['PSG', 'RMA', 'FCB', 'MCI', 'MUN', 'LIV', 'CHE', 'ARS',
+                      'TOT', 'JUV', 'MIL', 'INT', 'NAP', 'BVB', 'ATM', 'FC', 'CF', 'SC']
+
+    # 1. Parentheses logic
+    paren_match = re.search(r'(.*?)\((.*?)\)', raw)
+    if paren_match:
+        part1, part2 = paren_match.group(
+            1).strip(), paren_match.group(2).strip()
+
+        is_p1_caps = bool(
+            re.match(r'^[A-Z0-9\s_]+$', part1)) and len(part1) > 1
+        is_p2_caps = bool(
+            re.match(r'^[A-Z0-9\s_]+$', part2)) and len(part2) > 1
+
+        if is_p2_caps and not is_p1_caps:
+            return part2
+        if is_p1_caps and not is_p2_caps:
+            return part1
+
+        if any(team in part1 for team in common_teams):
+            return part2
+        if any(team in part2 for team in common_teams):
+            return part1
+
+        return part2
+
+    # 2. No parentheses logic
+    clean_str = raw.strip()
+
+    if " " not in clean_str and re.match(r'^[A-Z0-9_]+$', clean_str) and clean_str not in known_acronyms:
+        return clean_str
+
+    # Strip known teams out completely
+    team_words_to_remove = sorted(
+        common_teams + known_acronyms, key=len, reverse=True)
+    for team in team_words_to_remove:
+        clean_str = re.sub(rf'\b{re.escape(team)}\b',
+                           '', clean_str, flags=re.IGNORECASE).strip()
+
+    clean_str = re.sub(r'^[-·]+|[-·]+$', '', clean_str).strip()
+    clean_str = re.sub(r'\s+', ' ', clean_str)
+
+    if clean_str:
+        return clean_str
+
+    # Ultimate fallback
+    parts = raw.split()
+    if len(parts) > 1:
+        return parts[-1]
+
+    return raw.strip()
+
+
+def map_league_name(name: str, duration: str = "8 min") -> str:
+    original = name.upper()
+
+    # Normalização de Valkyrie / Valhalla
+    if "VALKYRIE" in original or "VALKIRYE" in original:
+        return "VALKYRIE CUP"
+    if "VALHALLA" in original:
+        return "VALHALLA CUP"
+
+    if "H2H" in original:
+        return "H2H GG LEAGUE"
+
+    if "BATTLE" in original:
+        if "6" in duration or "3 MIN" in duration.upper() or "VOLTA" in original:
+            return "VOLTA - 6 MIN"
+        if "12" in duration:
+            return "BATTLE - 12 MIN"
+        return "BATTLE - 8 MIN"
+
+    if "GT " in original or "GT LEAGUES" in original:
+        return "GT LEAGUES"
+
+    if "EAL" in original or "ADRIATIC" in original:
+        return "ADRIATIC"
+
+    if "CHAMPIONS LEAGUE" in original and "BATTLE" not in original:
+        if "12" in duration or "6 MIN" in duration.upper():
+            return "CHAMPIONS LEAGUE - 12 MIN"
+        return "CHAMPIONS LEAGUE"
+
+    if "CLA" in original or "CYBER LIVE ARENA" in original:
+        return "CLA LEAGUE"
+
+    # Garantir prefixo E-SOCCER se não tiver
+    mapped = name.strip() or "UNKNOWN"
+    if "ESOCCER" in mapped.upper() and "E-SOCCER" not in mapped.upper():
+        # Substitui variações de Esoccer por E-SOCCER
+        mapped = re.sub(r'Esoccer|esoccer|ESOCCER|E-SOCCER',
+                        'E-SOCCER', mapped, flags=re.IGNORECASE)
+
+    return mapped
@@ -0,0 +1,113 @@
+import json
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from replay import request_key
+from sources import altenar, superbet
+
+# Cassete sintético com o formato das APIs reais, para medir sem rede e sem gravação prévia
+DEFAULT_PATH = Path(__file__).parent / "data" / "synthetic_cassette.jsonl"
+NAMES = Path(__file__).parent / "data" / "raw_names.txt"
+
+LIVE_LEAGUES = ["Valhalla Cup", "Valkyrie Cup", "Esports Adriatic League", "Cyber Live Arena",
+                "H2H GG League", "Valkyrie Basketball", "Esoccer Liga Pro - 12 mins"]
+SUPERBET_TOURNAMENTS = [("9001", "Esoccer Battle - 8 mins play", "4x4"),
+                        ("9002", "Esoccer GT Leagues - 12 mins play", "6x6"),
+                        ("9003", "Esoccer H2H GG League - 8 mins play", "4x4")]
+
+
+def _entry(t: float, url: str, payload) -> dict:
+    return {"t": round(t, 3), "key": request_key(url), "url": url, "status": 200,
+            "content_type": "application/json", "body": json.dumps(payload, ensure_ascii=False)}
+
+
+def build(polls: int = 300, concurrent: int = 30, poll_interval: float = 8.0, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    names = [n for n in NAMES.read_text(encoding="utf-8").splitlines() if n.strip()]
+    champs = [{"id": 100 + i, "name": name} for i, name in enumerate(LIVE_LEAGUES)]
+    start = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+    entries = []
+    live: dict = {}
+    competitors: dict = {}
+    next_id = 1_000_000
+    superbet_done = []
+
+    for poll in range(polls):
+        t = poll * poll_interval
+        now = start + timedelta(seconds=t)
+
+        # Abre jogos até manter `concurrent` ao vivo; cada um dura 8-14 polls
+        while len(live) < concurrent:
+            next_id += 1
+            home, away = rng.sample(range(len(names)), 2)
+            competitors[home] = names[home]
+            competitors[away] = names[away]
+            live[next_id] = {"home": home, "away": away, "champ": rng.choice(champs)["id"],
+                             "score": [0, 0], "polls_left": rng.randint(8, 14), "total": 0,
+                             "start": now}
+
+        events = []
+        for event_id, match in list(live.items()):
+            match["total"] += 1
+            if rng.random() < 0.15:
+                match["score"][rng.randint(0, 1)] += 1
+            half = "1º tempo" if match["total"] <= 5 else "2º tempo"
+            events.append({
+                "id": event_id, "sportId": 66, "score": list(match["score"]),
+                "liveTime": f"{half} {match['total']}'", "competitorIds": [match["home"], match["away"]],
+                "champId": match["champ"], "startDate": match["start"].isoformat().replace("+00:00", "Z"),
+                "name": f"{names[match['home']]} vs. {names[match['away']]}",
+            })
+
+        entries.append(_entry(t, altenar.LIVE_API, {
+            "events": events,
+            "competitors": [{"id": cid, "name": name} for cid, name in competitors.items()],
+            "champs": champs,
+        }))
+
+        # Quem some no próximo poll tem details/tracker gravados para o resolver
+        for event_id, match in list(live.items()):
+            match["polls_left"] -= 1
+            if match["polls_left"] > 0:
+                continue
+            del live[event_id]
+            score = list(match["score"])
+            entries.append(_entry(t + poll_interval, altenar.EVENT_API.format(event_id), {
+                "score": score, "championshipName": next(c["name"] for c in champs if c["id"] == match["champ"]),
+                "competitors": [{"name": names[match["home"]]}, {"name": names[match["away"]]}],
+            }))
+            entries.append(_entry(t + poll_interval, altenar.TRACKER_API.format(event_id), {"score": score}))
+            t_id, _, _ = rng.choice(SUPERBET_TOURNAMENTS)
+            superbet_done.append({
+                "eventId": event_id + 5_000_000, "tournamentId": t_id,
+                "utcDate": now.isoformat().replace("+00:00", "Z"),
+                "matchName": f"{names[match['home']]} · {names[match['away']]}",
+                "metadata": {"homeTeamScore": score[0], "awayTeamScore": score[1],
+                             "periods": [{"num": 1, "homeTeamScore": score[0] // 2, "awayTeamScore": score[1] // 2}]},
+            })
+
+        # Histórico Superbet a cada ~30s, com a janela inteira (como a API devolve)
+        if poll % 4 == 0:
+            entries.append(_entry(t, superbet.SUPERBET_HISTORY_API.format("x", "y"), {"data": list(superbet_done[-400:])}))
+
+    struct = {"data": {"tournaments": [
+        {"id": t_id, "name": name, "footer": f"Duração {duration}"} for t_id, name, duration in SUPERBET_TOURNAMENTS]}}
+    entries.insert(0, _entry(0.0, superbet.SUPERBET_STRUCT_API, struct))
+    return entries
+
+
+def write(path: Path = DEFAULT_PATH, **kwargs) -> Path:
+    entries = build(**kwargs)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    return path
+
+
+if __name__ == "__main__":
+    out = write(Path(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PATH)
+    print(f"Cassete sintético gravado em {out}")
@@ -0,0 +1,144 @@
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterator, Tuple
+
+
+# Estado live de um evento; slots em vez de um dict de 11 chaves por evento
+class LiveEntry:
+    __slots__ = ("home_score", "away_score", "ht_home", "ht_away",
+                 "home_raw", "away_raw", "league", "started_at", "last_seen", "period", "timeline")
+
+    def __init__(self, home_score: int = 0, away_score: int = 0, ht_home: int = 0, ht_away: int = 0,
+                 home_raw: str = "", away_raw: str = "", league: str = "",
+                 started_at: datetime | None = None, last_seen: float = 0.0,
+                 period: int = 0, timeline: bytes = b""):
+        self.home_score = home_score
+        self.away_score = away_score
+        self.ht_home = ht_home
+        self.ht_away = ht_away
+        self.home_raw = home_raw
+        self.away_raw = away_raw
+        self.league = league
+        self.started_at = started_at
+        self.last_seen = last_seen
+        # Tempo do jogo visto no último poll (0 = desconhecido) e gols empacotados (timeline.py)
+        self.period = period
+        self.timeline = timeline
+
+    def state(self) -> Tuple:
+        # Tudo menos last_seen: serve para saber se um poll mudou algo de fato
+        return (self.home_score, self.away_score, self.ht_home, self.ht_away,
+                self.home_raw, self.away_raw, self.league, self.started_at)
+
+    def as_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+# LRU + TTL por last_seen: a ordem do OrderedDict é a ordem de last_seen
+class LiveCache:
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, LiveEntry]" = OrderedDict()
+        self.evictions = 0
+        self.expired = 0
+
+    def get(self, event_id: str) -> LiveEntry | None:
+        return self._entries.get(event_id)
+
+    def put(self, event_id: str, entry: LiveEntry) -> None:
+        entry.last_seen = time.monotonic()
+        self._entries[event_id] = entry
+        self._entries.move_to_end(event_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def touch(self, event_id: str) -> None:
+        # Evento sem mudança no poll: só renova last_seen
+        entry = self._entries.get(event_id)
+        if entry is not None:
+            entry.last_seen = time.monotonic()
+            self._entries.move_to_end(event_id)
+
+    def restore(self, event_id: str, entry: LiveEntry, age_s: float) -> None:
+        # Snapshot de outro processo: last_seen volta para o relógio local (chamar em ordem de last_seen)
+        entry.last_seen = time.monotonic() - age_s
+        self._entries[event_id] = entry
+        self._entries.move_to_end(event_id)
+
+    def prune(self) -> int:
+        cutoff = time.monotonic() - self.ttl_seconds
+        removed = 0
+        while self._entries:
+            oldest = next(iter(self._entries.values()))
+            if oldest.last_seen >= cutoff:
+                break
+            self._entries.popitem(last=False)
+            removed += 1
+        self.expired += removed
+        return removed
+
+    def items(self) -> Iterator[Tuple[str, LiveEntry]]:
+        return iter(self._entries.items())
+
+    def __contains__(self, event_id: str) -> bool:
+        return event_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        return {"size": len(self._entries), "evictions": self.evictions, "expired": self.expired}
+
+
+# Set de ids com validade: só precisa lembrar o que ainda cabe na janela do histórico
+class SeenIds:
+    def __init__(self, window_seconds: float, max_entries: int):
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self._expires: "OrderedDict[str, float]" = OrderedDict()
+        self.evictions = 0
+        self.expired = 0
+
+    def add(self, item: str) -> None:
+        self._expires[item] = time.monotonic() + self.window_seconds
+        self._expires.move_to_end(item)
+        self.prune()
+        while len(self._expires) > self.max_entries:
+            self._expires.popitem(last=False)
+            self.evictions += 1
+
+    def prune(self) -> int:
+        now = time.monotonic()
+        removed = 0
+        while self._expires:
+            item, expires_at = next(iter(self._expires.items()))
+            if expires_at > now:
+                break
+            del self._expires[item]
+            removed += 1
+        self.expired += removed
+        return removed
+
+    def snapshot(self) -> list:
+        # [[id, segundos restantes], ...] na ordem de expiração
+        now = time.monotonic()
+        return [[item, round(expires_at - now, 1)] for item, expires_at in self._expires.items() if expires_at > now]
+
+    def restore(self, items: list, elapsed_s: float = 0.0) -> None:
+        now = time.monotonic()
+        for item, remaining in items:
+            if remaining - elapsed_s > 0 and item not in self._expires:
+                self._expires[item] = now + remaining - elapsed_s
+
+    def __contains__(self, item: str) -> bool:
+        expires_at = self._expires.get(item)
+        return expires_at is not None and expires_at > time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._expires)
+
+    def stats(self) -> Dict:
+        return {"size": len(self._expires), "evictions": self.evictions, "expired": self.expired}
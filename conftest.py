@@ -0,0 +1 @@
+# Raiz do repositório no sys.path: os módulos são planos (nicks, leagues...) e os testes usam bench.legacy
@@ -0,0 +1,202 @@
+import csv
+import io
+import os
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, List
+
+import fastjson
+from logs import get_logger
+from metrics import EXPORT_ROWS
+from sources.base import USER_TZ
+
+log = get_logger("export")
+
+# pyarrow é opcional: sem ele /api/export só oferece ndjson e csv
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+    ARROW_AVAILABLE = True
+except ImportError:
+    pyarrow = None
+    ARROW_AVAILABLE = False
+
+# Docs por lote do cursor; também é o tamanho de cada pedaço escrito na resposta (e row group no Parquet)
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "2000"))
+EXPORT_GZIP_LEVEL = int(os.getenv("EXPORT_GZIP_LEVEL", "6"))
+
+# Colunas fixas dos formatos tabulares (ndjson leva o doc inteiro)
+COLUMNS = [
+    "event_id", "source", "league_mapped", "duration",
+    "home_nick", "away_nick", "home_raw", "away_raw",
+    "home_score_ht", "away_score_ht", "home_score_ft", "away_score_ft",
+    "started_at", "finished_at",
+]
+_INT_COLUMNS = {"home_score_ht", "away_score_ht", "home_score_ft", "away_score_ft"}
+_TIME_COLUMNS = {"started_at", "finished_at"}
+
+# formato -> (media type, extensão do arquivo)
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+ARROW_FORMATS = {"parquet", "arrow"}
+
+
+def available_formats() -> List[str]:
+    return [f for f in FORMATS if ARROW_AVAILABLE or f not in ARROW_FORMATS]
+
+
+def parse_bound(value: str | None) -> datetime | None:
+    # Data ou data/hora ISO 8601; sem fuso vale o do usuário. ValueError se inválida.
+    if not value:
+        return None
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=USER_TZ)
+    return dt
+
+
+def build_query(start: datetime | None, end: datetime | None,
+                league: str | None = None, source: str | None = None) -> Dict:
+    # Intervalo semiaberto [start, end) em finished_at
+    query: Dict = {}
+    span = {}
+    if start:
+        span["$gte"] = start
+    if end:
+        span["$lt"] = end
+    if span:
+        query["finished_at"] = span
+    if league:
+        query["league_mapped"] = league
+    if source:
+        query["source"] = source
+    return query
+
+
+async def iter_batches(collection, query: Dict, serialize: Callable[[Dict], Dict],
+                       batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[List[Dict]]:
+    # Direto do cursor, em ordem crescente pelo índice finished_at_event_id_desc (percorrido ao contrário):
+    # só um lote fica em memória por vez, qualquer que seja o intervalo pedido
+    cursor = collection.find(query, {"_id": 0}).sort(
+        [("finished_at", 1), ("event_id", 1)]).batch_size(batch_size)
+    batch: List[Dict] = []
+    async for doc in cursor:
+        batch.append(serialize(doc))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# ---------- encoders: lotes de docs -> pedaços de bytes ----------
+async def encode_ndjson(batches) -> AsyncIterator[bytes]:
+    async for batch in batches:
+        yield b"".join(fastjson.dumps(doc) + b"\n" for doc in batch)
+
+
+def _csv_cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+async def encode_csv(batches) -> AsyncIterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(COLUMNS)
+    async for batch in batches:
+        writer.writerows([_csv_cell(doc.get(c)) for c in COLUMNS] for doc in batch)
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    # Resultado vazio ainda devolve o cabeçalho
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    # Destino dos writers do pyarrow: guarda o que foi escrito até o próximo drain()
+    def __init__(self):
+        super().__init__()
+        self.chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _arrow_schema():
+    fields = []
+    for c in COLUMNS:
+        if c in _INT_COLUMNS:
+            fields.append(pyarrow.field(c, pyarrow.int32()))
+        elif c in _TIME_COLUMNS:
+            fields.append(pyarrow.field(c, pyarrow.timestamp("ms", tz="UTC")))
+        else:
+            fields.append(pyarrow.field(c, pyarrow.string()))
+    return pyarrow.schema(fields)
+
+
+async def encode_arrow(batches, fmt: str) -> AsyncIterator[bytes]:
+    schema = _arrow_schema()
+    sink = _ChunkSink()
+    if fmt == "parquet":
+        writer = pyarrow.parquet.ParquetWriter(sink, schema, compression="zstd")
+    else:
+        writer = pyarrow.ipc.new_stream(sink, schema)
+    try:
+        async for batch in batches:
+            table = pyarrow.Table.from_pylist([{c: doc.get(c) for c in COLUMNS} for doc in batch], schema=schema)
+            writer.write_table(table)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        # Parquet só fica legível com o rodapé escrito aqui
+        writer.close()
+    yield sink.drain()
+
+
+def encode(batches, fmt: str) -> AsyncIterator[bytes]:
+    if fmt == "csv":
+        return encode_csv(batches)
+    if fmt in ARROW_FORMATS:
+        return encode_arrow(batches, fmt)
+    return encode_ndjson(batches)
+
+
+async def gzip_chunks(chunks) -> AsyncIterator[bytes]:
+    # Um único stream gzip (wbits=31) comprimido pedaço a pedaço
+    compressor = zlib.compressobj(EXPORT_GZIP_LEVEL, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def counted(batches, fmt: str):
+    rows = 0
+    try:
+        async for batch in batches:
+            rows += len(batch)
+            yield batch
+    finally:
+        EXPORT_ROWS.inc(rows, format=fmt)
+        log.info("📦 [EXPORT] %d jogos exportados (%s)", rows, fmt)
@@ -0,0 +1,43 @@
+import json
+import os
+from datetime import date, datetime
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+# orjson é opcional: sem ele (ou com JSON_FAST=0) tudo cai no json da stdlib com a mesma saída
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+JSON_FAST = os.getenv("JSON_FAST", "1") == "1" and ORJSON_AVAILABLE
+
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS if ORJSON_AVAILABLE else 0
+
+
+def _default(value: Any) -> Any:
+    # Mesmo formato do orjson para datetime (RFC 3339 = isoformat)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def loads(data: bytes | str) -> Any:
+    if JSON_FAST:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(value: Any) -> bytes:
+    if JSON_FAST:
+        return orjson.dumps(value, default=_default, option=_ORJSON_OPTIONS)
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    # Devolvida direto pelo endpoint, pula o jsonable_encoder do FastAPI: datetimes vão nativos
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
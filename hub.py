@@ -0,0 +1,78 @@
+import asyncio
+import os
+from typing import Dict, Set
+
+import fastjson
+
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "256"))
+STREAM_KEEPALIVE = float(os.getenv("STREAM_KEEPALIVE", "15"))
+
+
+class Subscriber:
+    __slots__ = ("queue", "topics", "dropped")
+
+    def __init__(self, topics: Set[str], queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.topics = topics
+        self.dropped = False
+
+
+# Fan-out em processo: cada evento é serializado uma vez e enfileirado para cada cliente.
+# Cliente lento (fila cheia) é desconectado; o publish nunca espera.
+class BroadcastHub:
+    def __init__(self, queue_size: int = STREAM_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Set[Subscriber] = set()
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, topics: Set[str]) -> Subscriber:
+        sub = Subscriber(topics, self.queue_size)
+        self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        self._subscribers.discard(sub)
+
+    def publish(self, topic: str, payload: Dict) -> None:
+        if not self._subscribers:
+            return
+        frame = f"event: {topic}\ndata: {fastjson.dumps(payload).decode()}\n\n"
+        self.published += 1
+        for sub in list(self._subscribers):
+            if topic not in sub.topics:
+                continue
+            try:
+                sub.queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                self._drop(sub)
+
+    def _drop(self, sub: Subscriber) -> None:
+        self._subscribers.discard(sub)
+        sub.dropped = True
+        self.dropped += 1
+        # Abre espaço para o sentinela de fim; o cliente perde o resto da fila
+        try:
+            sub.queue.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+        sub.queue.put_nowait(None)
+
+    async def stream(self, sub: Subscriber):
+        try:
+            yield ": connected\n\n"
+            while True:
+                try:
+                    frame = await asyncio.wait_for(sub.queue.get(), timeout=STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if frame is None:
+                    yield "event: dropped\ndata: {}\n\n"
+                    return
+                yield frame
+        finally:
+            self.unsubscribe(sub)
+
+    def stats(self) -> Dict:
+        return {"subscribers": len(self._subscribers), "published": self.published, "dropped": self.dropped}
@@ -0,0 +1,200 @@
+import asyncio
+import os
+import re
+import time
+from datetime import datetime, timezone
+from typing import List
+
+from hub import BroadcastHub
+from leader import LeaderLease
+from logs import get_logger
+from persistence import MatchWriter, retention_loop
+from read_model import LiveSnapshot
+from scheduler import PollScheduler
+from stats import MatchStats
+from sources import AltenarAdapter, MatchPipeline, SourceRuntime, SuperbetAdapter
+
+log = get_logger("ingestion")
+
+MONGO_DB = "estrelabet_esoccer"
+
+# Snapshot do /api/live espelhado no Mongo para as instâncias só-API
+LIVE_SNAPSHOT_ID = "live_snapshot"
+LIVE_MIRROR_INTERVAL = float(os.getenv("LIVE_MIRROR_INTERVAL", "1"))
+
+# Estado das fontes (cache live, ids vistos, torneios) salvo para o restart a quente
+SNAPSHOT_INTERVAL = float(os.getenv("SNAPSHOT_INTERVAL", "15"))
+SNAPSHOT_MAX_AGE = float(os.getenv("SNAPSHOT_MAX_AGE", "10800"))
+# No stop: quanto esperar o pipeline gravar o que as fontes já entregaram
+PIPELINE_DRAIN_TIMEOUT = float(os.getenv("PIPELINE_DRAIN_TIMEOUT", "10"))
+
+
+# ====================== MIGRAÇÕES ======================
+async def cleanup_legacy_matches(matches) -> int:
+    log.info("🧹 [CLEANUP] Removendo jogos legados da Altenar (que não são Valhalla/Valkyrie)...")
+    # Igualdade em source usa o índice source_league; o regex só roda dentro dele
+    result = await matches.delete_many({
+        "source": "desaparecimento_cache_tracker",
+        "league_mapped": {"$not": re.compile("VALHALLA|VALKYRIE|VALKIRYE", re.IGNORECASE)}
+    })
+    log.info("🧹 [CLEANUP] %d jogos legados removidos com sucesso!", result.deleted_count)
+    return result.deleted_count
+
+
+# Rodam uma vez por banco, em segundo plano; a marca em scraper_state evita repetir
+MIGRATIONS = [
+    ("altenar_legacy_cleanup", cleanup_legacy_matches),
+]
+
+
+async def run_migrations(matches, state) -> None:
+    for name, migration in MIGRATIONS:
+        marker = f"migration:{name}"
+        try:
+            if await state.find_one({"_id": marker}):
+                continue
+            result = await migration(matches)
+            await state.update_one(
+                {"_id": marker}, {"$set": {"done_at": datetime.now(timezone.utc), "result": result}}, upsert=True)
+        except Exception as e:
+            # Sem a marca: tenta de novo no próximo boot/lease
+            log.error("Migração %s falhou: %s", name, e)
+
+
+# ====================== SNAPSHOTS ======================
+async def save_snapshots(adapters, state) -> int:
+    saved = 0
+    for adapter in adapters:
+        snapshot = adapter.dump_state()
+        if snapshot is None:
+            continue
+        await state.update_one(
+            {"_id": f"snapshot:{adapter.name}"},
+            {"$set": {"state": snapshot, "saved_at": datetime.now(timezone.utc)}}, upsert=True)
+        saved += 1
+    return saved
+
+
+async def restore_snapshots(adapters, state, max_age: float = SNAPSHOT_MAX_AGE) -> None:
+    now = datetime.now(timezone.utc)
+    for adapter in adapters:
+        adapter.reset()
+        try:
+            doc = await state.find_one({"_id": f"snapshot:{adapter.name}"})
+            if not doc:
+                continue
+            # Mongo devolve naive em UTC
+            age_s = (now - doc["saved_at"].replace(tzinfo=timezone.utc)).total_seconds()
+            if age_s > max_age:
+                log.info("Snapshot %s com %.0fs ignorado (máx. %.0fs)", adapter.name, age_s, max_age)
+                continue
+            adapter.load_state(doc.get("state") or {}, age_s)
+        except Exception as e:
+            # Snapshot ruim não impede o boot: a fonte começa do zero
+            log.error("❌ Snapshot %s não restaurado: %s", adapter.name, e)
+
+
+async def snapshot_loop(adapters, state, interval: float = SNAPSHOT_INTERVAL) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await save_snapshots(adapters, state)
+        except Exception as e:
+            log.error("Snapshot error: %s", e)
+
+
+async def live_mirror_loop(snapshot: LiveSnapshot, state, interval: float = LIVE_MIRROR_INTERVAL) -> None:
+    # Grava só quando a versão muda; várias mudanças no intervalo viram uma escrita
+    mirrored = -1
+    while True:
+        if snapshot.version != mirrored:
+            version = snapshot.version
+            try:
+                await state.update_one(
+                    {"_id": LIVE_SNAPSHOT_ID},
+                    {"$set": {"version": version, "rows": snapshot.rows, "updated_at": datetime.now(timezone.utc)}},
+                    upsert=True)
+                mirrored = version
+            except Exception as e:
+                log.error("Live mirror error: %s", e)
+        await asyncio.sleep(interval)
+
+
+# Tudo que escreve no Mongo: fontes, pipeline, writer, retenção e cleanup.
+# Só a instância com o lease "scraper" roda isso; as outras só leem.
+class Ingestion:
+    def __init__(self, db, hub: BroadcastHub | None = None, snapshot: LiveSnapshot | None = None,
+                 scheduler: PollScheduler | None = None):
+        self.matches = db["finished_matches"]
+        self.state = db["scraper_state"]
+        self.hub = hub or BroadcastHub()
+        self.snapshot = snapshot or LiveSnapshot()
+        self.scheduler = scheduler or PollScheduler()
+        self.writer = MatchWriter(self.matches)
+        # Agregados por jogador/confronto, atualizados a cada lote gravado
+        self.match_stats = MatchStats(db["match_stats"])
+        self.writer.listeners.append(self.match_stats.apply_many)
+        # Cada casa é um adapter com seus jobs; todas entregam MatchResult no mesmo pipeline
+        self.pipeline = MatchPipeline(self.writer)
+        self.altenar = AltenarAdapter(self.pipeline, self.scheduler, self.hub, self.snapshot)
+        self.superbet = SuperbetAdapter(self.pipeline, self.scheduler, self.state)
+        self.runtime = SourceRuntime(self.scheduler)
+        self.runtime.add(self.superbet)
+        self.runtime.add(self.altenar)
+        self.lease = LeaderLease(self.state, "scraper")
+        self._tasks: List[asyncio.Task] = []
+        self._stats_stale = False
+
+    async def start(self) -> None:
+        # Estado do último líder primeiro: o 1º poll já detecta o que terminou durante o restart
+        await restore_snapshots(self.runtime.adapters, self.state)
+        if not self.match_stats.loaded or self._stats_stale:
+            # Depois de perder o lease a memória pode ter somas não gravadas: recarrega do Mongo
+            await self.match_stats.load(self.matches)
+            self._stats_stale = False
+        self._tasks = [
+            asyncio.create_task(self.writer.run()),
+            asyncio.create_task(self.pipeline.run()),
+            asyncio.create_task(retention_loop(self.matches)),
+            asyncio.create_task(self.match_stats.run(self.matches)),
+            asyncio.create_task(snapshot_loop(self.runtime.adapters, self.state)),
+            asyncio.create_task(run_migrations(self.matches, self.state)),
+        ]
+        if self.snapshot.version == 0:
+            # Versão começa no relógio: um worker reiniciado não repete ETags já servidos
+            self.snapshot.version = int(time.time())
+        self._tasks.append(asyncio.create_task(live_mirror_loop(self.snapshot, self.state)))
+        await self.runtime.start()
+
+    async def stop(self, final_snapshot: bool = False) -> None:
+        # Fontes param e entregam o que já detectaram; o pipeline leva tudo ao writer antes de ser cancelado
+        await self.runtime.stop()
+        try:
+            await asyncio.wait_for(self.pipeline.drain(), PIPELINE_DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            log.warning("⚠️ Pipeline com %d jogos não gravados no stop", self.pipeline.queue.qsize())
+        if final_snapshot:
+            # Só no desligamento normal: quem perdeu o lease não sobrescreve o snapshot do novo líder
+            try:
+                await save_snapshots(self.runtime.adapters, self.state)
+            except Exception as e:
+                log.error("Snapshot final não gravado: %s", e)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.writer.close()
+        if final_snapshot:
+            await self.match_stats.flush(self.matches)
+        else:
+            # Lease perdido: o novo líder já pode ter gravado agregados; ele soma o que ficou pendente
+            self._stats_stale = True
+
+    async def run(self) -> None:
+        # Espera o lease; perdeu (ex.: Mongo fora além do TTL), para tudo e volta a esperar
+        await self.lease.run(self.start, self.stop)
+
+    async def close(self) -> None:
+        if self.lease.is_leader:
+            await self.stop(final_snapshot=True)
+            await self.lease.release()
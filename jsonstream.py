@@ -0,0 +1,136 @@
+import re
+from functools import lru_cache
+from typing import AsyncIterator, Iterator, List
+
+# Leitura incremental de um array JSON grande (ex.: "data" do by-date da Superbet):
+# devolve os bytes de cada elemento sem montar a árvore inteira em memória.
+
+# Pula de uma vez (no C do re) tudo que não é delimitador: texto, números, vírgulas e
+# strings completas com escapes. O loop em Python só roda nos { } [ ] de verdade.
+_STRING = rb'"[^"\\]*+(?:\\.[^"\\]*+)*+"'
+_SKIP_RE = re.compile(rb'(?:[^"{}\[\]]++|' + _STRING + rb')*+')
+_SEPARATOR_RE = re.compile(rb'[\s,]*+')
+
+
+def _nested(levels: int) -> bytes:
+    # Conteúdo de objeto/array com até `levels` níveis de aninhamento (re não tem recursão)
+    inner = rb'(?:[^"{}\[\]]++|' + _STRING + rb')*+'
+    for _ in range(levels):
+        inner = rb'(?:[^"{}\[\]]++|' + _STRING + rb'|\{' + inner + rb'\}|\[' + inner + rb'\])*+'
+    return inner
+
+
+# Caminho rápido: um elemento inteiro (até 5 níveis) casado numa chamada só
+_ELEMENT_RE = re.compile(rb'\{' + _nested(4) + rb'\}|\[' + _nested(4) + rb'\]')
+
+
+class ArrayScanner:
+    """Alimentado com chunks; ``feed`` devolve os elementos completos do array ``key``."""
+
+    def __init__(self, key: str):
+        self._key = b'"' + key.encode() + b'"'
+        self._buffer = b""
+        self._found = False  # já passou do '[' do array
+        self._done = False
+        self._depth = 0  # profundidade dentro do elemento atual
+        self._start = -1  # início do elemento atual no buffer
+        self._pos = 0
+        self.scanned_bytes = 0
+
+    def _find_array(self) -> bool:
+        # Procura `"key"` seguido de ':' e '['; o array alvo fica no primeiro nível do objeto
+        index = self._buffer.find(self._key)
+        while index != -1:
+            rest = self._buffer[index + len(self._key):].lstrip()
+            if not rest or (rest[:1] == b":" and not rest[1:].lstrip()):
+                # A chave chegou, o '[' ainda não
+                self._buffer = self._buffer[index:]
+                return False
+            if rest[:1] == b":" and rest[1:].lstrip()[:1] == b"[":
+                self._buffer = rest[1:].lstrip()[1:]
+                self._pos = 0
+                self._found = True
+                return True
+            index = self._buffer.find(self._key, index + 1)
+        # Guarda só um pedaço do fim: a chave pode estar cortada entre dois chunks
+        self._buffer = self._buffer[-len(self._key):]
+        return False
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        if self._done:
+            return []
+        self.scanned_bytes += len(chunk)
+        self._buffer += chunk
+        if not self._found and not self._find_array():
+            return []
+
+        items: List[bytes] = []
+        buffer = self._buffer
+        pos = self._pos
+        end = len(buffer)
+        while True:
+            if self._depth == 0:
+                pos = _SEPARATOR_RE.match(buffer, pos).end()
+                element = _ELEMENT_RE.match(buffer, pos)
+                if element is not None:
+                    items.append(element.group())
+                    pos = element.end()
+                    continue
+            # Elemento cortado no fim do chunk (ou fundo demais): anda delimitador a delimitador
+            pos = _SKIP_RE.match(buffer, pos).end()
+            # Fim do buffer ou string cortada no meio (aspa sem par): espera o próximo chunk
+            if pos >= end or buffer[pos] == 0x22:
+                break
+            char = buffer[pos]
+            pos += 1
+            if char == 0x7B or char == 0x5B:  # { [
+                if self._depth == 0:
+                    self._start = pos - 1
+                self._depth += 1
+            elif self._depth == 0:
+                # ']' fechando o array alvo
+                self._done = True
+                self._buffer = b""
+                return items
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    items.append(buffer[self._start:pos])
+                    self._start = -1
+
+        # Descarta o que já foi devolvido; mantém o elemento incompleto
+        keep_from = self._start if self._start != -1 else pos
+        self._buffer = buffer[keep_from:]
+        if self._start != -1:
+            self._start = 0
+        self._pos = pos - keep_from
+        return items
+
+
+async def iter_array(chunks: AsyncIterator[bytes], key: str) -> AsyncIterator[bytes]:
+    scanner = ArrayScanner(key)
+    async for chunk in chunks:
+        for item in scanner.feed(chunk):
+            yield item
+
+
+def iter_array_sync(chunks: Iterator[bytes], key: str) -> Iterator[bytes]:
+    scanner = ArrayScanner(key)
+    for chunk in chunks:
+        yield from scanner.feed(chunk)
+
+
+@lru_cache(maxsize=32)
+def _field_re(field: str) -> re.Pattern:
+    return re.compile(b'"' + re.escape(field.encode()) + rb'"\s*:\s*(' + _STRING + rb'|[^,}\]\s]+)')
+
+
+def peek_field(raw: bytes, field: str) -> str | None:
+    # Valor escalar do primeiro `"field": ...` no elemento, sem decodificar o resto
+    match = _field_re(field).search(raw)
+    if match is None:
+        return None
+    value = match.group(1)
+    if value[:1] == b'"':
+        value = value[1:-1]
+    return value.decode("utf-8", "replace")
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from logs import get_logger
+
+log = get_logger("leader")
+
+# Lease no Mongo: quem não renovar em LEADER_LEASE_TTL segundos perde a vez
+LEADER_LEASE_TTL = float(os.getenv("LEADER_LEASE_TTL", "30"))
+LEADER_RENEW_INTERVAL = float(os.getenv("LEADER_RENEW_INTERVAL", str(LEADER_LEASE_TTL / 3)))
+
+
+# Um documento por lease em scraper_state: {_id, holder, expires_at}
+class LeaderLease:
+    def __init__(self, collection, name: str, ttl: float = LEADER_LEASE_TTL,
+                 renew_interval: float = LEADER_RENEW_INTERVAL):
+        self.collection = collection
+        self.name = name
+        self.ttl = ttl
+        self.renew_interval = renew_interval
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        # Prazo local (monotônico): sem renovar até aqui, para de escrever mesmo sem falar com o Mongo
+        self._deadline = 0.0
+        self.stats = {"acquired": 0, "lost": 0, "renew_errors": 0, "callback_errors": 0}
+
+    async def try_acquire(self) -> bool:
+        now = datetime.now(timezone.utc)
+        t0 = time.monotonic()
+        try:
+            # Renova se é nosso, toma se expirou; se é de outro, o upsert bate no _id e falha
+            doc = await self.collection.find_one_and_update(
+                {"_id": self.name, "$or": [{"holder": self.holder}, {"expires_at": {"$lte": now}}]},
+                {"$set": {"holder": self.holder, "expires_at": now + timedelta(seconds=self.ttl),
+                          "renewed_at": now}},
+                upsert=True, return_document=ReturnDocument.AFTER)
+        except DuplicateKeyError:
+            return False
+        if doc is None or doc.get("holder") != self.holder:
+            return False
+        self._deadline = t0 + self.ttl
+        return True
+
+    async def release(self) -> None:
+        if not self.is_leader:
+            return
+        self.is_leader = False
+        try:
+            await self.collection.delete_one({"_id": self.name, "holder": self.holder})
+        except Exception as e:
+            log.warning("Lease %s não liberado (expira sozinho): %s", self.name, e)
+
+    async def run(self, on_acquired: Callable[[], Awaitable[None]],
+                  on_lost: Callable[[], Awaitable[None]]) -> None:
+        while True:
+            try:
+                held = await self.try_acquire()
+            except Exception as e:
+                self.stats["renew_errors"] += 1
+                log.error("❌ [LEADER] Erro ao renovar lease %s: %s", self.name, e)
+                # Mongo fora: continua líder só enquanto o lease certamente não expirou
+                held = self.is_leader and time.monotonic() < self._deadline
+
+            if held and not self.is_leader:
+                self.is_leader = True
+                self.stats["acquired"] += 1
+                log.info("👑 [LEADER] %s assumido por %s", self.name, self.holder)
+                try:
+                    await on_acquired()
+                except Exception as e:
+                    # Meio iniciado: desfaz o que subiu e devolve o lease; tenta de novo no próximo ciclo
+                    self.stats["callback_errors"] += 1
+                    log.error("❌ [LEADER] Falha ao assumir %s, liberando: %s", self.name, e)
+                    await self._stop(on_lost)
+                    await self.release()
+            elif not held and self.is_leader:
+                self.is_leader = False
+                self.stats["lost"] += 1
+                log.warning("⚠️ [LEADER] %s perdido por %s, parando", self.name, self.holder)
+                await self._stop(on_lost)
+
+            await asyncio.sleep(self.renew_interval)
+
+    async def _stop(self, on_lost: Callable[[], Awaitable[None]]) -> None:
+        try:
+            await on_lost()
+        except Exception as e:
+            self.stats["callback_errors"] += 1
+            log.error("❌ [LEADER] Erro ao parar %s: %s", self.name, e)
+
+    def as_dict(self) -> Dict:
+        return {"name": self.name, "holder": self.holder, "is_leader": self.is_leader, **self.stats}
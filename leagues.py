@@ -0,0 +1,121 @@
+import asyncio
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from logs import get_logger
+
+log = get_logger("leagues")
+
+# ====================== CONFIG ======================
+LEAGUE_RULES_PATH = Path(os.getenv("LEAGUE_RULES_PATH", Path(__file__).with_name("leagues.json")))
+LEAGUE_RULES_RELOAD_INTERVAL = float(os.getenv("LEAGUE_RULES_RELOAD_INTERVAL", "30"))
+LEAGUE_MEMO_MAX = int(os.getenv("LEAGUE_MEMO_MAX", "4096"))
+
+_ESOCCER_RE = re.compile(r'Esoccer|esoccer|ESOCCER|E-SOCCER', re.IGNORECASE)
+
+# (duration contém algum, nome contém algum, resultado); sem condições = sempre casa
+Case = Tuple[Tuple[str, ...], Tuple[str, ...], str]
+# (nome contém algum, nome não contém nenhum, casos em ordem)
+Rule = Tuple[Tuple[str, ...], Tuple[str, ...], Tuple[Case, ...]]
+
+_rules: List[Rule] = []
+_rules_mtime: float | None = None
+_memo: Dict[Tuple[str, str], str] = {}
+
+
+def compile_rules(config: Dict) -> List[Rule]:
+    compiled = []
+    for rule in config.get("rules", []):
+        cases = rule.get("cases") or [{"result": rule["result"]}]
+        compiled.append((
+            tuple(m.upper() for m in rule["match"]),
+            tuple(e.upper() for e in rule.get("exclude", [])),
+            tuple((tuple(d.upper() for d in c.get("duration", [])),
+                   tuple(n.upper() for n in c.get("name", [])),
+                   c["result"])
+                  for c in cases),
+        ))
+    return compiled
+
+
+def load_rules(path: Path = LEAGUE_RULES_PATH) -> None:
+    global _rules, _rules_mtime
+    mtime = path.stat().st_mtime
+    rules = compile_rules(json.loads(path.read_text(encoding="utf-8")))
+    # Troca atômica: tabela nova + memo vazio
+    _rules = rules
+    _rules_mtime = mtime
+    _memo.clear()
+    log.info("✅ [LIGAS] %d regras carregadas de %s", len(rules), path.name)
+
+
+def reload_if_changed(path: Path = LEAGUE_RULES_PATH) -> bool:
+    global _rules_mtime
+    try:
+        mtime = path.stat().st_mtime
+    except OSError as e:
+        log.error("❌ [LIGAS] Arquivo de regras indisponível: %s", e)
+        return False
+    if mtime == _rules_mtime:
+        return False
+
+    try:
+        load_rules(path)
+        return True
+    except Exception as e:
+        # Arquivo inválido: mantém as regras anteriores até a próxima alteração
+        _rules_mtime = mtime
+        log.error("❌ [LIGAS] Erro ao recarregar regras: %s", e)
+        return False
+
+
+async def league_rules_watcher():
+    while True:
+        await asyncio.sleep(LEAGUE_RULES_RELOAD_INTERVAL)
+        reload_if_changed()
+
+
+def _contains_any(text: str, needles: Tuple[str, ...]) -> bool:
+    for needle in needles:
+        if needle in text:
+            return True
+    return False
+
+
+def _apply_rules(name: str, duration: str) -> str:
+    original = name.upper()
+    duration_upper = duration.upper()
+
+    for match, exclude, cases in _rules:
+        if not _contains_any(original, match) or _contains_any(original, exclude):
+            continue
+        for durations, names, result in cases:
+            if not durations and not names:
+                return result
+            if _contains_any(duration_upper, durations) or _contains_any(original, names):
+                return result
+
+    # Garantir prefixo E-SOCCER se não tiver
+    mapped = name.strip() or "UNKNOWN"
+    if "ESOCCER" in mapped.upper() and "E-SOCCER" not in mapped.upper():
+        # Substitui variações de Esoccer por E-SOCCER
+        mapped = _ESOCCER_RE.sub('E-SOCCER', mapped)
+
+    return mapped
+
+
+def map_league_name(name: str, duration: str = "8 min") -> str:
+    key = (name, duration)
+    mapped = _memo.get(key)
+    if mapped is None:
+        mapped = _apply_rules(name, duration)
+        if len(_memo) >= LEAGUE_MEMO_MAX:
+            _memo.clear()
+        _memo[key] = mapped
+    return mapped
+
+
+load_rules()
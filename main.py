@@ -1,625 +1,461 @@
-from fastapi import FastAPI
-from motor.motor_asyncio import AsyncIOMotorClient
-import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import Response, StreamingResponse
 import asyncio
-import re
 import os
+import time
 from datetime import datetime, timezone, timedelta
-from typing import Dict, Set
-from collections import defaultdict
-
-app = FastAPI(title="RW Tips - Esoccer Result Scraper v2.0")
-
-# Fuso horário do usuário (UTC-4)
-USER_TZ = timezone(timedelta(hours=-4))
-
+from typing import Dict, List, Set, Tuple
+
+import export
+import fastjson
+import metrics
+import replay
+import upstream
+import nicks
+from leagues import league_rules_watcher
+from persistence import ensure_indexes, RETENTION_MAX_MATCHES
+from read_model import MatchReadModel, LiveSnapshot
+from hub import BroadcastHub
+from scheduler import PollScheduler
+from logs import get_logger
+from metrics import MONGO_OP_SECONDS, MATCHES_SAVED, CACHE_SIZE
+from ingestion import Ingestion, LIVE_SNAPSHOT_ID, MONGO_DB
+from sources.base import USER_TZ
+from timeline import as_json as timeline_json
+
+log = get_logger("main")
+
+app = FastAPI(title="RW Tips - Esoccer Result Scraper v2.0", default_response_class=fastjson.FastJSONResponse)
 
 # ====================== CONFIG ======================
 MONGO_URI = os.getenv("MONGO_URI")
-client = AsyncIOMotorClient(MONGO_URI)
-db = client["estrelabet_esoccer"]
+# embedded: esta instância disputa o lease e roda os scrapers; off: só API (scrapers no worker.py)
+SCRAPER_MODE = os.getenv("SCRAPER_MODE", "embedded")
+# Sem o lease, de quanto em quanto tempo a API puxa do Mongo o que o líder gravou
+READ_REFRESH_INTERVAL = float(os.getenv("READ_REFRESH_INTERVAL", "2"))
+READ_REFRESH_BATCH = int(os.getenv("READ_REFRESH_BATCH", "1000"))
+
+client = replay.mongo_client(MONGO_URI)
+db = client[MONGO_DB]
 matches = db["finished_matches"]
+scraper_state = db["scraper_state"]
+hub = BroadcastHub()
+scheduler = PollScheduler()
+# UPSTREAM_MODE=record|replay: grava ou serve offline as respostas dos bookmakers (ligado no startup)
+upstream_replay: replay.Recorder | replay.Cassette | None = None
+# Tarefas de fundo do processo; o shutdown cancela todas antes de fechar a ingestão
+background_tasks: List[asyncio.Task] = []
+
+# Visão pública do que está ao vivo agora (/api/live)
+live_snapshot = LiveSnapshot()
+
+# ====================== INGESTÃO ======================
+# Fontes + pipeline + writer; só rodam enquanto esta instância tem o lease "scraper"
+ingestion = Ingestion(db, hub=hub, snapshot=live_snapshot, scheduler=scheduler)
+match_writer = ingestion.writer
+pipeline = ingestion.pipeline
+altenar = ingestion.altenar
+superbet = ingestion.superbet
+runtime = ingestion.runtime
+match_stats = ingestion.match_stats
 
-LIVE_API = "https://sb2frontend-altenar2.biahosted.com/api/widget/GetLiveEvents?culture=pt-BR&timezoneOffset=-180&integration=estrelabet&deviceType=1&numFormat=en-GB&countryCode=BR&eventCount=0&sportId=66&catIds=2085,1571,1728,1594,2086,1729,2130"
-EVENT_API = "https://sb2frontend-altenar2.biahosted.com/api/widget/GetEventDetails?culture=pt-BR&timezoneOffset=-180&integration=estrelabet&deviceType=1&numFormat=en-GB&countryCode=BR&eventId={}&showNonBoosts=false"
-TRACKER_API = "https://sb2frontend-altenar2.biahosted.com/api/widget/GetEventTrackerInfo?culture=pt-BR&timezoneOffset=-180&integration=estrelabet&deviceType=1&numFormat=en-GB&countryCode=BR&eventId={}"
-
-SUPERBET_STRUCT_API = "https://production-superbet-offer-br.freetls.fastly.net/v2/pt-BR/struct?currentStatus=active"
-SUPERBET_HISTORY_API = "https://production-superbet-offer-br.freetls.fastly.net/v2/pt-BR/events/by-date?compression=true&sportId=75&currentStatus=finished&startDate={}&endDate={}"
-
-previous_event_ids = set()
-superbet_seen_match_ids = set()
-
-# Cache de torneios Superbet
-superbet_tournaments = {}
-
-
-# Cache expandido
-live_cache = defaultdict(lambda: {
-    "home_score": 0,
-    "away_score": 0,
-    "ht_home": 0,
-    "ht_away": 0,
-    "home_raw": "",
-    "away_raw": "",
-    "league": "",
-    "started_at": None,
-    "last_seen": datetime.now(USER_TZ)
-})
-
-
-# ====================== AUXILIARES ======================
-
-
-def extract_pure_nick_canonical(raw: str) -> str:
-    if not raw or not isinstance(raw, str):
-        return ""
-
-    # Common team names and abbreviations
-    common_teams = [
-        'Spain', 'France', 'Germany', 'Italy', 'Brazil', 'Argentina', 'Portugal', 'Netherlands', 'England', 'Belgium',
-        'Real Madrid', 'Barcelona', 'FC Bayern', 'Man City', 'Man Utd', 'Liverpool', 'PSG', 'Juventus', 'Arsenal', 'Chelsea',
-        'Borussia Dortmund', 'Bayer Leverkusen', 'Napoli', 'AC Milan', 'Inter', 'Inter de Milão', 'Atletico Madrid', 'Sevilla',
-        'Piemonte Calcio', 'Latium', 'Genoa', 'Roma', 'RB Leipzig', 'Real Sociedad', 'Athletic Club', 'Aston Villa', 'Spurs'
-    ]
-    known_acronyms = ['PSG', 'RMA', 'FCB', 'MCI', 'MUN', 'LIV', 'CHE', 'ARS',
-                      'TOT', 'JUV', 'MIL', 'INT', 'NAP', 'BVB', 'ATM', 'FC', 'CF', 'SC']
-
-    # 1. Parentheses logic
-    paren_match = re.search(r'(.*?)\((.*?)\)', raw)
-    if paren_match:
-        part1, part2 = paren_match.group(
-            1).strip(), paren_match.group(2).strip()
-
-        is_p1_caps = bool(
-            re.match(r'^[A-Z0-9\s_]+$', part1)) and len(part1) > 1
-        is_p2_caps = bool(
-            re.match(r'^[A-Z0-9\s_]+$', part2)) and len(part2) > 1
-
-        if is_p2_caps and not is_p1_caps:
-            return part2
-        if is_p1_caps and not is_p2_caps:
-            return part1
-
-        if any(team in part1 for team in common_teams):
-            return part2
-        if any(team in part2 for team in common_teams):
-            return part1
-
-        return part2
-
-    # 2. No parentheses logic
-    clean_str = raw.strip()
-
-    if " " not in clean_str and re.match(r'^[A-Z0-9_]+$', clean_str) and clean_str not in known_acronyms:
-        return clean_str
-
-    # Strip known teams out completely
-    team_words_to_remove = sorted(
-        common_teams + known_acronyms, key=len, reverse=True)
-    for team in team_words_to_remove:
-        clean_str = re.sub(rf'\b{re.escape(team)}\b',
-                           '', clean_str, flags=re.IGNORECASE).strip()
-
-    clean_str = re.sub(r'^[-·]+|[-·]+$', '', clean_str).strip()
-    clean_str = re.sub(r'\s+', ' ', clean_str)
-
-    if clean_str:
-        return clean_str
-
-    # Ultimate fallback
-    parts = raw.split()
-    if len(parts) > 1:
-        return parts[-1]
-
-    return raw.strip()
-
-
-def map_league_name(name: str, duration: str = "8 min") -> str:
-    original = name.upper()
-
-    # Normalização de Valkyrie / Valhalla
-    if "VALKYRIE" in original or "VALKIRYE" in original:
-        return "VALKYRIE CUP"
-    if "VALHALLA" in original:
-        return "VALHALLA CUP"
-
-    if "H2H" in original:
-        return "H2H GG LEAGUE"
-
-    if "BATTLE" in original:
-        if "6" in duration or "3 MIN" in duration.upper() or "VOLTA" in original:
-            return "VOLTA - 6 MIN"
-        if "12" in duration:
-            return "BATTLE - 12 MIN"
-        return "BATTLE - 8 MIN"
-
-    if "GT " in original or "GT LEAGUES" in original:
-        return "GT LEAGUES"
-
-    if "EAL" in original or "ADRIATIC" in original:
-        return "ADRIATIC"
-
-    if "CHAMPIONS LEAGUE" in original and "BATTLE" not in original:
-        if "12" in duration or "6 MIN" in duration.upper():
-            return "CHAMPIONS LEAGUE - 12 MIN"
-        return "CHAMPIONS LEAGUE"
-
-    if "CLA" in original or "CYBER LIVE ARENA" in original:
-        return "CLA LEAGUE"
-
-    # Garantir prefixo E-SOCCER se não tiver
-    mapped = name.strip() or "UNKNOWN"
-    if "ESOCCER" in mapped.upper() and "E-SOCCER" not in mapped.upper():
-        # Substitui variações de Esoccer por E-SOCCER
-        mapped = re.sub(r'Esoccer|esoccer|ESOCCER|E-SOCCER',
-                        'E-SOCCER', mapped, flags=re.IGNORECASE)
-
-    return mapped
-
-# ====================== FETCH ======================
-
-
-async def fetch_event_details(event_id: str) -> Dict:
-    url = EVENT_API.format(event_id)
-    async with httpx.AsyncClient(timeout=10) as session:
-        r = await session.get(url)
-        r.raise_for_status()
-        data = r.json()
-
-        score = data.get('score', [0, 0])
-        ft_home = int(score[0]) if len(score) > 0 else 0
-        ft_away = int(score[1]) if len(score) > 1 else 0
-
-        ht_home = ht_away = 0
+# ====================== ENDPOINTS ======================
 
-        competitors = data.get('competitors', [])
-        home_raw = competitors[0].get('name', '') if competitors else ''
-        away_raw = competitors[1].get(
-            'name', '') if len(competitors) > 1 else ''
 
-        return {
-            "home_raw": home_raw,
-            "away_raw": away_raw,
-            "ht_home": ht_home,
-            "ht_away": ht_away,
-            "ft_home": ft_home,
-            "ft_away": ft_away,
-            "league": data.get('championshipName', data.get('leagueName', ''))
-        }
+@app.get("/health")
+async def health():
+    return {
+        "status": "ok",
+        "scraper_mode": SCRAPER_MODE,
+        "leader": ingestion.lease.as_dict(),
+        "time": datetime.now(USER_TZ).isoformat(),
+        "http": upstream.connection_stats(),
+        "http_cache": upstream.cache_stats(),
+        "writer": match_writer.stats,
+        "caches": {
+            "live_cache": altenar.live_cache.stats(),
+            "superbet_seen_ids": superbet.seen_ids.stats(),
+            "nicks": nicks.cache_stats(),
+            "read_model": read_model.stats()
+        },
+        "stats": match_stats.as_dict(),
+        "stream": hub.stats(),
+        "superbet_parse": superbet.parse_stats,
+        "pipeline": pipeline.stats,
+        "sources": runtime.stats(),
+        "scheduler": scheduler.stats()
+    }
+
+
+
+HISTORY_DAYS = 5
+HISTORY_TOTAL_TTL = float(os.getenv("HISTORY_TOTAL_TTL", "30"))
+_history_total = {"value": 0, "expires": 0.0}
 
 
-async def fetch_event_tracker_info(event_id: str) -> Dict | None:
-    url = TRACKER_API.format(event_id)
-    try:
-        async with httpx.AsyncClient(timeout=10) as session:
-            r = await session.get(url)
-            r.raise_for_status()
-            data = r.json()
-            score = data.get("score", [0, 0])
-            home = int(score[0]) if len(score) > 0 else 0
-            away = int(score[1]) if len(score) > 1 else 0
-            return {"ft_home": home, "ft_away": away, "ht_home": 0, "ht_away": 0}
-    except Exception as e:
-        print(f"[WARN] Tracker falhou {event_id}: {e}")
-        return None
+def _to_user_tz(dt: datetime) -> datetime:
+    # Mongo devolve naive em UTC
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(USER_TZ)
+
+
+def serialize_match(doc: Dict) -> Dict:
+    # Datetimes ficam nativos (no fuso do usuário); o FastJSONResponse os escreve em ISO 8601
+    doc.pop("_id", None)
+    doc.pop("updated_at", None)
+    # Bytes empacotados: só saem decodificados, quando pedidos (?timeline=1, export)
+    doc.pop("timeline", None)
+    for key in ("finished_at", "started_at"):
+        if isinstance(doc.get(key), datetime):
+            doc[key] = _to_user_tz(doc[key])
+    return doc
+
+
+def serialize_with_timeline(doc: Dict) -> Dict:
+    packed = doc.get("timeline")
+    doc = serialize_match(doc)
+    doc["timeline"] = timeline_json(packed) if packed else None
+    return doc
+
+
+# Cópia em memória do que está no Mongo; os scrapers atualizam a cada flush do MatchWriter
+read_model = MatchReadModel(max_entries=RETENTION_MAX_MATCHES, serialize=serialize_match)
+match_writer.listeners.append(read_model.upsert_many)
+
+
+def publish_finished(batch):
+    # Roda depois do read_model, então reaproveita o doc já serializado
+    for doc in batch:
+        hub.publish("finished", read_model.get(doc["event_id"]) or serialize_match(dict(doc)))
+
+
+match_writer.listeners.append(publish_finished)
+
+
+def count_saved(batch):
+    for doc in batch:
+        MATCHES_SAVED.inc(source=doc.get("source", ""), league=doc.get("league_mapped", ""))
+
+
+match_writer.listeners.append(count_saved)
+
+# Tamanhos lidos só na hora do scrape de /metrics
+CACHE_SIZE.set_function(lambda: len(altenar.live_cache), cache="live_cache")
+CACHE_SIZE.set_function(lambda: len(superbet.seen_ids), cache="superbet_seen_ids")
+CACHE_SIZE.set_function(lambda: read_model.stats()["size"], cache="read_model")
+CACHE_SIZE.set_function(lambda: nicks.cache_stats()["size"], cache="nicks")
+CACHE_SIZE.set_function(lambda: match_writer.stats["pending"], cache="writer_pending")
+CACHE_SIZE.set_function(lambda: hub.stats()["subscribers"], cache="stream_subscribers")
+CACHE_SIZE.set_function(lambda: altenar.finished_queue.qsize(), cache="finished_queue")
+CACHE_SIZE.set_function(lambda: pipeline.queue.qsize(), cache="pipeline_queue")
+
+
+# ====================== RÉPLICA DE LEITURA ======================
+async def latest_update() -> datetime | None:
+    doc = await matches.find_one({"updated_at": {"$exists": True}}, {"updated_at": 1}, sort=[("updated_at", -1)])
+    return doc["updated_at"] if doc else None
+
+
+async def refresh_finished(since: datetime | None) -> datetime | None:
+    query = {"updated_at": {"$gt": since}} if since else {"updated_at": {"$exists": True}}
+    with MONGO_OP_SECONDS.time(op="read_model_refresh"):
+        docs = await matches.find(query).sort("updated_at", 1).limit(READ_REFRESH_BATCH).to_list(length=None)
+    if docs:
+        since = docs[-1]["updated_at"]
+        read_model.upsert_many(docs)
+        match_stats.apply_many(docs)
+        publish_finished(docs)
+    return since
 
-# ====================== SUPERBET SCRAPERS ======================
-SUPERBET_STRUCT_API = "https://production-superbet-offer-br.freetls.fastly.net/v2/pt-BR/struct"
 
-# ... (omitting lines between for brevity, wait, I can just replace the whole function and the constant if I select the right lines. Actually I will just replace `superbet_struct_cacher_loop` here, and use the hardcoded url inside it to be safe, or just replace the function body.)
+def publish_live_changes(old_rows, new_rows) -> None:
+    # Mesmo critério do scraper: SSE "live" só para jogo novo ou placar alterado
+    old = {r.get("event_id"): r for r in old_rows}
+    for row in new_rows:
+        prev = old.get(row.get("event_id"))
+        if prev is None or (prev.get("home_score"), prev.get("away_score")) != (row.get("home_score"), row.get("away_score")):
+            hub.publish("live", row)
 
 
-async def superbet_struct_cacher_loop():
-    print("🚀 Inciando cacher de torneios da Superbet (1h)")
-    # URL mudou para pegar todos os torneios, mesmo os recém-fechados
-    url = "https://production-superbet-offer-br.freetls.fastly.net/v2/pt-BR/struct"
-    while True:
-        try:
-            async with httpx.AsyncClient(timeout=20) as session:
-                r = await session.get(url, headers={'User-Agent': 'Mozilla/5.0'})
-                data = r.json()
-                tournaments = data.get('data', {}).get('tournaments', [])
-                count = 0
-
-                # Se for lista (como é no endpoint sem currentStatus)
-                if isinstance(tournaments, list):
-                    for t_data in tournaments:
-                        t_id = str(t_data.get('id', ''))
-                        name = t_data.get('localNames', {}).get(
-                            'pt-BR', t_data.get('name', ''))
-                        footer = str(t_data.get('footer', ''))
-                        duration_match = re.search(
-                            r'(\d+x\d+)', footer, re.IGNORECASE)
-                        duration = f"{duration_match.group(1)} min" if duration_match else "12 min"
-                        if t_id:
-                            superbet_tournaments[t_id] = {
-                                "name": name, "duration": duration}
-                            count += 1
-
-                # Se por algum motivo voltar a ser dict
-                elif isinstance(tournaments, dict):
-                    for t_id, t_data in tournaments.items():
-                        name = t_data.get('localNames', {}).get(
-                            'pt-BR', t_data.get('name', ''))
-                        footer = str(t_data.get('footer', ''))
-                        duration_match = re.search(
-                            r'(\d+x\d+)', footer, re.IGNORECASE)
-                        duration = f"{duration_match.group(1)} min" if duration_match else "12 min"
-                        superbet_tournaments[str(t_id)] = {
-                            "name": name, "duration": duration}
-                        count += 1
-
-                print(
-                    f"✅ [SUPERBET STRUCT] Cache atualizado com {count} torneios.")
-        except Exception as e:
-            print(f"❌ [SUPERBET STRUCT] Erro ao atualizar: {e}")
+async def refresh_live() -> None:
+    state = await scraper_state.find_one({"_id": LIVE_SNAPSHOT_ID}, {"version": 1})
+    if not state or state.get("version") == live_snapshot.version:
+        return
+    state = await scraper_state.find_one({"_id": LIVE_SNAPSHOT_ID})
+    rows = state.get("rows", [])
+    publish_live_changes(live_snapshot.rows, rows)
+    live_snapshot.update(rows, version=state["version"])
 
-        await asyncio.sleep(3600)
 
+# /ready de uma instância sem o lease: já puxou pelo menos uma vez o que o líder gravou
+replica_synced = False
 
-async def superbet_scraper_loop():
-    print("⏳ Aguardando cache de torneios da Superbet carregar...")
-    while not superbet_tournaments:
-        await asyncio.sleep(1)
 
-    print("🚀 Superbet History Scraper Iniciado (30s)")
+async def read_replica_loop(since: datetime | None):
+    # Instância sem o lease: read model e /api/live seguem o que o líder grava no Mongo
+    global replica_synced
+    following = True
     while True:
+        await asyncio.sleep(READ_REFRESH_INTERVAL)
+        if ingestion.lease.is_leader:
+            # Os listeners do MatchWriter já mantêm tudo em dia
+            following = False
+            continue
         try:
-            # Query dates always in UTC for Superbet API
-            now_utc = datetime.now(timezone.utc)
-            past_utc = now_utc - timedelta(hours=3)
-
-            start_date = past_utc.strftime('%Y-%m-%d+%H:%M:%S')
-            end_date = now_utc.strftime('%Y-%m-%d+%H:%M:%S')
-
-
-            url = SUPERBET_HISTORY_API.format(start_date, end_date)
-
-            async with httpx.AsyncClient(timeout=30) as session:
-                r = await session.get(url, headers={'Accept': 'application/json', 'User-Agent': 'Mozilla/5.0'})
-                if r.status_code == 200:
-                    data = r.json()
-                    events = data.get('data', [])
-
-                    saved_count = 0
-                    for event in events:
-                        event_id = str(event.get('eventId'))
-
-                        if event_id in superbet_seen_match_ids:
-                            continue
-
-                        match_name = event.get('matchName', '')
-                        parts = match_name.split('·')
-                        home_raw = parts[0].strip() if len(parts) > 0 else ''
-                        away_raw = parts[1].strip() if len(parts) > 1 else ''
-
-                        home_nick = extract_pure_nick_canonical(home_raw)
-                        away_nick = extract_pure_nick_canonical(away_raw)
-
-                        meta = event.get('metadata', {})
-                        ft_home = int(meta.get('homeTeamScore', 0))
-                        ft_away = int(meta.get('awayTeamScore', 0))
-
-                        ht_home = 0
-                        ht_away = 0
-                        periods = meta.get('periods', [])
-                        for p in periods:
-                            if p.get('num') == 1:
-                                ht_home = int(p.get('homeTeamScore', 0))
-                                ht_away = int(p.get('awayTeamScore', 0))
-                                break
-
-                        t_id = str(event.get('tournamentId'))
-                        cached_tournament = superbet_tournaments.get(t_id, {})
-                        league_raw_name = cached_tournament.get(
-                            'name', f"Superbet League {t_id}")
-                        duration = cached_tournament.get('duration', '12 min')
-                        league_mapped = map_league_name(
-                            league_raw_name, duration)
-
-                        utc_date = event.get('utcDate')
-                        finished_at = datetime.fromisoformat(utc_date.replace(
-                            'Z', '+00:00')).astimezone(USER_TZ) if utc_date else datetime.now(USER_TZ)
-
-
-                        doc = {
-                            "event_id": f"sb-{event_id}",
-                            "league_mapped": league_mapped,
-                            "duration": duration,
-                            "home_raw": home_raw,
-                            "away_raw": away_raw,
-                            "home_nick": home_nick,
-                            "away_nick": away_nick,
-                            "home_score_ht": ht_home,
-                            "away_score_ht": ht_away,
-                            "home_score_ft": ft_home,
-                            "away_score_ft": ft_away,
-                            "started_at": finished_at - timedelta(minutes=15),
-                            "finished_at": finished_at,
-                            "source": "superbet_api"
-                        }
-
-                        await matches.update_one({"event_id": doc["event_id"]}, {"$set": doc}, upsert=True)
-                        superbet_seen_match_ids.add(event_id)
-                        saved_count += 1
-                        print(
-                            f"✅ SUPERBET: {home_nick} {ft_home}-{ft_away} {away_nick} ({league_mapped})")
-
-                    if saved_count > 0:
-                        total_matches = await matches.count_documents({})
-                        if total_matches > 2000:
-                            excess = total_matches - 2000
-                            oldest_matches = await matches.find({}, {"_id": 1}).sort("finished_at", 1).limit(excess).to_list(length=excess)
-                            old_ids = [m["_id"] for m in oldest_matches]
-                            if old_ids:
-                                await matches.delete_many({"_id": {"$in": old_ids}})
-                                print(
-                                    f"🧹 [CLEANUP] Superbet {len(old_ids)} jogos excluídos (limite 2000).")
-
+            if not following:
+                # Acabou de perder o lease: o read model está em dia até agora
+                since = await latest_update()
+                following = True
+            # Rebuild feito fora (python stats.py rebuild): só o líder grava, então a réplica precisa olhar
+            await match_stats.reload_if_rebuilt(matches)
+            since = await refresh_finished(since)
+            await refresh_live()
+            replica_synced = True
         except Exception as e:
-            print(f"Superbet Scraper error: {e}")
+            log.error("Read replica error: %s", e)
 
-        await asyncio.sleep(30)
-
-# ====================== SCRAPER LOOP ======================
 
+def encode_history_cursor(doc: Dict) -> str | None:
+    finished_at = doc.get("finished_at")
+    if not finished_at or not doc.get("event_id"):
+        return None
+    if isinstance(finished_at, datetime):
+        finished_at = finished_at.isoformat()
+    return f"{finished_at},{doc['event_id']}"
 
-async def scraper_loop():
-    global previous_event_ids
-    print("🚀 Scraper iniciado - cache + detecção por desaparecimento")
 
-    while True:
-        try:
-            async with httpx.AsyncClient(timeout=20) as session:
-                r = await session.get(LIVE_API)
-                data = r.json()
-
-                current_events = data.get('events', [])
-                current_event_ids = set()
-                competitors_dict = {c['id']: c['name']
-                                    for c in data.get('competitors', [])}
-                champs_dict = {c['id']: c['name']
-                               for c in data.get('champs', [])}
-
-                for event in current_events:
-                    # Permite SportId 66 (Esoccer Altenar) e 146 (E-Soccer Geral)
-                    if event.get('sportId') not in [66, 146]:
-                        continue
-                    event_id = str(event['id'])
-                    current_event_ids.add(event_id)
-
-                    # Atualiza cache
-                    score_raw = event.get('score', [0, 0])
-                    home = int(score_raw[0]) if len(score_raw) > 0 else 0
-                    away = int(score_raw[1]) if len(score_raw) > 1 else 0
-
-                    live_time = str(
-                        event.get('liveTime', event.get('ls', ''))).lower()
-                    cached_ht_home = live_cache[event_id].get("ht_home", 0)
-                    cached_ht_away = live_cache[event_id].get("ht_away", 0)
-
-                    if "1" in live_time or "int" in live_time:
-                        ht_home = home
-                        ht_away = away
-                    else:
-                        ht_home = cached_ht_home
-                        ht_away = cached_ht_away
-
-                    competitor_ids = event.get('competitorIds', [])
-                    if len(competitor_ids) >= 2:
-                        home_raw = competitors_dict.get(competitor_ids[0], '')
-                        away_raw = competitors_dict.get(competitor_ids[1], '')
-                    else:
-                        home_raw, away_raw = '', ''
-
-                    if not home_raw or not away_raw:
-                        parts = str(event.get('name', '')).split(' vs. ')
-                        if len(parts) == 2:
-                            home_raw, away_raw = parts[0].strip(
-                            ), parts[1].strip()
-
-                    league = champs_dict.get(event.get('champId'), '')
-
-                    # Captura startDate da API
-                    start_date_str = event.get('startDate', '')
-                    started_at = None
-                    if start_date_str:
-                        try:
-                            # Converte do UTC da API para o timezone do usuário
-                            started_at = datetime.fromisoformat(
-                                start_date_str.replace('Z', '+00:00')).astimezone(USER_TZ)
-                        except:
-                            started_at = None
-
-
-                    live_cache[event_id] = {
-                        "home_score": home,
-                        "away_score": away,
-                        "ht_home": ht_home,
-                        "ht_away": ht_away,
-                        "home_raw": home_raw,
-                        "away_raw": away_raw,
-                        "league": league,
-                        "started_at": started_at,
-                        "last_seen": datetime.now(USER_TZ)
-                    }
-
-                    print(
-                        f"[DEBUG LIVE] {event_id}: {home_raw} {home}-{away} {away_raw}")
-
-                print(f"[DEBUG] Eventos live atuais: {len(current_event_ids)}")
-
-                finished_ids = previous_event_ids - current_event_ids
-
-                for event_id in finished_ids:
-                    print(f"[INFO] Finalizado detectado: {event_id}")
-                    cached = live_cache[event_id]
-                    home_raw = cached["home_raw"]
-                    away_raw = cached["away_raw"]
-                    home_nick = extract_pure_nick_canonical(home_raw)
-                    away_nick = extract_pure_nick_canonical(away_raw)
-                    league_mapped = map_league_name(cached["league"])
-
-                    placar_final = {
-                        "ft_home": cached["home_score"],
-                        "ft_away": cached["away_score"],
-                        "ht_home": cached.get("ht_home", 0),
-                        "ht_away": cached.get("ht_away", 0)
-                    }
-
-                    # Tenta details
-                    try:
-                        details = await fetch_event_details(event_id)
-                        dh, da = details.get(
-                            "ft_home", 0), details.get("ft_away", 0)
-                        if dh >= placar_final["ft_home"] and da >= placar_final["ft_away"] and (dh > 0 or da > 0):
-                            placar_final["ft_home"] = dh
-                            placar_final["ft_away"] = da
-                        hth = details.get("ht_home", 0)
-                        hta = details.get("ht_away", 0)
-                        if hth >= placar_final["ht_home"] and hta >= placar_final["ht_away"] and (hth > 0 or hta > 0):
-                            placar_final["ht_home"] = hth
-                            placar_final["ht_away"] = hta
-                    except:
-                        pass
-
-                    tracker = await fetch_event_tracker_info(event_id)
-                    if tracker:
-                        th, ta = tracker.get(
-                            "ft_home", 0), tracker.get("ft_away", 0)
-                        if th >= placar_final["ft_home"] and ta >= placar_final["ft_away"] and (th > 0 or ta > 0):
-                            placar_final["ft_home"] = th
-                            placar_final["ft_away"] = ta
-
-                    # Altenar DB Sync - Valhalla, Valkyrie, Adriatic, CLA, H2H
-                    allowed_alt = ["VALHALLA", "VALKYRIE", "VALKIRYE", "ADRIATIC", "CLA", "H2H", "EAL", "CYBER LIVE ARENA"]
-                    
-                    is_special_league = any(x in league_mapped.upper() for x in ["VALHALLA", "VALKYRIE"])
-                    is_cup = "CUP" in cached["league"].upper()
-                    
-                    # Se for Valhalla ou Valkyrie, deve ser CUP (para filtrar basquete)
-                    if is_special_league and not is_cup:
-                        print(f"⏭️ ALTENAR IGNORADO (Basquete detectado): {home_nick} vs {away_nick} na liga {cached['league']}")
-                        continue
-
-                    if any(x in league_mapped.upper() for x in allowed_alt) or any(x in cached["league"].upper() for x in allowed_alt):
-                        doc = {
-                            "event_id": event_id,
-                            "league_mapped": league_mapped,
-                            "home_raw": home_raw,
-                            "away_raw": away_raw,
-                            "home_nick": home_nick,
-                            "away_nick": away_nick,
-                            "home_score_ht": placar_final["ht_home"],
-                            "away_score_ht": placar_final["ht_away"],
-                            "home_score_ft": placar_final["ft_home"],
-                            "away_score_ft": placar_final["ft_away"],
-                            "started_at": cached.get("started_at"),
-                            "finished_at": datetime.now(USER_TZ),
-                            "source": "desaparecimento_cache_tracker"
-
-                        }
-
-                        await matches.update_one({"event_id": event_id}, {"$set": doc}, upsert=True)
-                        print(
-                            f"✅ ALTENAR SALVO: {home_nick} {placar_final['ft_home']}-{placar_final['ft_away']} {away_nick} (HT: {placar_final['ht_home']}-{placar_final['ht_away']})")
-                    else:
-                        print(
-                            f"⏭️ ALTENAR IGNORADO (Não mapeado): {home_nick} vs {away_nick} na liga {league_mapped}")
-
-                if finished_ids:
-                    # Limita a coleção para manter no máximo 1000 jogos
-                    total_matches = await matches.count_documents({})
-                    if total_matches > 1000:
-                        excess = total_matches - 1000
-                        oldest_matches = await matches.find({}, {"_id": 1}).sort("finished_at", 1).limit(excess).to_list(length=excess)
-                        old_ids = [m["_id"] for m in oldest_matches]
-                        if old_ids:
-                            await matches.delete_many({"_id": {"$in": old_ids}})
-                            print(
-                                f"🧹 [CLEANUP] {len(old_ids)} jogos mais antigos excluídos para manter no máximo 1000.")
-
-                previous_event_ids = current_event_ids
+def decode_history_cursor(cursor: str) -> Tuple[datetime, str] | None:
+    finished_at, sep, event_id = cursor.partition(",")
+    if not sep or not event_id:
+        return None
+    try:
+        dt = datetime.fromisoformat(finished_at)
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=USER_TZ)
+    return dt, event_id
 
-        except Exception as e:
-            print(f"Scraper error: {e}")
 
-        await asyncio.sleep(8)
+def keyset_query(before: Tuple[datetime, str]) -> Dict:
+    # Keyset em (finished_at desc, event_id desc), o mesmo do índice
+    dt, event_id = before
+    return {"$or": [
+        {"finished_at": {"$lt": dt}},
+        {"finished_at": dt, "event_id": {"$lt": event_id}},
+    ]}
 
-# ====================== ENDPOINTS ======================
 
+def project_fields(doc: Dict, fields: Set[str] | None) -> Dict:
+    if not fields:
+        return doc
+    return {k: v for k, v in doc.items() if k in fields}
 
-@app.get("/health")
-async def health():
-    return {"status": "ok", "time": datetime.now(USER_TZ).isoformat()}
 
+async def history_total(since: datetime) -> int:
+    # Total exato, mas recontado no máximo a cada HISTORY_TOTAL_TTL segundos
+    now = time.monotonic()
+    if now >= _history_total["expires"]:
+        with MONGO_OP_SECONDS.time(op="history_count"):
+            _history_total["value"] = await matches.count_documents({"finished_at": {"$gte": since}})
+        _history_total["expires"] = now + HISTORY_TOTAL_TTL
+    return _history_total["value"]
 
 
 @app.get("/api/history")
-async def get_history(page: int = 1, limit: int = 30):
-    five_days_ago = datetime.now(USER_TZ) - timedelta(days=5)
-
-    skip = (page - 1) * limit
-    cursor = matches.find({"finished_at": {"$gte": five_days_ago}}).sort(
-        "finished_at", -1).skip(skip).limit(limit)
-    results = await cursor.to_list(length=limit)
-    for r in results:
-        r.pop("_id", None)
-        if hasattr(r.get("finished_at"), "isoformat"):
-            # Ensure it is aware of timezone then convert to user local
-            dt = r["finished_at"]
-            if dt.tzinfo is None:
-                dt = dt.replace(tzinfo=timezone.utc)
-            r["finished_at"] = dt.astimezone(USER_TZ).isoformat()
-        if hasattr(r.get("started_at"), "isoformat"):
-            dt = r["started_at"]
-            if dt.tzinfo is None:
-                dt = dt.replace(tzinfo=timezone.utc)
-            r["started_at"] = dt.astimezone(USER_TZ).isoformat()
-
-
-    total = await matches.count_documents({"finished_at": {"$gte": five_days_ago}})
-    return {"results": results, "page": page, "total": total}
+async def get_history(page: int = 1, limit: int = 30, before: str | None = None, fields: str | None = None):
+    since = datetime.now(USER_TZ) - timedelta(days=HISTORY_DAYS)
+
+    selected = None
+    if fields:
+        # event_id e finished_at sempre vêm junto para montar o próximo cursor
+        selected = {"event_id", "finished_at", *(f.strip() for f in fields.split(",") if f.strip())}
+
+    keyset = None
+    if before:
+        keyset = decode_history_cursor(before)
+        if keyset is None:
+            return {"error": "invalid cursor"}
+
+    if read_model.loaded:
+        rows = read_model.history(since, limit, skip=0 if keyset else (page - 1) * limit, before=keyset)
+        results = [project_fields(r, selected) for r in rows]
+        total = read_model.count_since(since)
+    else:
+        query = {"finished_at": {"$gte": since}}
+        if keyset:
+            query = {"$and": [query, keyset_query(keyset)]}
+        projection = {"_id": 0, **{f: 1 for f in selected}} if selected else {"_id": 0}
+
+        cursor = matches.find(query, projection).sort(
+            [("finished_at", -1), ("event_id", -1)])
+        if not keyset:
+            cursor = cursor.skip((page - 1) * limit)
+
+        with MONGO_OP_SECONDS.time(op="history_find"):
+            results = await cursor.limit(limit).to_list(length=limit)
+        for r in results:
+            serialize_match(r)
+        total = await history_total(since)
+
+    next_cursor = encode_history_cursor(results[-1]) if len(results) == limit else None
+    return fastjson.FastJSONResponse({"results": results, "page": page, "total": total, "next_cursor": next_cursor})
+
+
+@app.get("/api/export")
+async def export_matches(request: Request, start: str | None = None, end: str | None = None,
+                         league: str = "", source: str = "", format: str = "ndjson", gzip: bool | None = None):
+    # Histórico completo para análise: sem paginação nem count, direto do cursor do Mongo em lotes
+    fmt = format.lower()
+    if fmt not in export.available_formats():
+        return fastjson.FastJSONResponse(
+            {"error": f"unsupported format: {format}", "formats": export.available_formats()}, status_code=400)
+    try:
+        start_dt, end_dt = export.parse_bound(start), export.parse_bound(end)
+    except ValueError:
+        return fastjson.FastJSONResponse({"error": "invalid start/end (ISO 8601)"}, status_code=400)
+
+    query = export.build_query(start_dt, end_dt, league or None, source or None)
+    # ndjson leva a linha do tempo decodificada; os formatos tabulares ficam nas colunas fixas
+    serialize = serialize_with_timeline if fmt == "ndjson" else serialize_match
+    batches = export.counted(export.iter_batches(matches, query, serialize), fmt)
+    body = export.encode(batches, fmt)
+
+    media_type, ext = export.FORMATS[fmt]
+    headers = {"Content-Disposition": f'attachment; filename="matches.{ext}"', "Cache-Control": "no-store"}
+    if gzip is None:
+        # Parquet/Arrow já vêm compactados; texto segue o Accept-Encoding
+        gzip = fmt not in export.ARROW_FORMATS and "gzip" in request.headers.get("accept-encoding", "")
+    if gzip:
+        body = export.gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    return StreamingResponse(body, media_type=media_type, headers=headers)
 
 
 @app.get("/api/finished/{event_id}")
-async def get_by_event_id(event_id: str):
-    doc = await matches.find_one({"event_id": event_id})
+async def get_by_event_id(event_id: str, timeline: bool = False):
+    # O read model não guarda a linha do tempo; com ?timeline=1 vai direto ao Mongo pelo índice de event_id
+    if not timeline:
+        cached = read_model.get(event_id)
+        if cached is not None:
+            return fastjson.FastJSONResponse(cached)
+
+    with MONGO_OP_SECONDS.time(op="find_one"):
+        doc = await matches.find_one({"event_id": event_id})
     if doc:
-        doc.pop("_id", None)
-        if hasattr(doc.get("finished_at"), "isoformat"):
-            dt = doc["finished_at"]
-            if dt.tzinfo is None:
-                dt = dt.replace(tzinfo=timezone.utc)
-            doc["finished_at"] = dt.astimezone(USER_TZ).isoformat()
-        if hasattr(doc.get("started_at"), "isoformat"):
-            dt = doc["started_at"]
-            if dt.tzinfo is None:
-                dt = dt.replace(tzinfo=timezone.utc)
-            doc["started_at"] = dt.astimezone(USER_TZ).isoformat()
+        return fastjson.FastJSONResponse(serialize_with_timeline(doc) if timeline else serialize_match(doc))
+    return {"error": "not found"}
 
 
-        return doc
-    return {"error": "not found"}
+@app.get("/api/stats/player/{nick}")
+async def get_player_stats(nick: str):
+    stats = match_stats.player(nick)
+    if stats is None:
+        return {"error": "not found"}
+    return fastjson.FastJSONResponse(stats)
+
+
+@app.get("/api/stats/h2h/{a}/{b}")
+async def get_h2h_stats(a: str, b: str):
+    stats = match_stats.h2h(a, b)
+    if stats is None:
+        return {"error": "not found"}
+    return fastjson.FastJSONResponse(stats)
+
+
+@app.get("/ready")
+async def ready():
+    # 200 só quando esta instância já serve dados em dia: líder com todas as fontes
+    # tendo feito o 1º poll, ou réplica que já sincronizou com o Mongo
+    checks = {"read_model": read_model.loaded, "stats": match_stats.loaded}
+    if ingestion.lease.is_leader:
+        role = "leader"
+        checks.update(runtime.readiness())
+    else:
+        role = "replica"
+        checks["replica"] = replica_synced
+    is_ready = all(checks.values())
+    return fastjson.FastJSONResponse({"ready": is_ready, "role": role, "checks": checks},
+                                     status_code=200 if is_ready else 503)
+
+
+@app.get("/metrics")
+async def get_metrics():
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/live")
+async def get_live(request: Request, league: str = "", nick: str = ""):
+    # ETag = versão do snapshot; cliente com a versão atual recebe 304 sem corpo
+    etag = live_snapshot.etag
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=live_snapshot.body(league, nick), media_type="application/json", headers=headers)
+
+
+@app.get("/api/stream")
+async def stream(live: bool = False):
+    # SSE: jogos finalizados assim que gravados; ?live=1 inclui mudanças de placar ao vivo
+    topics = {"finished", "live"} if live else {"finished"}
+    sub = hub.subscribe(topics)
+    return StreamingResponse(
+        hub.stream(sub),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+async def warm_up():
+    # Roda em segundo plano: a API já responde (via Mongo) enquanto índices e caches carregam
+    try:
+        await ensure_indexes(matches)
+    except Exception as e:
+        log.error("Erro ao criar índices: %s", e)
 
+    since = None
+    try:
+        # Marca antes do load: o que chegar durante a carga vem de novo na réplica (upsert idempotente)
+        since = await latest_update()
+        with MONGO_OP_SECONDS.time(op="read_model_load"):
+            loaded = await read_model.load(matches)
+        log.info("✅ [READ MODEL] %d jogos carregados em memória", loaded)
+    except Exception as e:
+        log.error("Erro ao carregar modelo de leitura (API segue no Mongo): %s", e)
 
-@app.on_event("startup")
-async def startup():
-    print("🧹 [CLEANUP] Removendo jogos legados da Altenar (que não são Valhalla/Valkyrie)...")
     try:
-        result = await matches.delete_many({
-            "source": "desaparecimento_cache_tracker",
-            "league_mapped": {"$not": {"$regex": "VALHALLA|VALKYRIE|VALKIRYE", "$options": "i"}}
-        })
-        print(
-            f"🧹 [CLEANUP] {result.deleted_count} jogos legados removidos com sucesso!")
+        with MONGO_OP_SECONDS.time(op="stats_load"):
+            loaded = await match_stats.load(matches)
+        log.info("📊 [STATS] %d agregados de jogadores/confrontos carregados", loaded)
     except Exception as e:
-        print(f"Erro no cleanup: {e}")
+        log.error("Erro ao carregar estatísticas: %s", e)
 
-    asyncio.create_task(superbet_struct_cacher_loop())
-    asyncio.create_task(superbet_scraper_loop())
-    asyncio.create_task(scraper_loop())
+    background_tasks.append(asyncio.create_task(read_replica_loop(since)))
+    if SCRAPER_MODE == "embedded":
+        background_tasks.append(asyncio.create_task(ingestion.run()))
+    else:
+        log.info("📖 [API] Modo só leitura: scrapers rodam no worker.py")
+
+
+@app.on_event("startup")
+async def startup():
+    global upstream_replay
+    upstream_replay = replay.install()
+    background_tasks.append(asyncio.create_task(league_rules_watcher()))
+    background_tasks.append(asyncio.create_task(warm_up()))
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    # Loop do lease parado antes: não reassume nem chama stop() no meio do close()
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await ingestion.close()
+    await upstream.close_clients()
+    if isinstance(upstream_replay, replay.Recorder):
+        upstream_replay.close()
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,141 @@
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+
+# Registro mínimo no formato texto do Prometheus (sem dependência extra)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry: List["_Metric"] = []
+
+
+def _labels(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        _registry.append(self)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = _labels(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(k)} {v}" for k, v in self._values.items()]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+        self._callbacks: Dict[LabelKey, Callable[[], float]] = {}
+
+    def set(self, value: float, **labels) -> None:
+        self._values[_labels(labels)] = value
+
+    def set_function(self, fn: Callable[[], float], **labels) -> None:
+        # Lido só na hora do scrape: nenhum custo no caminho quente
+        self._callbacks[_labels(labels)] = fn
+
+    def samples(self) -> List[str]:
+        values = dict(self._values)
+        for key, fn in self._callbacks.items():
+            try:
+                values[key] = float(fn())
+            except Exception:
+                continue
+        return [f"{self.name}{_format_labels(k)} {v}" for k, v in values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = buckets
+        # labels -> [contagem por bucket..., soma, total]
+        self._values: Dict[LabelKey, List[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = _labels(labels)
+        data = self._values.get(key)
+        if data is None:
+            data = self._values[key] = [0.0] * (len(self.buckets) + 2)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                data[i] += 1
+                break
+        data[-2] += value
+        data[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, data in self._values.items():
+            cumulative = 0.0
+            for i, bound in enumerate(self.buckets):
+                cumulative += data[i]
+                lines.append(f"{self.name}_bucket{_format_labels(key, (('le', repr(bound)),))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, (('le', '+Inf'),))} {data[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {data[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {data[-1]}")
+        return lines
+
+
+def render() -> str:
+    return "\n".join(m.render() for m in _registry) + "\n"
+
+
+# ====================== MÉTRICAS DO SCRAPER ======================
+LOOP_TICK_SECONDS = Histogram("esoccer_loop_tick_seconds", "Duração de cada tick dos loops de scraping")
+UPSTREAM_REQUEST_SECONDS = Histogram("esoccer_upstream_request_seconds", "Latência das requisições aos bookmakers")
+UPSTREAM_REQUESTS = Counter("esoccer_upstream_requests_total", "Requisições aos bookmakers por API e status")
+MONGO_OP_SECONDS = Histogram("esoccer_mongo_op_seconds", "Latência das operações no MongoDB")
+MATCHES_SAVED = Counter("esoccer_matches_saved_total", "Jogos gravados por fonte e liga")
+CACHE_SIZE = Gauge("esoccer_cache_entries", "Tamanho dos caches em memória")
+UPSTREAM_CACHE = Counter("esoccer_upstream_cache_total", "Respostas entregues sem nova transferência (cache, coalescidas, 304)")
+UPSTREAM_BREAKER_OPEN = Gauge("esoccer_upstream_breaker_open", "1 enquanto o circuito do host está aberto")
+EXPORT_ROWS = Counter("esoccer_export_rows_total", "Jogos entregues pelo /api/export por formato")
@@ -0,0 +1,91 @@
+import os
+import re
+from functools import lru_cache
+
+# ====================== TABELA DE TIMES ======================
+# Nomes de times/seleções que aparecem junto do nick do jogador
+COMMON_TEAMS = (
+    'Spain', 'France', 'Germany', 'Italy', 'Brazil', 'Argentina', 'Portugal', 'Netherlands', 'England', 'Belgium',
+    'Real Madrid', 'Barcelona', 'FC Bayern', 'Man City', 'Man Utd', 'Liverpool', 'PSG', 'Juventus', 'Arsenal', 'Chelsea',
+    'Borussia Dortmund', 'Bayer Leverkusen', 'Napoli', 'AC Milan', 'Inter', 'Inter de Milão', 'Atletico Madrid', 'Sevilla',
+    'Piemonte Calcio', 'Latium', 'Genoa', 'Roma', 'RB Leipzig', 'Real Sociedad', 'Athletic Club', 'Aston Villa', 'Spurs'
+)
+KNOWN_ACRONYMS = ('PSG', 'RMA', 'FCB', 'MCI', 'MUN', 'LIV', 'CHE', 'ARS',
+                  'TOT', 'JUV', 'MIL', 'INT', 'NAP', 'BVB', 'ATM', 'FC', 'CF', 'SC')
+
+NICK_CACHE_SIZE = int(os.getenv("NICK_CACHE_SIZE", "8192"))
+
+
+def _alternation(words, boundaries: bool) -> str:
+    # Mais longos primeiro, para "Inter de Milão" ganhar de "Inter"
+    body = '|'.join(re.escape(w) for w in sorted(set(words), key=len, reverse=True))
+    return rf'\b(?:{body})\b' if boundaries else f'(?:{body})'
+
+
+# ====================== REGEX COMPILADAS ======================
+_PAREN_RE = re.compile(r'(.*?)\((.*?)\)')
+_CAPS_RE = re.compile(r'^[A-Z0-9\s_]+$')
+_CAPS_WORD_RE = re.compile(r'^[A-Z0-9_]+$')
+_TEAM_SUBSTRING_RE = re.compile(_alternation(COMMON_TEAMS, boundaries=False))
+_TEAM_WORD_RE = re.compile(_alternation(COMMON_TEAMS + KNOWN_ACRONYMS, boundaries=True), re.IGNORECASE)
+_EDGE_DASH_RE = re.compile(r'^[-·]+|[-·]+$')
+_SPACES_RE = re.compile(r'\s+')
+_ACRONYM_SET = frozenset(KNOWN_ACRONYMS)
+
+
+def extract_pure_nick_canonical(raw: str) -> str:
+    if not raw or not isinstance(raw, str):
+        return ""
+    return _canonical(raw)
+
+
+# Os mesmos nomes de jogador se repetem milhares de vezes por dia
+@lru_cache(maxsize=NICK_CACHE_SIZE)
+def _canonical(raw: str) -> str:
+    # 1. Parentheses logic
+    paren_match = _PAREN_RE.search(raw)
+    if paren_match:
+        part1, part2 = paren_match.group(
+            1).strip(), paren_match.group(2).strip()
+
+        is_p1_caps = bool(_CAPS_RE.match(part1)) and len(part1) > 1
+        is_p2_caps = bool(_CAPS_RE.match(part2)) and len(part2) > 1
+
+        if is_p2_caps and not is_p1_caps:
+            return part2
+        if is_p1_caps and not is_p2_caps:
+            return part1
+
+        if _TEAM_SUBSTRING_RE.search(part1):
+            return part2
+        if _TEAM_SUBSTRING_RE.search(part2):
+            return part1
+
+        return part2
+
+    # 2. No parentheses logic
+    clean_str = raw.strip()
+
+    if " " not in clean_str and _CAPS_WORD_RE.match(clean_str) and clean_str not in _ACRONYM_SET:
+        return clean_str
+
+    # Strip known teams out completely (uma passada só com a alternação)
+    clean_str = _TEAM_WORD_RE.sub('', clean_str).strip()
+
+    clean_str = _EDGE_DASH_RE.sub('', clean_str).strip()
+    clean_str = _SPACES_RE.sub(' ', clean_str)
+
+    if clean_str:
+        return clean_str
+
+    # Ultimate fallback
+    parts = raw.split()
+    if len(parts) > 1:
+        return parts[-1]
+
+    return raw.strip()
+
+
+def cache_stats() -> dict:
+    info = _canonical.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "max_size": info.maxsize}
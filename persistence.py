@@ -0,0 +1,166 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+from pymongo import UpdateOne
+
+from logs import get_logger
+from metrics import MONGO_OP_SECONDS
+
+log = get_logger("persistence")
+
+# ====================== CONFIG ======================
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "200"))
+WRITE_FLUSH_INTERVAL = float(os.getenv("WRITE_FLUSH_INTERVAL", "2"))
+
+
+# Buffer write-behind: junta os docs por event_id e grava em um bulk_write só
+class MatchWriter:
+    def __init__(self, collection, batch_size: int = WRITE_BATCH_SIZE, flush_interval: float = WRITE_FLUSH_INTERVAL):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer: Dict[str, Dict] = {}
+        self._lock = asyncio.Lock()
+        # Chamados com o lote depois de cada flush bem-sucedido (ex.: modelo de leitura em memória)
+        self.listeners: List[Callable[[List[Dict]], None]] = []
+        self.stats = {
+            "flushes": 0,
+            "docs_written": 0,
+            "upserted": 0,
+            "modified": 0,
+            "errors": 0,
+            "last_flush_docs": 0,
+            "last_flush_ms": 0.0,
+            "pending": 0,
+        }
+
+    async def add(self, doc: Dict) -> None:
+        # Mesmo event_id no buffer: o último doc vence (mesma semântica do $set)
+        self._buffer[doc["event_id"]] = doc
+        self.stats["pending"] = len(self._buffer)
+        if len(self._buffer) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self) -> int:
+        async with self._lock:
+            if not self._buffer:
+                return 0
+            batch: List[Dict] = list(self._buffer.values())
+            self._buffer = {}
+            self.stats["pending"] = 0
+
+            # updated_at só no Mongo: as instâncias só-API leem o que mudou desde a última olhada
+            updated_at = datetime.now(timezone.utc)
+            ops = [UpdateOne({"event_id": d["event_id"]}, {"$set": {**d, "updated_at": updated_at}}, upsert=True)
+                   for d in batch]
+            t0 = time.perf_counter()
+            try:
+                with MONGO_OP_SECONDS.time(op="bulk_write"):
+                    result = await self.collection.bulk_write(ops, ordered=False)
+            except Exception as e:
+                # Devolve ao buffer o que não foi sobrescrito nesse meio tempo
+                for d in batch:
+                    self._buffer.setdefault(d["event_id"], d)
+                self.stats["errors"] += 1
+                self.stats["pending"] = len(self._buffer)
+                log.error("❌ [BULK] Falha ao gravar %d jogos: %s", len(batch), e)
+                return 0
+
+            elapsed_ms = (time.perf_counter() - t0) * 1000
+            self.stats["flushes"] += 1
+            self.stats["docs_written"] += len(batch)
+            self.stats["upserted"] += result.upserted_count
+            self.stats["modified"] += result.modified_count
+            self.stats["last_flush_docs"] = len(batch)
+            self.stats["last_flush_ms"] = round(elapsed_ms, 2)
+            log.info("💾 [BULK] %d jogos gravados em %.1fms (novos: %d, atualizados: %d)",
+                     len(batch), elapsed_ms, result.upserted_count, result.modified_count)
+
+            for listener in self.listeners:
+                try:
+                    listener(batch)
+                except Exception as e:
+                    log.error("MatchWriter listener error: %s", e)
+            return len(batch)
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                log.error("MatchWriter error: %s", e)
+
+    async def close(self) -> None:
+        await self.flush()
+
+
+# ====================== ÍNDICES / RETENÇÃO ======================
+# Política única de retenção para a coleção inteira (as duas fontes)
+RETENTION_MAX_MATCHES = int(os.getenv("RETENTION_MAX_MATCHES", "2000"))
+RETENTION_DAYS = float(os.getenv("RETENTION_DAYS", "0"))  # 0 = sem índice TTL
+RETENTION_INTERVAL = float(os.getenv("RETENTION_INTERVAL", "300"))
+
+TTL_INDEX_NAME = "finished_at_ttl"
+
+
+async def ensure_indexes(collection) -> None:
+    try:
+        await collection.create_index("event_id", unique=True, name="event_id_unique")
+    except Exception as e:
+        log.error("❌ [INDEX] event_id único não criado (duplicados?): %s", e)
+
+    # finished_at + event_id: serve a retenção e a paginação por cursor (keyset) do histórico
+    await collection.create_index([("finished_at", -1), ("event_id", -1)], name="finished_at_event_id_desc")
+    await collection.create_index([("source", 1), ("league_mapped", 1)], name="source_league")
+    await collection.create_index("updated_at", name="updated_at")
+
+    existing = await collection.index_information()
+    if "finished_at_desc" in existing:
+        # Coberto pelo prefixo do índice composto acima
+        await collection.drop_index("finished_at_desc")
+    if RETENTION_DAYS > 0:
+        ttl_seconds = int(RETENTION_DAYS * 86400)
+        if TTL_INDEX_NAME in existing:
+            # Só ajusta o prazo, sem recriar o índice
+            await collection.database.command(
+                "collMod", collection.name,
+                index={"name": TTL_INDEX_NAME, "expireAfterSeconds": ttl_seconds})
+        else:
+            await collection.create_index(
+                [("finished_at", 1)], name=TTL_INDEX_NAME, expireAfterSeconds=ttl_seconds)
+    elif TTL_INDEX_NAME in existing:
+        await collection.drop_index(TTL_INDEX_NAME)
+
+    log.info("✅ [INDEX] Índices garantidos (limite %d jogos, TTL %s dias)", RETENTION_MAX_MATCHES, RETENTION_DAYS or '-')
+
+
+async def trim_to_limit(collection, max_matches: int = RETENTION_MAX_MATCHES) -> int:
+    # Contagem pelos metadados da coleção, sem varrer documentos
+    total = await collection.estimated_document_count()
+    if total <= max_matches:
+        return 0
+
+    # O jogo na posição max_matches (mais recentes primeiro) vira o corte, via índice finished_at
+    cutoff = await collection.find({}, {"finished_at": 1}).sort(
+        "finished_at", -1).skip(max_matches).limit(1).to_list(length=1)
+    if not cutoff:
+        return 0
+
+    result = await collection.delete_many({"finished_at": {"$lte": cutoff[0].get("finished_at")}})
+    if result.deleted_count:
+        log.info("🧹 [CLEANUP] %d jogos mais antigos excluídos (limite %d).", result.deleted_count, max_matches)
+    return result.deleted_count
+
+
+async def retention_loop(collection, interval: float = RETENTION_INTERVAL) -> None:
+    while True:
+        try:
+            with MONGO_OP_SECONDS.time(op="trim"):
+                await trim_to_limit(collection)
+        except Exception as e:
+            log.error("Retention error: %s", e)
+        await asyncio.sleep(interval)
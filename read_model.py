@@ -0,0 +1,138 @@
+from bisect import bisect_left, insort
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Tuple
+
+import fastjson
+
+# (finished_at em UTC, event_id): mesma ordem do índice finished_at_event_id_desc
+Key = Tuple[datetime, str]
+
+_MIN_DATETIME = datetime.min.replace(tzinfo=timezone.utc)
+
+
+def _utc(dt) -> datetime:
+    if not isinstance(dt, datetime):
+        return _MIN_DATETIME
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def _bson_precision(doc: Dict) -> Dict:
+    # O Mongo guarda milissegundos; trunca igual para memória e banco gerarem o mesmo cursor
+    for key in ("finished_at", "started_at"):
+        dt = doc.get(key)
+        if isinstance(dt, datetime) and dt.microsecond % 1000:
+            doc[key] = dt.replace(microsecond=dt.microsecond // 1000 * 1000)
+    return doc
+
+
+# Modelo de leitura em memória: buffer ordenado por finished_at + índice por event_id.
+# Os docs ficam guardados já serializados (datetimes convertidos), prontos para resposta.
+class MatchReadModel:
+    def __init__(self, max_entries: int, serialize: Callable[[Dict], Dict]):
+        self.max_entries = max_entries
+        self.serialize = serialize
+        self.loaded = False
+        self._keys: List[Key] = []
+        self._key_by_id: Dict[str, Key] = {}
+        self._docs: Dict[str, Dict] = {}
+
+    def upsert(self, doc: Dict) -> None:
+        event_id = doc.get("event_id")
+        if not event_id:
+            return
+        doc = _bson_precision(dict(doc))
+        key = (_utc(doc.get("finished_at")), event_id)
+
+        old_key = self._key_by_id.get(event_id)
+        if old_key is not None and old_key != key:
+            self._keys.pop(bisect_left(self._keys, old_key))
+        if old_key != key:
+            insort(self._keys, key)
+
+        self._key_by_id[event_id] = key
+        # $set: mescla com o que já existia, como no Mongo
+        merged = {**self._docs.get(event_id, {}), **self.serialize(doc)}
+        self._docs[event_id] = merged
+
+        while len(self._keys) > self.max_entries:
+            _, oldest_id = self._keys.pop(0)
+            self._key_by_id.pop(oldest_id, None)
+            self._docs.pop(oldest_id, None)
+
+    def upsert_many(self, docs: Iterable[Dict]) -> None:
+        for doc in docs:
+            self.upsert(doc)
+
+    async def load(self, collection) -> int:
+        cursor = collection.find({}).sort(
+            [("finished_at", -1), ("event_id", -1)]).limit(self.max_entries)
+        count = 0
+        async for doc in cursor:
+            self.upsert(doc)
+            count += 1
+        self.loaded = True
+        return count
+
+    def get(self, event_id: str) -> Dict | None:
+        return self._docs.get(event_id)
+
+    def count_since(self, since: datetime) -> int:
+        return len(self._keys) - bisect_left(self._keys, (_utc(since), ""))
+
+    def history(self, since: datetime, limit: int, skip: int = 0,
+                before: Tuple[datetime, str] | None = None) -> List[Dict]:
+        # Índice (exclusivo) do primeiro item depois do cursor, andando do mais novo para o mais velho
+        end = len(self._keys)
+        if before is not None:
+            end = bisect_left(self._keys, (_utc(before[0]), before[1]))
+        end -= skip
+        start = max(bisect_left(self._keys, (_utc(since), "")), end - limit)
+        return [self._docs[event_id] for _, event_id in reversed(self._keys[start:max(end, 0)])]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def stats(self) -> Dict:
+        return {"size": len(self._keys), "max_size": self.max_entries, "loaded": self.loaded}
+
+
+# Placar ao vivo já serializado; a versão só muda quando um poll altera o estado
+class LiveSnapshot:
+    def __init__(self, max_variants: int = 256):
+        self.version = 0
+        self.max_variants = max_variants
+        self._rows: List[Dict] = []
+        self._bodies: Dict[Tuple[str, str], bytes] = {}
+
+    @property
+    def etag(self) -> str:
+        return f'"live-{self.version}"'
+
+    @property
+    def rows(self) -> List[Dict]:
+        return self._rows
+
+    def update(self, rows: List[Dict], version: int | None = None) -> None:
+        # version: cópia de outra instância (espelho no Mongo), mantém o mesmo ETag em todas
+        self._rows = rows
+        self._bodies = {}
+        self.version = self.version + 1 if version is None else version
+
+    def body(self, league: str = "", nick: str = "") -> bytes:
+        key = (league.upper(), nick.upper())
+        body = self._bodies.get(key)
+        if body is None:
+            rows = self._rows
+            if key[0]:
+                rows = [r for r in rows
+                        if key[0] in r.get("league", "").upper() or key[0] in r.get("league_mapped", "").upper()]
+            if key[1]:
+                rows = [r for r in rows
+                        if key[1] in (r.get("home_nick", "").upper(), r.get("away_nick", "").upper())]
+            body = fastjson.dumps({"version": self.version, "count": len(rows), "events": rows})
+            if len(self._bodies) >= self.max_variants:
+                self._bodies = {}
+            self._bodies[key] = body
+        return body
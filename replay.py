@@ -0,0 +1,130 @@
+import json
+import os
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import httpx
+
+import upstream
+from logs import get_logger
+
+log = get_logger("replay")
+
+# ====================== CONFIG ======================
+# live = rede de verdade; record = rede + grava cada resposta; replay = só o arquivo gravado
+UPSTREAM_MODE = os.getenv("UPSTREAM_MODE", "live")
+UPSTREAM_CASSETTE = Path(os.getenv("UPSTREAM_CASSETTE", "cassettes/upstream.jsonl"))
+# MONGO_URI=mongomock:// troca o MongoDB por um banco em memória (pip install mongomock-motor)
+MONGOMOCK_URI = "mongomock://"
+
+# Parâmetros que mudam a cada chamada (janela de datas da Superbet) não entram na chave
+VOLATILE_PARAMS = {"startDate", "endDate"}
+
+
+def request_key(url: str) -> str:
+    parts = urlsplit(str(url))
+    query = sorted((k, v) for k, v in parse_qsl(parts.query) if k not in VOLATILE_PARAMS)
+    return f"{parts.netloc}{parts.path}?{urlencode(query)}"
+
+
+# Uma resposta por linha: {"t", "key", "url", "status", "content_type", "body"}
+class Recorder:
+    def __init__(self, path: Path):
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = self.path.open("a", encoding="utf-8")
+        self._started = time.monotonic()
+        self.recorded = 0
+
+    def __call__(self, response: httpx.Response) -> None:
+        url = str(response.request.url)
+        entry = {
+            "t": round(time.monotonic() - self._started, 3),
+            "key": request_key(url),
+            "url": url,
+            "status": response.status_code,
+            "content_type": response.headers.get("content-type", "application/json"),
+            "body": response.text,
+        }
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self.recorded += 1
+
+    def close(self) -> None:
+        self._file.close()
+
+
+# Serve as respostas gravadas na ordem em que chegaram, por chave; no fim repete a última
+class Cassette:
+    def __init__(self, entries: List[Dict]):
+        self.entries = entries
+        self._by_key: Dict[str, List[Dict]] = defaultdict(list)
+        for entry in entries:
+            self._by_key[entry["key"]].append(entry)
+        self._cursor: Dict[str, int] = defaultdict(int)
+        self.served = 0
+        self.misses = 0
+
+    @classmethod
+    def load(cls, path: Path) -> "Cassette":
+        with path.open(encoding="utf-8") as f:
+            return cls([json.loads(line) for line in f if line.strip()])
+
+    def rewind(self) -> None:
+        self._cursor.clear()
+
+    def next_entry(self, url: str) -> Dict | None:
+        key = request_key(url)
+        recorded = self._by_key.get(key)
+        if not recorded:
+            return None
+        index = self._cursor[key]
+        self._cursor[key] = index + 1
+        return recorded[min(index, len(recorded) - 1)]
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        entry = self.next_entry(str(request.url))
+        if entry is None:
+            self.misses += 1
+            return httpx.Response(404, json={"error": "not recorded"})
+        self.served += 1
+        return httpx.Response(
+            entry["status"],
+            content=entry["body"].encode("utf-8"),
+            headers={"content-type": entry.get("content_type", "application/json")})
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handler)
+
+    def stats(self) -> Dict:
+        return {"entries": len(self.entries), "keys": len(self._by_key),
+                "served": self.served, "misses": self.misses}
+
+
+def install(mode: str = UPSTREAM_MODE, path: Path = UPSTREAM_CASSETTE) -> Recorder | Cassette | None:
+    if mode == "record":
+        recorder = Recorder(path)
+        upstream.set_recorder(recorder)
+        log.info("⏺️ [REPLAY] Gravando respostas em %s", path)
+        return recorder
+    if mode == "replay":
+        cassette = Cassette.load(path)
+        upstream.set_recorder(None)
+        upstream.use_transport(cassette.transport())
+        log.info("▶️ [REPLAY] %d respostas de %s (sem rede)", len(cassette.entries), path)
+        return cassette
+    return None
+
+
+def mongo_client(uri: str | None):
+    if uri == MONGOMOCK_URI:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError as e:
+            raise RuntimeError("MONGO_URI=mongomock:// requer o pacote mongomock-motor") from e
+        return AsyncMongoMockClient()
+    from motor.motor_asyncio import AsyncIOMotorClient
+    return AsyncIOMotorClient(uri)
@@ -0,0 +1,185 @@
+import asyncio
+import os
+import random
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Tuple
+
+# ====================== CONFIG ======================
+ALTENAR_INTERVAL = float(os.getenv("ALTENAR_INTERVAL", "8"))
+ALTENAR_FAST_INTERVAL = float(os.getenv("ALTENAR_FAST_INTERVAL", "2"))
+ALTENAR_IDLE_INTERVAL = float(os.getenv("ALTENAR_IDLE_INTERVAL", "30"))
+SUPERBET_INTERVAL = float(os.getenv("SUPERBET_INTERVAL", "30"))
+SUPERBET_MAX_INTERVAL = float(os.getenv("SUPERBET_MAX_INTERVAL", "120"))
+# Perto do fim previsto de um jogo Superbet: não espera menos que isso entre polls
+SUPERBET_FAST_INTERVAL = float(os.getenv("SUPERBET_FAST_INTERVAL", "10"))
+# Quanto depois do apito o by-date costuma já trazer o jogo
+SUPERBET_PUBLISH_LAG = float(os.getenv("SUPERBET_PUBLISH_LAG", "15"))
+STRUCT_INTERVAL = float(os.getenv("STRUCT_INTERVAL", "3600"))
+POLL_JITTER = float(os.getenv("POLL_JITTER", "0.1"))
+
+# Janela em volta do apito final estimado em que o Altenar é consultado no ritmo rápido
+FINISH_WINDOW_BEFORE = float(os.getenv("FINISH_WINDOW_BEFORE", "90"))
+FINISH_WINDOW_AFTER = float(os.getenv("FINISH_WINDOW_AFTER", "180"))
+DEFAULT_MATCH_MINUTES = float(os.getenv("DEFAULT_MATCH_MINUTES", "10"))
+MATCH_OVERHEAD_MINUTES = float(os.getenv("MATCH_OVERHEAD_MINUTES", "2"))
+# Peso de cada duração observada (início -> fim detectado) na média por liga
+LEAGUE_MINUTES_ALPHA = float(os.getenv("LEAGUE_MINUTES_ALPHA", "0.2"))
+
+_HALVES_RE = re.compile(r'(\d+)\s*x\s*(\d+)', re.IGNORECASE)
+_MINUTES_RE = re.compile(r'(\d+)\s*MIN', re.IGNORECASE)
+
+
+def expected_match_minutes(league_mapped: str, duration: str = "") -> float:
+    # "4x4 min" (struct Superbet) -> 8; "BATTLE - 12 MIN" -> 12; senão o padrão
+    halves = _HALVES_RE.search(duration)
+    if halves:
+        minutes = int(halves.group(1)) * int(halves.group(2))
+    else:
+        found = _MINUTES_RE.search(league_mapped)
+        minutes = int(found.group(1)) if found else DEFAULT_MATCH_MINUTES
+    return minutes + MATCH_OVERHEAD_MINUTES
+
+
+class SourceSchedule:
+    __slots__ = ("baseline", "polls", "started", "last_delay", "wakeup")
+
+    def __init__(self, baseline: float):
+        self.baseline = baseline
+        self.polls = 0
+        self.started = time.monotonic()
+        self.last_delay = baseline
+        self.wakeup = asyncio.Event()
+
+
+# Agenda central dos loops: cada fonte pede o próximo intervalo e dorme com jitter
+class PollScheduler:
+    def __init__(self, jitter: float = POLL_JITTER):
+        self.jitter = jitter
+        self._sources: Dict[str, SourceSchedule] = {}
+        self._superbet_idle_polls = 0
+        # Duração total (jogo + overhead) por liga mapeada: declarada (struct Superbet) ou observada
+        self._declared_minutes: Dict[str, float] = {}
+        self._observed_minutes: Dict[str, float] = {}
+        self.detections = 0
+        self.detection_total_s = 0.0
+        self.detection_max_s = 0.0
+        self.detection_last_s = 0.0
+
+    def register(self, source: str, baseline: float) -> None:
+        self._sources.setdefault(source, SourceSchedule(baseline))
+
+    async def sleep(self, source: str, delay: float) -> None:
+        schedule = self._sources[source]
+        schedule.polls += 1
+        schedule.last_delay = delay
+        if self.jitter:
+            delay *= 1 + random.uniform(-self.jitter, self.jitter)
+        try:
+            await asyncio.wait_for(schedule.wakeup.wait(), timeout=max(delay, 0.0))
+        except asyncio.TimeoutError:
+            pass
+        schedule.wakeup.clear()
+
+    def wake(self, source: str) -> None:
+        # Encurta o sleep atual da fonte (ex.: histórico Superbet assim que o struct chega)
+        schedule = self._sources.get(source)
+        if schedule is not None:
+            schedule.wakeup.set()
+
+    # ---------- duração por liga ----------
+    def declare_duration(self, league_mapped: str, duration: str) -> None:
+        # "6x6 min" do struct Superbet vale para a liga mapeada em todas as fontes
+        halves = _HALVES_RE.search(duration or "")
+        if halves:
+            self._declared_minutes[league_mapped] = expected_match_minutes(league_mapped, duration)
+
+    def observe_match(self, league_mapped: str, minutes: float) -> None:
+        # Início -> fim detectado de um jogo real; fora de 2..60 min é dado ruim (startDate errado, restart)
+        if not 2 <= minutes <= 60:
+            return
+        known = self._observed_minutes.get(league_mapped)
+        self._observed_minutes[league_mapped] = minutes if known is None else (
+            known + LEAGUE_MINUTES_ALPHA * (minutes - known))
+
+    def match_minutes(self, league_mapped: str, duration: str = "") -> float:
+        # Duração explícita > declarada no struct > observada > minutos no nome > padrão
+        if _HALVES_RE.search(duration or ""):
+            return expected_match_minutes(league_mapped, duration)
+        known = self._declared_minutes.get(league_mapped) or self._observed_minutes.get(league_mapped)
+        if known:
+            return known
+        return expected_match_minutes(league_mapped, duration)
+
+    def expected_end(self, started_at: datetime | None, league_mapped: str, duration: str = "") -> datetime | None:
+        if started_at is None:
+            return None
+        return started_at + timedelta(minutes=self.match_minutes(league_mapped, duration))
+
+    # ---------- políticas por fonte ----------
+    def altenar_delay(self, live: Iterable[Tuple[datetime | None, str]], now: datetime) -> float:
+        has_live = False
+        for started_at, league_mapped in live:
+            has_live = True
+            end = self.expected_end(started_at, league_mapped)
+            if end is None:
+                continue
+            seconds_to_end = (end - now).total_seconds()
+            if -FINISH_WINDOW_AFTER <= seconds_to_end <= FINISH_WINDOW_BEFORE:
+                return ALTENAR_FAST_INTERVAL
+        return ALTENAR_INTERVAL if has_live else ALTENAR_IDLE_INTERVAL
+
+    def superbet_delay(self, new_events: int, next_finishes: Iterable[datetime] = (),
+                       now: datetime | None = None) -> float:
+        # Sem previsão: dobra o intervalo até o teto a cada poll vazio; com novidade volta ao base.
+        # Com previsão (último fim do torneio + duração): acorda logo depois do próximo fim esperado.
+        if new_events:
+            self._superbet_idle_polls = 0
+            delay = SUPERBET_INTERVAL
+        else:
+            self._superbet_idle_polls += 1
+            delay = min(SUPERBET_INTERVAL * 2 ** min(self._superbet_idle_polls - 1, 8), SUPERBET_MAX_INTERVAL)
+        for finish in next_finishes:
+            seconds_to_end = (finish - now).total_seconds()
+            if seconds_to_end < -FINISH_WINDOW_AFTER:
+                # Previsão vencida há muito: torneio parado, não segura o ritmo
+                continue
+            if seconds_to_end <= 0:
+                # Jogo já devia ter acabado e ainda não veio: ritmo base até aparecer
+                delay = min(delay, SUPERBET_INTERVAL)
+            else:
+                delay = min(delay, seconds_to_end + SUPERBET_PUBLISH_LAG)
+        return max(delay, SUPERBET_FAST_INTERVAL)
+
+    def record_detection(self, latency_s: float) -> None:
+        # Tempo entre o último poll em que o evento ainda estava ao vivo e a detecção do fim
+        latency_s = max(latency_s, 0.0)
+        self.detections += 1
+        self.detection_total_s += latency_s
+        self.detection_max_s = max(self.detection_max_s, latency_s)
+        self.detection_last_s = latency_s
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        sources = {}
+        for name, schedule in self._sources.items():
+            elapsed = now - schedule.started
+            baseline_polls = elapsed / schedule.baseline
+            sources[name] = {
+                "polls": schedule.polls,
+                "baseline_polls": int(baseline_polls),
+                # Modo rápido faz mais polls que o baseline: aí não há economia, não negativa
+                "saved_requests": max(int(baseline_polls - schedule.polls), 0),
+                "last_delay": schedule.last_delay,
+            }
+        return {
+            "sources": sources,
+            "league_minutes": {k: round(v, 1) for k, v in {**self._observed_minutes, **self._declared_minutes}.items()},
+            "detection_latency": {
+                "count": self.detections,
+                "avg_s": round(self.detection_total_s / self.detections, 2) if self.detections else 0.0,
+                "max_s": round(self.detection_max_s, 2),
+                "last_s": round(self.detection_last_s, 2),
+            },
+        }
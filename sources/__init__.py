@@ -0,0 +1,8 @@
+from sources.base import Job, MatchResult, SourceAdapter
+from sources.pipeline import MatchPipeline
+from sources.runtime import SourceRuntime
+from sources.altenar import AltenarAdapter
+from sources.superbet import SuperbetAdapter
+
+__all__ = ["Job", "MatchResult", "SourceAdapter", "MatchPipeline", "SourceRuntime",
+           "AltenarAdapter", "SuperbetAdapter"]
@@ -0,0 +1,472 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Set
+
+import fastjson
+import timeline
+import upstream
+from caches import LiveCache, LiveEntry
+from hub import BroadcastHub
+from leagues import map_league_name
+from logs import get_logger
+from nicks import extract_pure_nick_canonical
+from read_model import LiveSnapshot
+from scheduler import PollScheduler, ALTENAR_INTERVAL
+from sources.base import USER_TZ, Job, MatchResult, SourceAdapter
+
+log = get_logger("sources.altenar")
+
+LIVE_API = "https://sb2frontend-altenar2.biahosted.com/api/widget/GetLiveEvents?culture=pt-BR&timezoneOffset=-180&integration=estrelabet&deviceType=1&numFormat=en-GB&countryCode=BR&eventCount=0&sportId=66&catIds=2085,1571,1728,1594,2086,1729,2130"
+EVENT_API = "https://sb2frontend-altenar2.biahosted.com/api/widget/GetEventDetails?culture=pt-BR&timezoneOffset=-180&integration=estrelabet&deviceType=1&numFormat=en-GB&countryCode=BR&eventId={}&showNonBoosts=false"
+TRACKER_API = "https://sb2frontend-altenar2.biahosted.com/api/widget/GetEventTrackerInfo?culture=pt-BR&timezoneOffset=-180&integration=estrelabet&deviceType=1&numFormat=en-GB&countryCode=BR&eventId={}"
+
+SOURCE = "desaparecimento_cache_tracker"
+
+# Cache expandido (LRU + TTL por last_seen)
+LIVE_CACHE_MAX = int(os.getenv("LIVE_CACHE_MAX", "5000"))
+LIVE_CACHE_TTL = float(os.getenv("LIVE_CACHE_TTL", "1800"))
+NAME_CACHE_MAX = int(os.getenv("NAME_CACHE_MAX", "20000"))
+
+# Evento que some e volta ao feed (flicker) não busca details/tracker de novo dentro desse prazo
+EVENT_CACHE_TTL = float(os.getenv("EVENT_CACHE_TTL", "15"))
+
+RESOLVER_WORKERS = int(os.getenv("RESOLVER_WORKERS", "4"))
+RESOLVER_MAX_REQUESTS = int(os.getenv("RESOLVER_MAX_REQUESTS", "8"))
+
+# Altenar DB Sync - Valhalla, Valkyrie, Adriatic, CLA, H2H
+ALLOWED_LEAGUES = ["VALHALLA", "VALKYRIE", "VALKIRYE", "ADRIATIC", "CLA", "H2H", "EAL", "CYBER LIVE ARENA"]
+
+
+# ====================== FETCH ======================
+
+
+async def fetch_event_details(event_id: str) -> Dict:
+    url = EVENT_API.format(event_id)
+    r = await upstream.get(url, timeout=10, api="event_details", cache_ttl=EVENT_CACHE_TTL)
+    r.raise_for_status()
+    data = fastjson.loads(r.content)
+
+    score = data.get('score', [0, 0])
+    ft_home = int(score[0]) if len(score) > 0 else 0
+    ft_away = int(score[1]) if len(score) > 1 else 0
+
+    ht_home = ht_away = 0
+
+    competitors = data.get('competitors', [])
+    home_raw = competitors[0].get('name', '') if competitors else ''
+    away_raw = competitors[1].get(
+        'name', '') if len(competitors) > 1 else ''
+
+    return {
+        "home_raw": home_raw,
+        "away_raw": away_raw,
+        "ht_home": ht_home,
+        "ht_away": ht_away,
+        "ft_home": ft_home,
+        "ft_away": ft_away,
+        "league": data.get('championshipName', data.get('leagueName', ''))
+    }
+
+
+async def fetch_event_tracker_info(event_id: str) -> Dict | None:
+    url = TRACKER_API.format(event_id)
+    try:
+        r = await upstream.get(url, timeout=10, api="event_tracker", cache_ttl=EVENT_CACHE_TTL)
+        r.raise_for_status()
+        data = fastjson.loads(r.content)
+        score = data.get("score", [0, 0])
+        home = int(score[0]) if len(score) > 0 else 0
+        away = int(score[1]) if len(score) > 1 else 0
+        return {"ft_home": home, "ft_away": away, "ht_home": 0, "ht_away": 0}
+    except upstream.CircuitOpenError:
+        # Já avisado uma vez na abertura do circuito
+        return None
+    except Exception as e:
+        log.warning("Tracker falhou %s: %s", event_id, e)
+        return None
+
+
+def merge_final_score(placar_final: Dict, candidate: Dict) -> None:
+    # Só aceita o placar do upstream se ele for >= ao do cache (nunca regride)
+    for home_key, away_key in (("ft_home", "ft_away"), ("ht_home", "ht_away")):
+        h, a = candidate.get(home_key, 0), candidate.get(away_key, 0)
+        if h >= placar_final[home_key] and a >= placar_final[away_key] and (h > 0 or a > 0):
+            placar_final[home_key] = h
+            placar_final[away_key] = a
+
+
+def is_allowed_league(league_raw: str, league_mapped: str) -> bool:
+    # Se for Valhalla ou Valkyrie, deve ser CUP (para filtrar basquete)
+    if any(x in league_mapped.upper() for x in ["VALHALLA", "VALKYRIE"]) and "CUP" not in league_raw.upper():
+        return False
+    return any(x in league_mapped.upper() for x in ALLOWED_LEAGUES) or any(x in league_raw.upper() for x in ALLOWED_LEAGUES)
+
+
+# ====================== INGESTÃO LIVE (DIFF) ======================
+
+
+def live_payload(event_id: str, entry: LiveEntry, with_mapping: bool = False) -> Dict:
+    payload = entry.as_dict()
+    for key in ("last_seen", "period", "timeline"):
+        payload.pop(key, None)
+    payload["event_id"] = event_id
+    if entry.started_at:
+        payload["started_at"] = entry.started_at.isoformat()
+    if with_mapping:
+        payload["home_nick"] = extract_pure_nick_canonical(entry.home_raw)
+        payload["away_nick"] = extract_pure_nick_canonical(entry.away_raw)
+        payload["league_mapped"] = map_league_name(entry.league)
+    return payload
+
+
+class LiveChanges:
+    __slots__ = ("added", "updated", "removed", "live_count")
+
+    def __init__(self):
+        self.added: list = []
+        self.updated: list = []
+        self.removed: Set[str] = set()
+        self.live_count = 0
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.updated or self.removed)
+
+    def summary(self) -> str:
+        return f"+{len(self.added)} ~{len(self.updated)} -{len(self.removed)} ({self.live_count} ao vivo)"
+
+
+def _lookup_name(cache: Dict, items: list, key) -> str:
+    name = cache.get(key)
+    if name is None:
+        # Miss: atualiza o cache com a lista do payload atual
+        if len(cache) > NAME_CACHE_MAX:
+            cache.clear()
+        for item in items:
+            cache[item['id']] = item['name']
+        name = cache.get(key, '')
+    return name
+
+
+def _entry_row(event_id: str, e: LiveEntry, now: float) -> list:
+    # Linha compacta do snapshot; a idade de last_seen vira relativa (o relógio monotônico não sobrevive ao restart)
+    return [event_id, e.home_score, e.away_score, e.ht_home, e.ht_away, e.home_raw, e.away_raw, e.league,
+            e.started_at.isoformat() if e.started_at else None, round(now - e.last_seen, 1),
+            e.period, e.timeline]
+
+
+def _entry_from_row(row: list) -> tuple:
+    event_id, home, away, ht_home, ht_away, home_raw, away_raw, league, started_at, seen_age = row[:10]
+    # Snapshots anteriores à linha do tempo não têm as duas últimas colunas
+    period, goals = row[10:12] if len(row) >= 12 else (0, b"")
+    entry = LiveEntry(
+        home_score=home, away_score=away, ht_home=ht_home, ht_away=ht_away,
+        home_raw=home_raw, away_raw=away_raw, league=league,
+        started_at=datetime.fromisoformat(started_at) if started_at else None,
+        period=period, timeline=bytes(goals))
+    return event_id, entry, seen_age
+
+
+def event_fingerprint(event: Dict) -> tuple:
+    return (
+        tuple(event.get('score', ())),
+        event.get('liveTime', event.get('ls', '')),
+        tuple(event.get('competitorIds', ())),
+        event.get('champId'),
+        event.get('startDate', ''),
+        event.get('name', ''),
+    )
+
+
+# Detecção por desaparecimento: evento que some do GetLiveEvents é resolvido e gravado
+class AltenarAdapter(SourceAdapter):
+    name = "altenar"
+
+    def __init__(self, pipeline, scheduler: PollScheduler, hub: BroadcastHub, snapshot: LiveSnapshot):
+        super().__init__(pipeline)
+        self.scheduler = scheduler
+        self.hub = hub
+        self.snapshot = snapshot
+        self.live_cache = LiveCache(max_entries=LIVE_CACHE_MAX, ttl_seconds=LIVE_CACHE_TTL)
+        # Nomes de competidores/campeonatos por id, mantidos entre ticks
+        self.competitor_names: Dict = {}
+        self.champ_names: Dict = {}
+        # Impressão digital por evento ao vivo; só eventos novos/alterados são reprocessados
+        self.live_fingerprints: Dict[str, tuple] = {}
+        # Linhas do /api/live por evento, mantidas incrementalmente
+        self.live_rows: Dict[str, Dict] = {}
+        # (event_id, LiveEntry do live_cache, detectado_em)
+        self.finished_queue: asyncio.Queue = asyncio.Queue()
+        # Detectados e ainda não entregues ao pipeline; vão no snapshot para não se perderem num restart
+        self.pending: Dict[str, tuple] = {}
+        self.resolver_semaphore = asyncio.Semaphore(RESOLVER_MAX_REQUESTS)
+        self.polled = False
+
+    def jobs(self) -> List[Job]:
+        return [Job("altenar_live", ALTENAR_INTERVAL, self.poll)]
+
+    def workers(self):
+        return [(f"altenar_resolver_{i}", self.resolver_worker) for i in range(RESOLVER_WORKERS)]
+
+    def stats(self) -> Dict:
+        return {"live_cache": self.live_cache.stats(), "live": len(self.live_fingerprints),
+                "resolver_queue": self.finished_queue.qsize()}
+
+    def ready(self) -> bool:
+        return self.polled
+
+    # ---------- restart a quente ----------
+    def dump_state(self) -> Dict:
+        now = time.monotonic()
+        entries = [_entry_row(event_id, e, now) for event_id, e in self.live_cache.items()]
+        pending = [[*_entry_row(event_id, e, now), detected_at.isoformat()]
+                   for event_id, e, detected_at in self.pending.values()]
+        return {"live": list(self.live_fingerprints), "entries": entries, "pending": pending}
+
+    def reset(self) -> None:
+        # Ids vivos velhos virariam "finalizados agora" no 1º poll; fila velha repetiria os pending
+        self.live_cache = LiveCache(max_entries=LIVE_CACHE_MAX, ttl_seconds=LIVE_CACHE_TTL)
+        self.live_fingerprints = {}
+        self.live_rows = {}
+        self.finished_queue = asyncio.Queue()
+        self.pending = {}
+
+    def load_state(self, state: Dict, age_s: float) -> None:
+        self.reset()
+        # Finalizados que o líder anterior detectou mas não gravou: resolvidos de novo (upsert idempotente)
+        for row in state.get("pending", []):
+            event_id, entry, _ = _entry_from_row(row[:-1])
+            self.enqueue_finished(event_id, entry, datetime.fromisoformat(row[-1]))
+        if age_s > LIVE_CACHE_TTL:
+            log.info("Snapshot Altenar com %.0fs, mais velho que o cache live: ignorado", age_s)
+            return
+        for row in state.get("entries", []):
+            event_id, entry, seen_age = _entry_from_row(row)
+            self.live_cache.restore(event_id, entry, seen_age + age_s)
+        # Impressão digital vazia: o 1º poll recalcula as linhas, e quem sumiu no restart vira finalizado
+        self.live_fingerprints = {event_id: () for event_id in state.get("live", []) if event_id in self.live_cache}
+        log.info("♻️ [ALTENAR] %d eventos ao vivo restaurados (snapshot de %.0fs)", len(self.live_fingerprints), age_s)
+
+    # ---------- live ----------
+    def build_live_entry(self, event: Dict, data: Dict, previous: LiveEntry | None) -> LiveEntry:
+        score_raw = event.get('score', [0, 0])
+        home = int(score_raw[0]) if len(score_raw) > 0 else 0
+        away = int(score_raw[1]) if len(score_raw) > 1 else 0
+
+        tick_period, minute = timeline.parse_live_time(event.get('liveTime', event.get('ls', '')))
+        period = tick_period
+
+        # Gols na ordem em que aparecem no feed; o intervalo vira uma marca na mesma linha do tempo
+        goals = b""
+        prev_score = (0, 0)
+        crossed = False
+        if previous is not None:
+            goals = previous.timeline
+            prev_score = (previous.home_score, previous.away_score)
+            # liveTime sem tempo ou voltando (feed inconsistente): mantém o último visto
+            period = max(period, previous.period)
+            crossed = previous.period == timeline.FIRST_HALF and period > timeline.FIRST_HALF
+        scored = (home, away) != prev_score
+        at_break = tick_period == timeline.HALF_TIME
+        if scored and at_break:
+            # No intervalo o placar atual já é o do 1º tempo
+            goals = timeline.append(goals, minute, home, away)
+        if (at_break or crossed) and timeline.half_time_score(goals) is None:
+            goals = timeline.mark_half_time(goals, minute)
+        if scored and not at_break:
+            # Gol que só aparece já depois do 1º tempo conta no 2º
+            goals = timeline.append(goals, minute, home, away)
+
+        half_time = timeline.half_time_score(goals)
+        # Só um tick que diz "1º tempo" atualiza o HT; minuto solto herda o tempo, não o HT
+        if tick_period == timeline.FIRST_HALF:
+            ht_home, ht_away = home, away
+        elif half_time is not None:
+            ht_home, ht_away = half_time
+        elif previous is not None:
+            ht_home, ht_away = previous.ht_home, previous.ht_away
+        else:
+            ht_home = ht_away = 0
+
+        competitors = data.get('competitors', [])
+        competitor_ids = event.get('competitorIds', [])
+        if len(competitor_ids) >= 2:
+            home_raw = _lookup_name(self.competitor_names, competitors, competitor_ids[0])
+            away_raw = _lookup_name(self.competitor_names, competitors, competitor_ids[1])
+        else:
+            home_raw, away_raw = '', ''
+
+        if not home_raw or not away_raw:
+            parts = str(event.get('name', '')).split(' vs. ')
+            if len(parts) == 2:
+                home_raw, away_raw = parts[0].strip(
+                ), parts[1].strip()
+
+        league = _lookup_name(self.champ_names, data.get('champs', []), event.get('champId'))
+
+        # Captura startDate da API
+        start_date_str = event.get('startDate', '')
+        started_at = None
+        if start_date_str:
+            try:
+                # Converte do UTC da API para o timezone do usuário
+                started_at = datetime.fromisoformat(
+                    start_date_str.replace('Z', '+00:00')).astimezone(USER_TZ)
+            except ValueError:
+                started_at = None
+
+        # Entrada nova a cada mudança: o resolver pode segurar a antiga sem cópia
+        return LiveEntry(
+            home_score=home,
+            away_score=away,
+            ht_home=ht_home,
+            ht_away=ht_away,
+            home_raw=home_raw,
+            away_raw=away_raw,
+            league=league,
+            started_at=started_at,
+            period=period,
+            timeline=goals)
+
+    def ingest_live_events(self, data: Dict) -> LiveChanges:
+        changes = LiveChanges()
+        fingerprints: Dict[str, tuple] = {}
+        live_cache = self.live_cache
+
+        for event in data.get('events', []):
+            # Permite SportId 66 (Esoccer Altenar) e 146 (E-Soccer Geral)
+            if event.get('sportId') not in [66, 146]:
+                continue
+            event_id = str(event['id'])
+            fingerprint = event_fingerprint(event)
+            fingerprints[event_id] = fingerprint
+
+            if self.live_fingerprints.get(event_id) == fingerprint and event_id in live_cache:
+                live_cache.touch(event_id)
+                continue
+
+            previous = live_cache.get(event_id)
+            entry = self.build_live_entry(event, data, previous)
+            live_cache.put(event_id, entry)
+
+            if previous is not None and previous.state() == entry.state() and event_id in self.live_rows:
+                # Mudou só o relógio (liveTime): nada visível para os clientes
+                continue
+
+            self.live_rows[event_id] = live_payload(event_id, entry, with_mapping=True)
+            if previous is None:
+                changes.added.append(event_id)
+            else:
+                changes.updated.append(event_id)
+            if previous is None or (previous.home_score, previous.away_score) != (entry.home_score, entry.away_score):
+                self.hub.publish("live", live_payload(event_id, entry))
+
+            log.debug("[LIVE] %s: %s %d-%d %s", event_id, entry.home_raw, entry.home_score, entry.away_score, entry.away_raw)
+
+        changes.removed = self.live_fingerprints.keys() - fingerprints.keys()
+        for event_id in changes.removed:
+            self.live_rows.pop(event_id, None)
+        changes.live_count = len(fingerprints)
+        self.live_fingerprints = fingerprints
+        return changes
+
+    def live_match_clocks(self):
+        for event_id in self.live_fingerprints:
+            entry = self.live_cache.get(event_id)
+            if entry is not None:
+                yield entry.started_at, map_league_name(entry.league)
+
+    async def poll_live(self) -> LiveChanges:
+        r = await upstream.get(LIVE_API, timeout=20, api="altenar_live")
+        data = fastjson.loads(r.content)
+
+        changes = self.ingest_live_events(data)
+        if changes:
+            log.debug("[LIVE] %s", changes.summary())
+
+        # Resolução roda nos workers; o tick live volta logo para o próximo poll
+        detected_at = datetime.now(USER_TZ)
+        for event_id in changes.removed:
+            log.info("Finalizado detectado: %s", event_id)
+            cached = self.live_cache.get(event_id)
+            if cached is not None:
+                self.scheduler.record_detection(time.monotonic() - cached.last_seen)
+                if cached.started_at is not None:
+                    # Duração real por liga: afina a janela rápida das ligas sem minutos no nome
+                    self.scheduler.observe_match(map_league_name(cached.league),
+                                                 (detected_at - cached.started_at).total_seconds() / 60)
+            self.enqueue_finished(event_id, cached or LiveEntry(), detected_at)
+
+        if changes:
+            self.snapshot.update([self.live_rows[event_id] for event_id in sorted(self.live_rows)])
+
+        self.live_cache.prune()
+        self.polled = True
+        return changes
+
+    async def poll(self) -> float:
+        await self.poll_live()
+        # Rápido perto do apito final estimado, normal com jogos ao vivo, lento sem nenhum
+        return self.scheduler.altenar_delay(self.live_match_clocks(), datetime.now(USER_TZ))
+
+    # ---------- resolução de finalizados ----------
+    def enqueue_finished(self, event_id: str, entry: LiveEntry, detected_at: datetime) -> None:
+        self.pending[event_id] = (event_id, entry, detected_at)
+        self.finished_queue.put_nowait((event_id, entry, detected_at))
+
+    async def drain(self) -> None:
+        await self.finished_queue.join()
+
+    async def _limited(self, coro):
+        async with self.resolver_semaphore:
+            return await coro
+
+    async def resolve_finished_event(self, event_id: str, cached: LiveEntry, detected_at: datetime) -> None:
+        league_mapped = map_league_name(cached.league)
+        if not is_allowed_league(cached.league, league_mapped):
+            log.debug("⏭️ ALTENAR IGNORADO: %s vs %s na liga %s (%s)",
+                      cached.home_raw, cached.away_raw, cached.league, league_mapped)
+            return
+
+        placar_final = {
+            "ft_home": cached.home_score,
+            "ft_away": cached.away_score,
+            "ht_home": cached.ht_home,
+            "ht_away": cached.ht_away
+        }
+
+        # Details e tracker em paralelo; a ordem de merge continua details -> tracker
+        details, tracker = await asyncio.gather(
+            self._limited(fetch_event_details(event_id)),
+            self._limited(fetch_event_tracker_info(event_id)),
+            return_exceptions=True)
+        for result in (details, tracker):
+            if isinstance(result, dict):
+                merge_final_score(placar_final, result)
+
+        await self.emit(MatchResult(
+            event_id=event_id,
+            source=SOURCE,
+            league_raw=cached.league,
+            home_raw=cached.home_raw,
+            away_raw=cached.away_raw,
+            ft_home=placar_final["ft_home"],
+            ft_away=placar_final["ft_away"],
+            ht_home=placar_final["ht_home"],
+            ht_away=placar_final["ht_away"],
+            started_at=cached.started_at,
+            finished_at=detected_at,
+            timeline=cached.timeline or None))
+
+    async def resolver_worker(self) -> None:
+        while True:
+            event_id, cached, detected_at = await self.finished_queue.get()
+            try:
+                await self.resolve_finished_event(event_id, cached, detected_at)
+            except Exception as e:
+                log.error("Resolver error %s: %s", event_id, e)
+            finally:
+                self.finished_queue.task_done()
+            # Cancelado no meio (stop) não chega aqui: continua em pending e vai no snapshot
+            self.pending.pop(event_id, None)
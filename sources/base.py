@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+# Fuso horário do usuário (UTC-4)
+USER_TZ = timezone(timedelta(hours=-4))
+
+
+# Modelo comum de jogo finalizado: cada fonte preenche o bruto, o pipeline normaliza
+class MatchResult:
+    __slots__ = ("event_id", "source", "league_raw", "duration", "home_raw", "away_raw",
+                 "ht_home", "ht_away", "ft_home", "ft_away", "started_at", "finished_at", "timeline")
+
+    def __init__(self, event_id: str, source: str, league_raw: str, home_raw: str, away_raw: str,
+                 ft_home: int = 0, ft_away: int = 0, ht_home: int = 0, ht_away: int = 0,
+                 started_at: datetime | None = None, finished_at: datetime | None = None,
+                 duration: str | None = None, timeline: bytes | None = None):
+        self.event_id = event_id
+        self.source = source
+        self.league_raw = league_raw
+        # None = fonte sem duração conhecida (mapeamento usa o padrão e o doc não leva o campo)
+        self.duration = duration
+        self.home_raw = home_raw
+        self.away_raw = away_raw
+        self.ht_home = ht_home
+        self.ht_away = ht_away
+        self.ft_home = ft_home
+        self.ft_away = ft_away
+        self.started_at = started_at
+        self.finished_at = finished_at
+        # Gols capturados ao vivo, empacotados (timeline.py); None = fonte sem estágio live
+        self.timeline = timeline
+
+
+# Tarefa periódica de uma fonte; run() devolve o próximo intervalo (None = baseline)
+class Job:
+    __slots__ = ("name", "baseline", "run")
+
+    def __init__(self, name: str, baseline: float, run: Callable[[], Awaitable[float | None]]):
+        self.name = name
+        self.baseline = baseline
+        self.run = run
+
+
+class SourceAdapter:
+    """Uma casa de apostas: busca no upstream, monta MatchResult e entrega ao pipeline."""
+
+    name = "base"
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+
+    def jobs(self) -> List[Job]:
+        raise NotImplementedError
+
+    def workers(self) -> List[Tuple[str, Callable[[], Awaitable[None]]]]:
+        # Consumidores de longa duração (ex.: resolver de finalizados), supervisionados pelo runtime
+        return []
+
+    async def start(self) -> None:
+        # Estado persistido a restaurar antes do primeiro tick
+        return None
+
+    async def emit(self, match: MatchResult) -> None:
+        await self.pipeline.submit(match)
+
+    async def drain(self) -> None:
+        # No stop, com os jobs já parados: espera os workers entregarem o que já foi detectado
+        return None
+
+    def dump_state(self) -> Dict | None:
+        # Estado compacto para o restart a quente; None = nada a guardar
+        return None
+
+    def reset(self) -> None:
+        # Antes de restaurar (e mesmo sem snapshot): descarta o que sobrou de uma liderança anterior
+        return None
+
+    def load_state(self, state: Dict, age_s: float) -> None:
+        # age_s: idade do snapshot (tempo em que ninguém estava olhando o upstream)
+        return None
+
+    def ready(self) -> bool:
+        # Já completou um ciclo com o upstream desde o boot (/ready)
+        return True
+
+    def stats(self) -> Dict:
+        return {}
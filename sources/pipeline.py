@@ -0,0 +1,80 @@
+import asyncio
+import os
+from typing import Dict
+
+from leagues import map_league_name
+from logs import get_logger
+from nicks import extract_pure_nick_canonical
+from persistence import MatchWriter
+from sources.base import MatchResult
+
+log = get_logger("sources.pipeline")
+
+# Fila entre as fontes e o MatchWriter: cheia, o submit() espera (backpressure no tick da fonte)
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "1000"))
+
+
+def normalize(match: MatchResult) -> Dict:
+    if match.duration is None:
+        league_mapped = map_league_name(match.league_raw)
+    else:
+        league_mapped = map_league_name(match.league_raw, match.duration)
+
+    doc = {"event_id": match.event_id, "league_mapped": league_mapped}
+    if match.duration is not None:
+        doc["duration"] = match.duration
+    doc.update({
+        "home_raw": match.home_raw,
+        "away_raw": match.away_raw,
+        "home_nick": extract_pure_nick_canonical(match.home_raw),
+        "away_nick": extract_pure_nick_canonical(match.away_raw),
+        "home_score_ht": match.ht_home,
+        "away_score_ht": match.ht_away,
+        "home_score_ft": match.ft_home,
+        "away_score_ft": match.ft_away,
+        "started_at": match.started_at,
+        "finished_at": match.finished_at,
+        "source": match.source,
+    })
+    if match.timeline:
+        doc["timeline"] = match.timeline
+    return doc
+
+
+# Um consumidor só para todas as fontes: normaliza e grava em lote pelo MatchWriter
+class MatchPipeline:
+    def __init__(self, writer: MatchWriter, queue_size: int = PIPELINE_QUEUE_SIZE):
+        self.writer = writer
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.stats = {"submitted": 0, "written": 0, "errors": 0, "backpressure_waits": 0, "queued": 0}
+
+    async def submit(self, match: MatchResult) -> None:
+        if self.queue.full():
+            self.stats["backpressure_waits"] += 1
+        await self.queue.put(match)
+        self.stats["submitted"] += 1
+        self.stats["queued"] = self.queue.qsize()
+
+    async def drain(self) -> None:
+        # Espera tudo que já foi submetido passar pelo writer (ex.: antes de avançar um watermark)
+        await self.queue.join()
+
+    async def run(self) -> None:
+        while True:
+            match = await self.queue.get()
+            self.stats["queued"] = self.queue.qsize()
+            try:
+                doc = normalize(match)
+                await self.writer.add(doc)
+                self.stats["written"] += 1
+                log.info("✅ %s: %s %d-%d %s (HT: %d-%d, %s)", match.source, doc["home_nick"],
+                         match.ft_home, match.ft_away, doc["away_nick"], match.ht_home, match.ht_away,
+                         doc["league_mapped"])
+                # Fila vazia: fim da rodada, grava o lote de uma vez
+                if self.queue.empty():
+                    await self.writer.flush()
+            except Exception as e:
+                self.stats["errors"] += 1
+                log.error("Pipeline error %s: %s", match.event_id, e)
+            finally:
+                self.queue.task_done()
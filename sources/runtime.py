@@ -0,0 +1,132 @@
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, List
+
+import upstream
+from logs import get_logger
+from metrics import LOOP_TICK_SECONDS
+from scheduler import PollScheduler
+from sources.base import Job, SourceAdapter
+
+log = get_logger("sources.runtime")
+
+# Quantos ticks (de todas as fontes) rodam ao mesmo tempo; fonte nova não vira mais concorrência
+SOURCE_MAX_CONCURRENT = int(os.getenv("SOURCE_MAX_CONCURRENT", "3"))
+# Tick com erro: tenta de novo em 5s, 10s, 20s... até o baseline do job (ou SOURCE_RETRY_MAX)
+SOURCE_RETRY_BASE = float(os.getenv("SOURCE_RETRY_BASE", "5"))
+SOURCE_RETRY_MAX = float(os.getenv("SOURCE_RETRY_MAX", "300"))
+# No stop: quanto esperar os workers terminarem o que já foi detectado antes de cancelá-los
+SOURCE_DRAIN_TIMEOUT = float(os.getenv("SOURCE_DRAIN_TIMEOUT", "10"))
+
+
+class JobState:
+    __slots__ = ("runs", "failures", "consecutive_failures", "last_error", "last_duration_s")
+
+    def __init__(self):
+        self.runs = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_error = ""
+        self.last_duration_s = 0.0
+
+    def as_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def retry_delay(job: Job, consecutive_failures: int) -> float:
+    delay = SOURCE_RETRY_BASE * 2 ** min(consecutive_failures - 1, 10)
+    return min(delay, max(job.baseline, SOURCE_RETRY_BASE), SOURCE_RETRY_MAX)
+
+
+# Roda os jobs de todas as fontes, cada um na sua agenda, com erro isolado por job
+class SourceRuntime:
+    def __init__(self, scheduler: PollScheduler, max_concurrent: int = SOURCE_MAX_CONCURRENT):
+        self.scheduler = scheduler
+        self.adapters: List[SourceAdapter] = []
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._jobs: Dict[str, JobState] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._workers: List[asyncio.Task] = []
+
+    def add(self, adapter: SourceAdapter) -> None:
+        self.adapters.append(adapter)
+
+    async def start(self) -> None:
+        for adapter in self.adapters:
+            try:
+                await adapter.start()
+            except Exception as e:
+                # Sem o estado restaurado a fonte ainda funciona (ex.: backfill completo)
+                log.error("❌ [%s] Falha ao iniciar: %s", adapter.name, e)
+            jobs = adapter.jobs()
+            for job in jobs:
+                self._tasks.append(asyncio.create_task(self._run_job(job)))
+            for name, worker in adapter.workers():
+                self._workers.append(asyncio.create_task(self._supervise(name, worker)))
+            log.info("🚀 [%s] Fonte iniciada (%s)", adapter.name, ", ".join(j.name for j in jobs))
+
+    async def stop(self, drain_timeout: float = SOURCE_DRAIN_TIMEOUT) -> None:
+        # Jobs primeiro (nada novo é detectado), depois os workers terminam a fila e só então são cancelados
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._workers:
+            for adapter in self.adapters:
+                try:
+                    await asyncio.wait_for(adapter.drain(), drain_timeout)
+                except asyncio.TimeoutError:
+                    # O que sobrou vai no snapshot do adapter
+                    log.warning("⚠️ [%s] Fila não esvaziou em %.0fs no stop", adapter.name, drain_timeout)
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _run_job(self, job: Job) -> None:
+        state = self._jobs[job.name] = JobState()
+        self.scheduler.register(job.name, job.baseline)
+        while True:
+            t0 = time.perf_counter()
+            try:
+                async with self._slots:
+                    delay = await job.run()
+                state.consecutive_failures = 0
+            except Exception as e:
+                state.failures += 1
+                state.consecutive_failures += 1
+                state.last_error = str(e)
+                delay = retry_delay(job, state.consecutive_failures)
+                if isinstance(e, upstream.CircuitOpenError):
+                    # Abertura já logada pelo upstream; espera pelo menos o circuito reabrir
+                    delay = max(delay, e.retry_after)
+                    log.debug("[%s] %s", job.name, e)
+                else:
+                    log.error("❌ [%s] Erro no tick (%dª seguida, nova tentativa em %.0fs): %s",
+                              job.name, state.consecutive_failures, delay, e)
+            state.runs += 1
+            state.last_duration_s = round(time.perf_counter() - t0, 4)
+            LOOP_TICK_SECONDS.observe(state.last_duration_s, loop=job.name)
+
+            await self.scheduler.sleep(job.name, job.baseline if delay is None else delay)
+
+    async def _supervise(self, name: str, worker: Callable[[], Awaitable[None]]) -> None:
+        # Worker que morre por exceção volta sozinho, sem derrubar a fonte
+        while True:
+            try:
+                await worker()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.error("❌ [%s] Worker caiu, reiniciando: %s", name, e)
+                await asyncio.sleep(1)
+
+    def readiness(self) -> Dict[str, bool]:
+        return {adapter.name: adapter.ready() for adapter in self.adapters}
+
+    def stats(self) -> Dict:
+        return {
+            "jobs": {name: state.as_dict() for name, state in self._jobs.items()},
+            "sources": {adapter.name: adapter.stats() for adapter in self.adapters},
+        }
@@ -0,0 +1,306 @@
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+import fastjson
+import jsonstream
+import upstream
+from caches import SeenIds
+from leagues import map_league_name
+from logs import get_logger
+from scheduler import PollScheduler, SUPERBET_INTERVAL, STRUCT_INTERVAL
+from sources.base import USER_TZ, Job, MatchResult, SourceAdapter
+
+log = get_logger("sources.superbet")
+
+# URL sem currentStatus para pegar todos os torneios, mesmo os recém-fechados
+SUPERBET_STRUCT_API = "https://production-superbet-offer-br.freetls.fastly.net/v2/pt-BR/struct"
+SUPERBET_HISTORY_API = "https://production-superbet-offer-br.freetls.fastly.net/v2/pt-BR/events/by-date?compression=true&sportId=75&currentStatus=finished&startDate={}&endDate={}"
+
+SOURCE = "superbet_api"
+
+# Janela do histórico Superbet: backfill completo só sem watermark ou após um buraco maior que ela
+SUPERBET_BACKFILL_HOURS = float(os.getenv("SUPERBET_BACKFILL_HOURS", "3"))
+SUPERBET_OVERLAP_MINUTES = float(os.getenv("SUPERBET_OVERLAP_MINUTES", "30"))
+
+# Ids vistos só precisam durar a janela do histórico (+ folga)
+SEEN_IDS_MAX = int(os.getenv("SEEN_IDS_MAX", "20000"))
+
+SUPERBET_HEADERS = {'Accept': 'application/json', 'User-Agent': 'Mozilla/5.0'}
+# Corpo do histórico decodificado inteiro pelo orjson (mais rápido até ~400 KB, ver bench_superbet_stream);
+# passando de SUPERBET_STREAM_MIN_BYTES lê o array "data" aos pedaços e só decodifica eventos ainda não vistos
+SUPERBET_STREAM = os.getenv("SUPERBET_STREAM", "1") == "1"
+SUPERBET_STREAM_MIN_BYTES = int(os.getenv("SUPERBET_STREAM_MIN_BYTES", str(512 * 1024)))
+
+
+
+def tournament_info(t_data: Dict) -> tuple:
+    name = t_data.get('localNames', {}).get('pt-BR', t_data.get('name', ''))
+    footer = str(t_data.get('footer', ''))
+    duration_match = re.search(r'(\d+x\d+)', footer, re.IGNORECASE)
+    duration = f"{duration_match.group(1)} min" if duration_match else "12 min"
+    return name, duration
+
+
+class SuperbetAdapter(SourceAdapter):
+    name = "superbet"
+
+    def __init__(self, pipeline, scheduler: PollScheduler, state_collection):
+        super().__init__(pipeline)
+        self.scheduler = scheduler
+        self.state = state_collection
+        # Cache de torneios Superbet
+        self.tournaments: Dict[str, Dict] = {}
+        self.seen_ids = SeenIds(window_seconds=SUPERBET_BACKFILL_HOURS * 3600 + 600, max_entries=SEEN_IDS_MAX)
+        self.watermark: datetime | None = None
+        # utcDate (ISO, compara como string) do jogo mais recente de cada torneio: base da previsão do próximo fim
+        self.tournament_last: Dict[str, str] = {}
+        self.parse_stats = {"events": 0, "decoded": 0, "skipped_seen": 0, "bytes": 0}
+        self.polled = False
+
+    def jobs(self) -> List[Job]:
+        return [
+            Job("superbet_struct", STRUCT_INTERVAL, self.refresh_struct),
+            Job("superbet_history", SUPERBET_INTERVAL, self.history_tick),
+        ]
+
+    def stats(self) -> Dict:
+        return {"tournaments": len(self.tournaments), "seen_ids": self.seen_ids.stats(),
+                "watermark": self.watermark.isoformat() if self.watermark else None,
+                "parse": self.parse_stats}
+
+    async def start(self) -> None:
+        await self.load_watermark()
+
+    def ready(self) -> bool:
+        return self.polled
+
+    # ---------- restart a quente ----------
+    def dump_state(self) -> Dict:
+        return {"tournaments": self.tournaments, "seen_ids": self.seen_ids.snapshot(),
+                "tournament_last": self.tournament_last}
+
+    def load_state(self, state: Dict, age_s: float) -> None:
+        for t_id, info in state.get("tournaments", {}).items():
+            self.tournaments.setdefault(t_id, info)
+        self.seen_ids.restore(state.get("seen_ids", []), age_s)
+        for t_id, utc_date in state.get("tournament_last", {}).items():
+            if utc_date > self.tournament_last.get(t_id, ""):
+                self.tournament_last[t_id] = utc_date
+        log.info("♻️ [SUPERBET] %d torneios e %d ids vistos restaurados (snapshot de %.0fs)",
+                 len(self.tournaments), len(self.seen_ids), age_s)
+
+    # ---------- torneios ----------
+    async def refresh_struct(self) -> None:
+        had_tournaments = bool(self.tournaments)
+        r = await upstream.get(SUPERBET_STRUCT_API, headers={'User-Agent': 'Mozilla/5.0'}, timeout=20,
+                               api="superbet_struct", revalidate=True)
+        if r.extensions.get("upstream_cache") == "revalidated":
+            # 304: struct igual ao da última vez, cache de torneios já está em dia
+            log.debug("[SUPERBET STRUCT] Sem mudanças (%d torneios)", len(self.tournaments))
+            return None
+        data = fastjson.loads(r.content)
+        tournaments = data.get('data', {}).get('tournaments', [])
+        count = 0
+
+        # Se for lista (como é no endpoint sem currentStatus)
+        if isinstance(tournaments, list):
+            for t_data in tournaments:
+                t_id = str(t_data.get('id', ''))
+                if t_id:
+                    name, duration = tournament_info(t_data)
+                    self.tournaments[t_id] = {"name": name, "duration": duration}
+                    count += 1
+
+        # Se por algum motivo voltar a ser dict
+        elif isinstance(tournaments, dict):
+            for t_id, t_data in tournaments.items():
+                name, duration = tournament_info(t_data)
+                self.tournaments[str(t_id)] = {"name": name, "duration": duration}
+                count += 1
+
+        for info in self.tournaments.values():
+            # Duração do struct ("6x6 min") vale para a liga mapeada também no Altenar
+            self.scheduler.declare_duration(map_league_name(info["name"], info["duration"]), info["duration"])
+        log.info("✅ [SUPERBET STRUCT] Cache atualizado com %d torneios.", count)
+        if self.tournaments and not had_tournaments:
+            # Histórico estava esperando o struct: roda agora em vez de no próximo intervalo
+            self.scheduler.wake("superbet_history")
+        return None
+
+    # ---------- watermark ----------
+    async def load_watermark(self) -> None:
+        try:
+            state = await self.state.find_one({"_id": "superbet_watermark"})
+        except Exception as e:
+            log.warning("Watermark Superbet não carregado: %s", e)
+            return
+        if state and state.get("utc_date"):
+            # Mongo devolve datetime naive em UTC
+            self.watermark = state["utc_date"].replace(tzinfo=timezone.utc)
+            log.info("✅ [SUPERBET] Watermark restaurado: %s", self.watermark.isoformat())
+
+    async def advance_watermark(self, utc_date: str) -> None:
+        newest = datetime.fromisoformat(utc_date.replace('Z', '+00:00'))
+        if self.watermark is not None and newest <= self.watermark:
+            return
+        self.watermark = newest
+        await self.state.update_one(
+            {"_id": "superbet_watermark"}, {"$set": {"utc_date": newest}}, upsert=True)
+
+    def window_start(self, now_utc: datetime) -> datetime:
+        backfill_start = now_utc - timedelta(hours=SUPERBET_BACKFILL_HOURS)
+        if self.watermark is None:
+            return backfill_start
+        # Sobreposição cobre jogos publicados com atraso; nunca volta além do backfill
+        return max(backfill_start, self.watermark - timedelta(minutes=SUPERBET_OVERLAP_MINUTES))
+
+    # ---------- histórico ----------
+    async def history_events(self, url: str):
+        stats = self.parse_stats
+        if not SUPERBET_STREAM:
+            r = await upstream.get(url, headers=SUPERBET_HEADERS, timeout=30, api="superbet_history")
+            if r.status_code != 200:
+                return
+            for event in self.decode_history(r.content):
+                yield event
+            return
+
+        async with upstream.stream(url, headers=SUPERBET_HEADERS, timeout=30, api="superbet_history") as r:
+            if r.status_code != 200:
+                return
+            # Junta o corpo até o limite; janela pequena (o caso normal) vai inteira para o orjson
+            head: List[bytes] = []
+            size = 0
+            chunks = r.aiter_bytes()
+            async for chunk in chunks:
+                head.append(chunk)
+                size += len(chunk)
+                if size >= SUPERBET_STREAM_MIN_BYTES:
+                    break
+            else:
+                for event in self.decode_history(b"".join(head)):
+                    yield event
+                return
+
+            scanner = jsonstream.ArrayScanner("data")
+            for event in self.decode_new(scanner.feed(b"".join(head))):
+                yield event
+            head.clear()
+            async for chunk in chunks:
+                for event in self.decode_new(scanner.feed(chunk)):
+                    yield event
+            stats["bytes"] += scanner.scanned_bytes
+
+    def decode_history(self, body: bytes):
+        stats = self.parse_stats
+        stats["bytes"] += len(body)
+        for event in fastjson.loads(body).get('data', []):
+            stats["events"] += 1
+            stats["decoded"] += 1
+            yield event
+
+    def decode_new(self, raws):
+        stats = self.parse_stats
+        for raw in raws:
+            stats["events"] += 1
+            # Já visto: utcDate dele não passa do watermark atual, pode pular sem decodificar
+            if jsonstream.peek_field(raw, "eventId") in self.seen_ids:
+                stats["skipped_seen"] += 1
+                continue
+            stats["decoded"] += 1
+            yield fastjson.loads(raw)
+
+    def build_match(self, event: Dict, event_id: str, utc_date: str | None) -> MatchResult:
+        match_name = event.get('matchName', '')
+        parts = match_name.split('·')
+        home_raw = parts[0].strip() if len(parts) > 0 else ''
+        away_raw = parts[1].strip() if len(parts) > 1 else ''
+
+        meta = event.get('metadata', {})
+        ft_home = int(meta.get('homeTeamScore', 0))
+        ft_away = int(meta.get('awayTeamScore', 0))
+
+        ht_home = 0
+        ht_away = 0
+        for p in meta.get('periods', []):
+            if p.get('num') == 1:
+                ht_home = int(p.get('homeTeamScore', 0))
+                ht_away = int(p.get('awayTeamScore', 0))
+                break
+
+        t_id = str(event.get('tournamentId'))
+        cached_tournament = self.tournaments.get(t_id, {})
+
+        finished_at = datetime.fromisoformat(utc_date.replace(
+            'Z', '+00:00')).astimezone(USER_TZ) if utc_date else datetime.now(USER_TZ)
+
+        return MatchResult(
+            event_id=f"sb-{event_id}",
+            source=SOURCE,
+            league_raw=cached_tournament.get('name', f"Superbet League {t_id}"),
+            duration=cached_tournament.get('duration', '12 min'),
+            home_raw=home_raw,
+            away_raw=away_raw,
+            ft_home=ft_home,
+            ft_away=ft_away,
+            ht_home=ht_home,
+            ht_away=ht_away,
+            started_at=finished_at - timedelta(minutes=15),
+            finished_at=finished_at)
+
+    async def poll_history(self) -> int:
+        saved_count = 0
+        # Query dates always in UTC for Superbet API
+        now_utc = datetime.now(timezone.utc)
+        past_utc = self.window_start(now_utc)
+
+        start_date = past_utc.strftime('%Y-%m-%d+%H:%M:%S')
+        end_date = now_utc.strftime('%Y-%m-%d+%H:%M:%S')
+        url = SUPERBET_HISTORY_API.format(start_date, end_date)
+
+        newest_utc = None
+        async for event in self.history_events(url):
+            event_id = str(event.get('eventId'))
+
+            utc_date = event.get('utcDate')
+            if utc_date and (newest_utc is None or utc_date > newest_utc):
+                newest_utc = utc_date
+            t_id = str(event.get('tournamentId'))
+            if utc_date and utc_date > self.tournament_last.get(t_id, ""):
+                self.tournament_last[t_id] = utc_date
+
+            if event_id in self.seen_ids:
+                continue
+
+            await self.emit(self.build_match(event, event_id, utc_date))
+            self.seen_ids.add(event_id)
+            saved_count += 1
+
+        if newest_utc:
+            # Watermark só avança depois que tudo desta janela passou pelo writer
+            if saved_count > 0:
+                await self.pipeline.drain()
+            await self.advance_watermark(newest_utc)
+        self.polled = True
+        return saved_count
+
+    def next_finishes(self):
+        # Próximo jogo de cada torneio termina ~uma duração depois do último (as partidas são em sequência)
+        for t_id, utc_date in self.tournament_last.items():
+            info = self.tournaments.get(t_id)
+            if info is None:
+                continue
+            league = map_league_name(info["name"], info["duration"])
+            last = datetime.fromisoformat(utc_date.replace('Z', '+00:00'))
+            yield last + timedelta(minutes=self.scheduler.match_minutes(league, info["duration"]))
+
+    async def history_tick(self) -> float:
+        if not self.tournaments:
+            # Sem torneios não há como mapear a liga; o refresh_struct acorda este job quando chegarem
+            log.debug("⏳ Aguardando cache de torneios da Superbet carregar...")
+            return SUPERBET_INTERVAL
+        saved_count = await self.poll_history()
+        # Perto do próximo fim previsto de algum torneio volta logo; sem previsão o intervalo vai dobrando
+        return self.scheduler.superbet_delay(saved_count, self.next_finishes(), datetime.now(timezone.utc))
@@ -0,0 +1,421 @@
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Tuple
+
+from pymongo import DeleteOne, ReplaceOne, UpdateOne
+
+from logs import get_logger
+from metrics import MONGO_OP_SECONDS
+from sources.base import USER_TZ
+
+log = get_logger("stats")
+
+# ====================== CONFIG ======================
+STATS_RECENT = int(os.getenv("STATS_RECENT", "10"))
+STATS_OVER_LINES = tuple(float(x) for x in os.getenv("STATS_OVER_LINES", "2.5,3.5,4.5,5.5").split(",") if x.strip())
+STATS_FLUSH_INTERVAL = float(os.getenv("STATS_FLUSH_INTERVAL", "5"))
+# Jogos já somados lembrados para não contar duas vezes um re-save (reprocessamento, overlap do Superbet)
+STATS_APPLIED_MAX = int(os.getenv("STATS_APPLIED_MAX", "50000"))
+# meta.applied_through fica esse tanto atrás do flush: cobre bulk do writer gravado antes e somado depois
+STATS_CATCHUP_MARGIN = float(os.getenv("STATS_CATCHUP_MARGIN", "300"))
+
+META_ID = "meta"
+# Assinatura de cada jogo somado, gravada junto com os agregados: {_id: "applied:<event_id>", sig: [...]}
+APPLIED_PREFIX = "applied:"
+
+# (event_id, league, home_nick, away_nick, ht_home, ht_away, ft_home, ft_away, finished_at ISO)
+Signature = Tuple[str, str, str, str, int, int, int, int, str]
+
+
+def _over_key(line: float) -> str:
+    # Sem ponto no nome do campo (Mongo)
+    return "over_" + str(line).replace(".", "_")
+
+
+def _split() -> Dict:
+    return {"played": 0, "wins": 0, "draws": 0, "losses": 0, "goals_for": 0, "goals_against": 0}
+
+
+def _result(goals_for: int, goals_against: int) -> str:
+    if goals_for > goals_against:
+        return "wins"
+    return "draws" if goals_for == goals_against else "losses"
+
+
+def _iso(dt) -> str:
+    if isinstance(dt, datetime):
+        # Mongo devolve naive em UTC e só guarda milissegundos: memória e banco geram a mesma assinatura
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        dt = dt.replace(microsecond=dt.microsecond // 1000 * 1000)
+        return dt.astimezone(USER_TZ).isoformat(timespec="milliseconds")
+    return str(dt or "")
+
+
+def signature(doc: Dict) -> Signature | None:
+    home, away = doc.get("home_nick") or "", doc.get("away_nick") or ""
+    if not doc.get("event_id") or not home or not away or home.upper() == away.upper():
+        return None
+    return (doc["event_id"], doc.get("league_mapped", ""), home, away,
+            int(doc.get("home_score_ht", 0)), int(doc.get("away_score_ht", 0)),
+            int(doc.get("home_score_ft", 0)), int(doc.get("away_score_ft", 0)),
+            _iso(doc.get("finished_at")))
+
+
+def player_key(nick: str) -> str:
+    return f"player:{nick.upper()}"
+
+
+def h2h_key(a: str, b: str) -> Tuple[str, bool]:
+    # Par ordenado: (chave, a é o primeiro do par)
+    ua, ub = a.upper(), b.upper()
+    return (f"h2h:{ua}|{ub}", True) if ua <= ub else (f"h2h:{ub}|{ua}", False)
+
+
+def _new_player(nick: str) -> Dict:
+    doc = {"_id": player_key(nick), "nick": nick, "ft": _split(), "ht": _split(), "btts": 0, "recent": []}
+    doc.update({_over_key(line): 0 for line in STATS_OVER_LINES})
+    return doc
+
+
+def _new_h2h(key: str, first: str, second: str) -> Dict:
+    doc = {"_id": key, "players": [first, second], "played": 0,
+           "ft": {"wins": [0, 0], "draws": 0, "goals": [0, 0]},
+           "ht": {"wins": [0, 0], "draws": 0, "goals": [0, 0]},
+           "btts": 0, "recent": []}
+    doc.update({_over_key(line): 0 for line in STATS_OVER_LINES})
+    return doc
+
+
+def _add_split(split: Dict, goals_for: int, goals_against: int, sign: int) -> None:
+    split["played"] += sign
+    split[_result(goals_for, goals_against)] += sign
+    split["goals_for"] += sign * goals_for
+    split["goals_against"] += sign * goals_against
+
+
+def _add_totals(doc: Dict, ft_home: int, ft_away: int, sign: int) -> None:
+    total = ft_home + ft_away
+    for line in STATS_OVER_LINES:
+        if total > line:
+            doc[_over_key(line)] += sign
+    if ft_home > 0 and ft_away > 0:
+        doc["btts"] += sign
+
+
+def _add_pair(block: Dict, first_goals: int, second_goals: int, sign: int) -> None:
+    if first_goals == second_goals:
+        block["draws"] += sign
+    else:
+        block["wins"][0 if first_goals > second_goals else 1] += sign
+    block["goals"][0] += sign * first_goals
+    block["goals"][1] += sign * second_goals
+
+
+def _push_recent(recent: List[Dict], entry: Dict, limit: int) -> None:
+    # Mais recente primeiro; re-save de jogo antigo entra na posição certa
+    recent.append(entry)
+    recent.sort(key=lambda e: (e["finished_at"], e["event_id"]), reverse=True)
+    del recent[limit:]
+
+
+def _drop_recent(recent: List[Dict], event_id: str) -> None:
+    recent[:] = [e for e in recent if e["event_id"] != event_id]
+
+
+# Agregados por jogador e por confronto, mantidos a cada jogo gravado.
+# Em memória para servir em O(1); os docs alterados vão para o Mongo a cada flush.
+# Acumulam tudo desde a primeira construção: a retenção apaga jogos de finished_matches, não dos
+# agregados. Um rebuild só enxerga o que a retenção ainda guarda, então ele zera o histórico
+# (meta.history_from diz desde quando os números valem).
+class MatchStats:
+    def __init__(self, collection, recent: int = STATS_RECENT):
+        self.collection = collection
+        self.recent = recent
+        self._docs: Dict[str, Dict] = {}
+        self._applied: Dict[str, Signature] = {}
+        self._dirty: set = set()
+        # Assinaturas ainda não gravadas / esquecidas (a apagar) desde o último flush
+        self._applied_dirty: set = set()
+        self._forgotten: set = set()
+        self.generation = 0
+        self.loaded = False
+        self.stats = {"applied": 0, "replaced": 0, "skipped": 0, "caught_up": 0,
+                      "flushes": 0, "docs_written": 0, "errors": 0}
+
+    # ---------- atualização incremental ----------
+    def _apply(self, sig: Signature, sign: int) -> None:
+        event_id, league, home, away, ht_home, ht_away, ft_home, ft_away, finished_at = sig
+
+        for nick, opponent, is_home, gf, ga, ht_gf, ht_ga in (
+                (home, away, True, ft_home, ft_away, ht_home, ht_away),
+                (away, home, False, ft_away, ft_home, ht_away, ht_home)):
+            key = player_key(nick)
+            doc = self._docs.get(key)
+            if doc is None:
+                doc = self._docs[key] = _new_player(nick)
+            if sign > 0:
+                # Grafia do nick mais recente
+                doc["nick"] = nick
+            _add_split(doc["ft"], gf, ga, sign)
+            _add_split(doc["ht"], ht_gf, ht_ga, sign)
+            _add_totals(doc, ft_home, ft_away, sign)
+
+            by_league = next((r for r in doc["recent"] if r["league"] == league), None)
+            if sign > 0:
+                if by_league is None:
+                    by_league = {"league": league, "results": []}
+                    doc["recent"].append(by_league)
+                    doc["recent"].sort(key=lambda r: r["league"])
+                _push_recent(by_league["results"], {
+                    "event_id": event_id, "opponent": opponent, "home": is_home,
+                    "result": _result(gf, ga)[0].upper(), "ft": [gf, ga], "ht": [ht_gf, ht_ga],
+                    "finished_at": finished_at}, self.recent)
+            elif by_league is not None:
+                _drop_recent(by_league["results"], event_id)
+            self._dirty.add(key)
+
+        key, home_first = h2h_key(home, away)
+        first, second = (home, away) if home_first else (away, home)
+        doc = self._docs.get(key)
+        if doc is None:
+            doc = self._docs[key] = _new_h2h(key, first, second)
+        if sign > 0:
+            doc["players"] = [first, second]
+        doc["played"] += sign
+        if home_first:
+            _add_pair(doc["ft"], ft_home, ft_away, sign)
+            _add_pair(doc["ht"], ht_home, ht_away, sign)
+        else:
+            _add_pair(doc["ft"], ft_away, ft_home, sign)
+            _add_pair(doc["ht"], ht_away, ht_home, sign)
+        _add_totals(doc, ft_home, ft_away, sign)
+        if sign > 0:
+            _push_recent(doc["recent"], {
+                "event_id": event_id, "league": league, "home": home, "away": away,
+                "ft": [ft_home, ft_away], "ht": [ht_home, ht_away], "finished_at": finished_at}, self.recent)
+        else:
+            _drop_recent(doc["recent"], event_id)
+        self._dirty.add(key)
+
+    def _remember(self, sig: Signature) -> None:
+        self._applied[sig[0]] = sig
+        self._applied_dirty.add(sig[0])
+        self._forgotten.discard(sig[0])
+        if len(self._applied) > STATS_APPLIED_MAX:
+            # dict mantém ordem de inserção: esquece o mais antigo
+            oldest = next(iter(self._applied))
+            del self._applied[oldest]
+            self._applied_dirty.discard(oldest)
+            self._forgotten.add(oldest)
+
+    def apply(self, doc: Dict) -> None:
+        sig = signature(doc)
+        if sig is None:
+            return
+        previous = self._applied.get(sig[0])
+        if previous == sig:
+            self.stats["skipped"] += 1
+            return
+        if previous is not None:
+            # Mesmo jogo com placar/nick corrigido: tira o antigo antes de somar o novo
+            self._apply(previous, -1)
+            self.stats["replaced"] += 1
+        self._apply(sig, 1)
+        self._remember(sig)
+        self.stats["applied"] += 1
+
+    def apply_many(self, docs: Iterable[Dict]) -> None:
+        for doc in docs:
+            self.apply(doc)
+
+    # ---------- leitura ----------
+    def player(self, nick: str) -> Dict | None:
+        doc = self._docs.get(player_key(nick))
+        if doc is None:
+            return None
+        return {k: v for k, v in doc.items() if k != "_id"}
+
+    def h2h(self, a: str, b: str) -> Dict | None:
+        key, a_first = h2h_key(a, b)
+        doc = self._docs.get(key)
+        if doc is None:
+            return None
+        result = {k: v for k, v in doc.items() if k != "_id"}
+        if not a_first:
+            # Devolve na ordem pedida (a, b)
+            result["players"] = doc["players"][::-1]
+            for half in ("ft", "ht"):
+                result[half] = {**doc[half], "wins": doc[half]["wins"][::-1], "goals": doc[half]["goals"][::-1]}
+        return result
+
+    # ---------- Mongo ----------
+    async def _seed_applied(self, matches) -> None:
+        # Meta antiga, sem assinaturas gravadas: supõe que os jogos retidos já estão nos agregados
+        self._applied = {}
+        cursor = matches.find({}, {"_id": 0, "event_id": 1, "league_mapped": 1, "home_nick": 1, "away_nick": 1,
+                                   "home_score_ht": 1, "away_score_ht": 1, "home_score_ft": 1,
+                                   "away_score_ft": 1, "finished_at": 1}).sort("finished_at", 1)
+        async for doc in cursor:
+            sig = signature(doc)
+            if sig is not None:
+                self._remember(sig)
+
+    async def _recompute(self, matches) -> None:
+        self._docs = {}
+        self._applied = {}
+        async for doc in matches.find({}).sort("finished_at", 1):
+            self.apply(doc)
+
+    async def _catch_up(self, matches, since: datetime) -> int:
+        # Gravado pelo writer mas ainda não somado no último flush (crash, troca de líder):
+        # apply() compara com a assinatura gravada, então o que já estava somado não conta duas vezes
+        caught = 0
+        async for doc in matches.find({"updated_at": {"$gt": since}}).sort("updated_at", 1):
+            applied = self.stats["applied"]
+            self.apply(doc)
+            caught += self.stats["applied"] - applied
+        self.stats["caught_up"] += caught
+        return caught
+
+    async def load(self, matches) -> int:
+        meta = await self.collection.find_one({"_id": META_ID})
+        self._applied_dirty = set()
+        self._forgotten = set()
+        if meta is None:
+            # Coleção nunca construída: monta em memória; o líder grava tudo no próximo flush
+            await self._recompute(matches)
+            self._dirty = set(self._docs)
+            self.loaded = True
+            return len(self._docs)
+        self._docs = {}
+        self._applied = {}
+        applied: List[Signature] = []
+        async for doc in self.collection.find({"_id": {"$ne": META_ID}}):
+            if doc["_id"].startswith(APPLIED_PREFIX):
+                applied.append(tuple(doc["sig"]))
+            else:
+                self._docs[doc["_id"]] = doc
+        self._dirty = set()
+        self.generation = meta.get("generation", 0)
+        since = meta.get("applied_through")
+        if since is None:
+            await self._seed_applied(matches)
+            self._applied_dirty = set(self._applied)
+        else:
+            # Mais antigo primeiro, como foram somados (é o que _remember esquece primeiro)
+            for sig in sorted(applied, key=lambda sig: sig[8]):
+                self._remember(sig)
+            self._applied_dirty = set()
+            caught = await self._catch_up(matches, since)
+            if caught:
+                log.info("📊 [STATS] %d jogos gravados depois do último flush somados agora", caught)
+        self.loaded = True
+        return len(self._docs)
+
+    async def rebuild(self, matches) -> int:
+        started = datetime.now(timezone.utc)
+        await self._recompute(matches)
+        self._dirty = set()
+        self._applied_dirty = set()
+        self._forgotten = set()
+
+        meta = await self.collection.find_one({"_id": META_ID}) or {}
+        self.generation = meta.get("generation", 0) + 1
+        oldest = await matches.find_one({}, {"finished_at": 1}, sort=[("finished_at", 1)])
+        history_from = oldest["finished_at"] if oldest else None
+        await self.collection.delete_many({"_id": {"$ne": META_ID}})
+        docs = list(self._docs.values())
+        rows = docs + [_applied_doc(sig) for sig in self._applied.values()]
+        for i in range(0, len(rows), 1000):
+            await self.collection.insert_many(rows[i:i + 1000])
+        await self.collection.replace_one(
+            {"_id": META_ID},
+            {"generation": self.generation, "rebuilt_at": datetime.now(timezone.utc),
+             "matches": len(self._applied), "history_from": history_from,
+             "applied_through": started - timedelta(seconds=STATS_CATCHUP_MARGIN)},
+            upsert=True)
+        self.loaded = True
+        log.warning("📊 [STATS] Reconstruído: %d jogos, %d agregados (geração %d); histórico agora começa em %s",
+                    len(self._applied), len(docs), self.generation, history_from)
+        return len(docs)
+
+    async def reload_if_rebuilt(self, matches, meta: Dict | None = None) -> bool:
+        # Rebuild rodou em outro processo: adota o resultado (líder antes de gravar, réplicas a cada refresh)
+        if meta is None:
+            meta = await self.collection.find_one({"_id": META_ID}, {"generation": 1})
+        if meta is None or meta.get("generation", 0) == self.generation:
+            return False
+        log.info("📊 [STATS] Nova geração %s no Mongo, recarregando", meta.get("generation"))
+        await self.load(matches)
+        return True
+
+    async def flush(self, matches) -> int:
+        meta = await self.collection.find_one({"_id": META_ID}, {"generation": 1})
+        if await self.reload_if_rebuilt(matches, meta):
+            # Descarta o pendente: a nova geração já foi calculada de finished_matches
+            return 0
+        if not self._dirty and not self._applied_dirty and not self._forgotten:
+            return 0
+        applied_through = datetime.now(timezone.utc) - timedelta(seconds=STATS_CATCHUP_MARGIN)
+        keys, self._dirty = self._dirty, set()
+        applied, self._applied_dirty = self._applied_dirty, set()
+        forgotten, self._forgotten = self._forgotten, set()
+        ops = [ReplaceOne({"_id": key}, self._docs[key], upsert=True) for key in keys if key in self._docs]
+        ops += [ReplaceOne({"_id": APPLIED_PREFIX + event_id}, _applied_doc(self._applied[event_id]), upsert=True)
+                for event_id in applied if event_id in self._applied]
+        ops += [DeleteOne({"_id": APPLIED_PREFIX + event_id}) for event_id in forgotten]
+        # Marca por último, no mesmo bulk ordenado: só avança se agregados e assinaturas foram gravados.
+        # $setOnInsert: não desfaz a geração de um rebuild que rodou entre o find_one e aqui
+        ops.append(UpdateOne({"_id": META_ID}, {"$set": {"applied_through": applied_through},
+                                                "$setOnInsert": {"generation": self.generation}}, upsert=True))
+        try:
+            with MONGO_OP_SECONDS.time(op="stats_write"):
+                await self.collection.bulk_write(ops, ordered=True)
+        except Exception as e:
+            self._dirty |= keys
+            self._applied_dirty |= applied
+            self._forgotten |= forgotten
+            self.stats["errors"] += 1
+            log.error("❌ [STATS] Falha ao gravar %d agregados: %s", len(ops), e)
+            return 0
+        self.stats["flushes"] += 1
+        self.stats["docs_written"] += len(ops)
+        return len(ops)
+
+    async def run(self, matches, interval: float = STATS_FLUSH_INTERVAL) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush(matches)
+            except Exception as e:
+                log.error("Stats flush error: %s", e)
+
+    def as_dict(self) -> Dict:
+        return {**self.stats, "aggregates": len(self._docs), "remembered": len(self._applied),
+                "pending": len(self._dirty), "generation": self.generation, "loaded": self.loaded}
+
+
+def _applied_doc(sig: Signature) -> Dict:
+    return {"_id": APPLIED_PREFIX + sig[0], "sig": list(sig)}
+
+
+async def _rebuild_command() -> int:
+    # python stats.py rebuild: recalcula tudo de finished_matches; o líder adota a nova geração no próximo flush
+    import replay
+    from ingestion import MONGO_DB
+
+    client = replay.mongo_client(os.getenv("MONGO_URI"))
+    db = client[MONGO_DB]
+    stats = MatchStats(db["match_stats"])
+    await stats.rebuild(db["finished_matches"])
+    return 0
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        print("uso: python stats.py rebuild  (recalcula só com os jogos ainda retidos: zera o histórico)")
+        sys.exit(2)
+    sys.exit(asyncio.run(_rebuild_command()))
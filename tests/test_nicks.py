@@ -0,0 +1,48 @@
+from pathlib import Path
+
+import pytest
+
+from bench import legacy
+from nicks import extract_pure_nick_canonical
+
+CORPUS = Path(__file__).resolve().parent.parent / "bench" / "data" / "raw_names.txt"
+
+CORPUS_NAMES = [line for line in CORPUS.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+# Casos de borda fora do corpus: vazio, só sigla, parênteses aninhados/desbalanceados, caixa mista
+EDGE_CASES = [
+    "",
+    " ",
+    "()",
+    "FC",
+    "PSG",
+    "AC Milan",
+    "(RW)",
+    "Real Madrid ((Nikkitta))",
+    "Real Madrid (Team (Kodak))",
+    "Arsenal (Bob) (Tom)",
+    "Chelsea (PELE",
+    "Chelsea PELE)",
+    "bArCeLoNa (kRaKeN)",
+    "BARCELONA (kraken)",
+    "barcelona (KRAKEN)",
+    "Inter Milan Esports (  spaced  )",
+    "Man Utd (Ö-Düsseldorf)",
+    "Spain (Nikkitta) vs France (KRaken)",
+]
+
+
+@pytest.mark.parametrize("raw", CORPUS_NAMES)
+def test_corpus_parity_with_legacy(raw):
+    assert extract_pure_nick_canonical(raw) == legacy.extract_pure_nick_canonical(raw)
+
+
+@pytest.mark.parametrize("raw", EDGE_CASES)
+def test_edge_case_parity_with_legacy(raw):
+    assert extract_pure_nick_canonical(raw) == legacy.extract_pure_nick_canonical(raw)
+
+
+def test_repeated_calls_are_stable():
+    # O memo não pode mudar o resultado entre a 1ª e as próximas chamadas
+    for raw in CORPUS_NAMES + EDGE_CASES:
+        assert extract_pure_nick_canonical(raw) == extract_pure_nick_canonical(raw)
@@ -0,0 +1,37 @@
+import timeline
+from hub import BroadcastHub
+from read_model import LiveSnapshot
+from scheduler import PollScheduler
+from sources.altenar import AltenarAdapter
+
+DATA = {"competitors": [{"id": 1, "name": "Home"}, {"id": 2, "name": "Away"}],
+        "champs": [{"id": 1, "name": "Valhalla Cup"}]}
+
+
+def tick(score, live_time):
+    return {"id": "1", "sportId": 66, "score": list(score), "liveTime": live_time,
+            "competitorIds": [1, 2], "champId": 1, "name": "Home vs. Away"}
+
+
+def test_append_skips_zero_delta():
+    packed = timeline.append(b"", 10, 1, 0)
+    assert timeline.append(packed, 12, 1, 0) == packed
+    assert timeline.half_time_score(packed) is None
+
+
+def test_mark_half_time_still_writes_marker():
+    packed = timeline.mark_half_time(timeline.append(b"", 10, 1, 0), 45)
+    assert timeline.half_time_score(packed) == (1, 0)
+
+
+def test_restored_entry_without_timeline_has_no_phantom_half_time():
+    # Snapshot antigo: placar sem linha do tempo; o feed corrige o placar para baixo
+    adapter = AltenarAdapter(None, PollScheduler(), BroadcastHub(), LiveSnapshot())
+    restored = adapter.build_live_entry(tick((2, 1), "1º tempo 20'"), DATA, None)
+    restored.timeline = b""
+    entry = adapter.build_live_entry(tick((0, 0), "1º tempo 22'"), DATA, restored)
+    assert timeline.half_time_score(entry.timeline) is None
+    assert timeline.decode(entry.timeline) == ([], None)
+
+    entry = adapter.build_live_entry(tick((1, 0), "1º tempo 30'"), DATA, entry)
+    assert timeline.decode(entry.timeline) == ([(30, 1, 0)], None)
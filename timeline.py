@@ -0,0 +1,97 @@
+import re
+from array import array
+from typing import Dict, List, Tuple
+
+# Linha do tempo de gols de um evento, empacotada: cada transição são 3 bytes com sinal
+# (Δminuto, Δcasa, Δfora) em relação à anterior, a partir de (0, 0, 0).
+# Linha com Δcasa = Δfora = 0 não é gol: marca o fim do 1º tempo no minuto acumulado.
+# Um jogo típico cabe em ~20 bytes (contra ~100 por dict na lista).
+
+Row = Tuple[int, int, int]
+
+# Tempo do jogo segundo o liveTime; só avança
+UNKNOWN, FIRST_HALF, HALF_TIME, SECOND_HALF = 0, 1, 2, 3
+
+# Dígito só conta como tempo seguido de marca de tempo ("1º", "2nd", "1T", "1 half"); "23'" é minuto
+_PERIOD_RE = re.compile(r"^\s*([12])\s*(?:º|°|ª|o\b|st\b|nd\b|t\b|h\b|tempo|half)")
+_MINUTE_RE = re.compile(r"(\d+)(?:\s*\+\s*(\d+))?\s*'")
+_BREAK_WORDS = ("int", "half time", "halftime")
+
+
+def parse_live_time(live_time: str) -> Tuple[int, int | None]:
+    # "1º tempo 23'" -> (FIRST_HALF, 23); "2º tempo 45+2'" -> (SECOND_HALF, 47); "Intervalo" -> (HALF_TIME, None)
+    # Minuto solto ("71'", "45+2'") não diz o tempo: (UNKNOWN, minuto)
+    text = str(live_time).lower()
+    if any(word in text for word in _BREAK_WORDS):
+        return HALF_TIME, None
+    match = _PERIOD_RE.match(text)
+    period = (FIRST_HALF if match.group(1) == "1" else SECOND_HALF) if match else UNKNOWN
+    minute = _MINUTE_RE.search(text)
+    if minute is None:
+        return period, None
+    return period, int(minute.group(1)) + int(minute.group(2) or 0)
+
+
+def _clamp(value: int) -> int:
+    return -128 if value < -128 else 127 if value > 127 else value
+
+
+def last(packed: bytes) -> Row:
+    minute = home = away = 0
+    deltas = array("b", packed)
+    for i in range(0, len(deltas), 3):
+        minute += deltas[i]
+        home += deltas[i + 1]
+        away += deltas[i + 2]
+    return minute, home, away
+
+
+def _push(packed: bytes, minute: int | None, home: int, away: int) -> bytes:
+    # bytes imutáveis: a LiveEntry antiga (na fila do resolver) continua com a linha dela
+    prev_minute, prev_home, prev_away = last(packed)
+    if minute is None:
+        minute = prev_minute
+    row = array("b", (_clamp(minute - prev_minute), _clamp(home - prev_home), _clamp(away - prev_away)))
+    return packed + row.tobytes()
+
+
+def append(packed: bytes, minute: int | None, home: int, away: int) -> bytes:
+    # Delta contra o fim da linha, não contra o placar anterior da entrada (restaurada pode ter linha vazia):
+    # placar igual ao da linha não vira linha de Δ zero, que leria como marca do intervalo
+    _, prev_home, prev_away = last(packed)
+    if home == prev_home and away == prev_away:
+        return packed
+    return _push(packed, minute, home, away)
+
+
+def mark_half_time(packed: bytes, minute: int | None) -> bytes:
+    _, home, away = last(packed)
+    return _push(packed, minute, home, away)
+
+
+def decode(packed: bytes) -> Tuple[List[Row], Row | None]:
+    # (gols com placar acumulado, (minuto, casa, fora) no intervalo ou None)
+    goals: List[Row] = []
+    half_time = None
+    minute = home = away = 0
+    deltas = array("b", packed or b"")
+    for i in range(0, len(deltas), 3):
+        minute += deltas[i]
+        if deltas[i + 1] == 0 and deltas[i + 2] == 0:
+            if half_time is None:
+                half_time = (minute, home, away)
+            continue
+        home += deltas[i + 1]
+        away += deltas[i + 2]
+        goals.append((minute, home, away))
+    return goals, half_time
+
+
+def half_time_score(packed: bytes) -> Tuple[int, int] | None:
+    _, half_time = decode(packed)
+    return (half_time[1], half_time[2]) if half_time else None
+
+
+def as_json(packed: bytes) -> Dict:
+    goals, half_time = decode(packed)
+    return {"goals": [list(g) for g in goals], "half_time": list(half_time) if half_time else None}
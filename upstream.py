@@ -0,0 +1,395 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from logs import get_logger
+from metrics import UPSTREAM_BREAKER_OPEN, UPSTREAM_CACHE, UPSTREAM_REQUEST_SECONDS, UPSTREAM_REQUESTS
+
+log = get_logger("upstream")
+
+# ====================== CONFIG ======================
+# Um AsyncClient de longa duração por host (biahosted / fastly), com keep-alive.
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "20"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "90"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "1") == "1"
+# Limite por host (token bucket): requisições/s sustentadas e rajada máxima
+HTTP_HOST_RATE = float(os.getenv("HTTP_HOST_RATE", "10"))
+HTTP_HOST_BURST = float(os.getenv("HTTP_HOST_BURST", "20"))
+# Circuit breaker por host: N falhas seguidas (erro de rede, 5xx, 429) abrem o circuito por 5s, 10s, 20s...
+HTTP_BREAKER_THRESHOLD = int(os.getenv("HTTP_BREAKER_THRESHOLD", "5"))
+HTTP_BREAKER_BASE = float(os.getenv("HTTP_BREAKER_BASE", "5"))
+HTTP_BREAKER_MAX = float(os.getenv("HTTP_BREAKER_MAX", "300"))
+# Respostas guardadas (cache com TTL e validadores ETag/Last-Modified)
+HTTP_CACHE_MAX = int(os.getenv("HTTP_CACHE_MAX", "2000"))
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+_stats: Dict[str, Dict[str, int]] = {}
+
+
+class _TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self) -> float:
+        waited = 0.0
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return waited
+            delay = (1 - self.tokens) / self.rate
+            waited += delay
+            await asyncio.sleep(delay)
+
+
+_buckets: Dict[str, _TokenBucket] = {}
+
+
+class CircuitOpenError(httpx.HTTPError):
+    def __init__(self, host: str, retry_after: float):
+        super().__init__(f"circuito aberto para {host} (nova tentativa em {retry_after:.0f}s)")
+        self.host = host
+        self.retry_after = retry_after
+
+
+class _OwnerCancelled(Exception):
+    # Quem fazia a requisição compartilhada foi cancelado; quem esperava por ela tenta de novo
+    pass
+
+
+class _Breaker:
+    __slots__ = ("host", "failures", "opens", "open_until", "probing", "rejected")
+
+    def __init__(self, host: str):
+        self.host = host
+        self.failures = 0
+        self.opens = 0
+        self.open_until = 0.0
+        self.probing = False
+        self.rejected = 0
+
+    def allow(self) -> None:
+        if not self.open_until:
+            return
+        now = time.monotonic()
+        if now < self.open_until or self.probing:
+            self.rejected += 1
+            raise CircuitOpenError(self.host, max(self.open_until - now, 0.0))
+        # Meio-aberto: uma requisição de teste passa; as outras esperam o resultado dela
+        self.probing = True
+
+    def success(self) -> None:
+        if self.open_until:
+            log.info("✅ [UPSTREAM] %s respondeu, circuito fechado", self.host)
+            UPSTREAM_BREAKER_OPEN.set(0, host=self.host)
+        self.failures = 0
+        self.opens = 0
+        self.open_until = 0.0
+        self.probing = False
+
+    def failure(self) -> None:
+        self.failures += 1
+        if self.probing or self.failures >= HTTP_BREAKER_THRESHOLD:
+            self.opens += 1
+            backoff = min(HTTP_BREAKER_BASE * 2 ** min(self.opens - 1, 16), HTTP_BREAKER_MAX)
+            self.open_until = time.monotonic() + backoff
+            self.probing = False
+            UPSTREAM_BREAKER_OPEN.set(1, host=self.host)
+            log.warning("⚠️ [UPSTREAM] %s com %d falhas seguidas, circuito aberto por %.0fs",
+                        self.host, self.failures, backoff)
+
+    def abort(self) -> None:
+        # Requisição de teste cancelada: libera para a próxima tentar
+        self.probing = False
+
+    def as_dict(self) -> Dict:
+        state = "closed"
+        if self.open_until:
+            state = "half_open" if self.probing or time.monotonic() >= self.open_until else "open"
+        return {"state": state, "failures": self.failures, "opens": self.opens, "rejected": self.rejected}
+
+
+_breakers: Dict[str, _Breaker] = {}
+
+# Single-flight: requisições iguais em andamento compartilham a mesma resposta
+_inflight: Dict[Tuple, asyncio.Future] = {}
+# chave -> (expira_em, resposta) para get(cache_ttl=...)
+_cache: Dict[Tuple, Tuple[float, httpx.Response]] = {}
+# chave -> (validadores, última resposta 200) para get(revalidate=True)
+_validators: Dict[Tuple, Tuple[Dict[str, str], httpx.Response]] = {}
+_cache_stats = {"hits": 0, "coalesced": 0, "not_modified": 0}
+
+# Gravação/replay offline (replay.py): transporte alternativo e callback por resposta
+_transport: httpx.AsyncBaseTransport | None = None
+_recorder: Callable[[httpx.Response], None] | None = None
+
+
+def use_transport(transport: httpx.AsyncBaseTransport | None) -> None:
+    global _transport
+    _transport = transport
+    # Clientes já abertos apontam para a rede; os próximos usam o transporte novo
+    _clients.clear()
+    _cache.clear()
+    _validators.clear()
+    _breakers.clear()
+
+
+def set_recorder(recorder: Callable[[httpx.Response], None] | None) -> None:
+    global _recorder
+    _recorder = recorder
+
+
+def _host_key(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _host_stats(host: str) -> Dict[str, int]:
+    stats = _stats.get(host)
+    if stats is None:
+        stats = _stats[host] = {"requests": 0, "new_connections": 0, "errors": 0, "throttled": 0}
+    return stats
+
+
+def get_client(url: str) -> httpx.AsyncClient:
+    host = _host_key(url)
+    session = _clients.get(host)
+    if session is None or session.is_closed:
+        session = httpx.AsyncClient(
+            base_url=host,
+            http2=HTTP2_ENABLED and HTTP2_AVAILABLE,
+            transport=_transport,
+            timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+        _clients[host] = session
+    return session
+
+
+def _breaker(host: str) -> _Breaker:
+    breaker = _breakers.get(host)
+    if breaker is None:
+        breaker = _breakers[host] = _Breaker(host)
+    return breaker
+
+
+def _is_failure(response: httpx.Response) -> bool:
+    return response.status_code >= 500 or response.status_code == 429
+
+
+async def _prepare(url: str, headers: Dict[str, str] | None,
+                   timeout: float | None) -> Tuple[httpx.AsyncClient, Dict, Dict, _Breaker]:
+    host = _host_key(url)
+    stats = _host_stats(host)
+    # Circuito aberto: falha na hora, sem ocupar conexão nem token do bucket
+    breaker = _breaker(host)
+    breaker.allow()
+
+    # O trace do httpcore avisa quando um TCP novo é aberto; o resto é reuso.
+    async def trace(event_name: str, info: Dict) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            stats["new_connections"] += 1
+
+    # Em replay não há bookmaker do outro lado para proteger
+    if HTTP_HOST_RATE > 0 and _transport is None:
+        bucket = _buckets.get(host)
+        if bucket is None:
+            bucket = _buckets[host] = _TokenBucket(HTTP_HOST_RATE, HTTP_HOST_BURST)
+        try:
+            if await bucket.acquire():
+                stats["throttled"] += 1
+        except BaseException:
+            # Cancelado esperando token: a requisição de teste do meio-aberto não saiu, libera o circuito
+            breaker.abort()
+            raise
+
+    kwargs = {"headers": headers, "extensions": {"trace": trace}}
+    if timeout is not None:
+        kwargs["timeout"] = httpx.Timeout(timeout, connect=HTTP_CONNECT_TIMEOUT)
+    stats["requests"] += 1
+    return get_client(url), kwargs, stats, breaker
+
+
+def _remember(store: Dict, key: Tuple, value) -> None:
+    store.pop(key, None)
+    store[key] = value
+    if len(store) > HTTP_CACHE_MAX:
+        # dict mantém ordem de inserção: descarta o mais antigo
+        store.pop(next(iter(store)))
+
+
+def _from_cache(response: httpx.Response, how: str) -> httpx.Response:
+    # Cópia marcada em extensions["upstream_cache"] ("fresh" ou "revalidated"); o corpo é o mesmo
+    return httpx.Response(response.status_code, headers=response.headers, content=response.content,
+                          request=response.request, extensions={"upstream_cache": how})
+
+
+async def _fetch(url: str, key: Tuple, headers: Dict[str, str] | None, timeout: float | None,
+                 api: str, revalidate: bool) -> httpx.Response:
+    validators = _validators.get(key) if revalidate else None
+    if validators is not None:
+        headers = {**(headers or {}), **validators[0]}
+
+    session, kwargs, stats, breaker = await _prepare(url, headers, timeout)
+    t0 = time.perf_counter()
+    try:
+        response = await session.get(url, **kwargs)
+    except httpx.HTTPError:
+        stats["errors"] += 1
+        UPSTREAM_REQUESTS.inc(api=api, status="error")
+        breaker.failure()
+        raise
+    except BaseException:
+        breaker.abort()
+        raise
+    finally:
+        UPSTREAM_REQUEST_SECONDS.observe(time.perf_counter() - t0, api=api)
+    UPSTREAM_REQUESTS.inc(api=api, status=str(response.status_code))
+    if _recorder is not None:
+        _recorder(response)
+    if _is_failure(response):
+        breaker.failure()
+    else:
+        breaker.success()
+
+    if revalidate:
+        if response.status_code == 304 and validators is not None:
+            _cache_stats["not_modified"] += 1
+            UPSTREAM_CACHE.inc(api=api, result="not_modified")
+            return _from_cache(validators[1], "revalidated")
+        if response.status_code == 200:
+            conditional = {}
+            if response.headers.get("etag"):
+                conditional["If-None-Match"] = response.headers["etag"]
+            if response.headers.get("last-modified"):
+                conditional["If-Modified-Since"] = response.headers["last-modified"]
+            if conditional:
+                _remember(_validators, key, (conditional, response))
+    return response
+
+
+async def get(url: str, *, headers: Dict[str, str] | None = None, timeout: float | None = None,
+              api: str = "other", cache_ttl: float = 0.0, revalidate: bool = False) -> httpx.Response:
+    # cache_ttl > 0: resposta 200 reaproveitada por até cache_ttl segundos.
+    # revalidate: manda If-None-Match/If-Modified-Since; 304 devolve o corpo guardado.
+    key = (url, tuple(sorted(headers.items())) if headers else ())
+
+    if cache_ttl > 0:
+        cached = _cache.get(key)
+        if cached is not None:
+            if cached[0] > time.monotonic():
+                _cache_stats["hits"] += 1
+                UPSTREAM_CACHE.inc(api=api, result="hit")
+                return _from_cache(cached[1], "fresh")
+            del _cache[key]
+
+    inflight = _inflight.get(key)
+    if inflight is not None:
+        _cache_stats["coalesced"] += 1
+        UPSTREAM_CACHE.inc(api=api, result="coalesced")
+        # shield: quem desiste não cancela a requisição dos outros
+        try:
+            return await asyncio.shield(inflight)
+        except _OwnerCancelled:
+            # O primeiro a voltar vira o novo dono; os demais esperam por ele
+            return await get(url, headers=headers, timeout=timeout, api=api,
+                             cache_ttl=cache_ttl, revalidate=revalidate)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        response = await _fetch(url, key, headers, timeout, api, revalidate)
+    except BaseException as e:
+        # Cancelamento é só do dono: os outros recebem _OwnerCancelled e refazem a busca
+        future.set_exception(_OwnerCancelled() if isinstance(e, asyncio.CancelledError) else e)
+        # Sem ninguém esperando, evita o aviso "exception was never retrieved"
+        future.exception()
+        raise
+    finally:
+        _inflight.pop(key, None)
+    future.set_result(response)
+
+    if cache_ttl > 0 and response.status_code == 200:
+        _remember(_cache, key, (time.monotonic() + cache_ttl, response))
+    return response
+
+
+@asynccontextmanager
+async def stream(url: str, *, headers: Dict[str, str] | None = None, timeout: float | None = None,
+                 api: str = "other") -> AsyncIterator[httpx.Response]:
+    # Corpo lido aos pedaços (response.aiter_bytes()); a latência inclui o download inteiro.
+    # Sem single-flight/cache: cada chamador consome o próprio corpo.
+    session, kwargs, stats, breaker = await _prepare(url, headers, timeout)
+    t0 = time.perf_counter()
+    try:
+        async with session.stream("GET", url, **kwargs) as response:
+            UPSTREAM_REQUESTS.inc(api=api, status=str(response.status_code))
+            if _is_failure(response):
+                breaker.failure()
+            else:
+                breaker.success()
+            if _recorder is not None:
+                # Gravando: precisa do corpo inteiro para o cassete
+                await response.aread()
+                _recorder(response)
+            yield response
+    except httpx.HTTPError:
+        stats["errors"] += 1
+        UPSTREAM_REQUESTS.inc(api=api, status="error")
+        breaker.failure()
+        raise
+    except BaseException:
+        breaker.abort()
+        raise
+    finally:
+        UPSTREAM_REQUEST_SECONDS.observe(time.perf_counter() - t0, api=api)
+
+
+def connection_stats() -> Dict[str, Dict]:
+    report = {}
+    for host, stats in _stats.items():
+        requests = stats["requests"]
+        reused = max(requests - stats["new_connections"], 0)
+        report[host] = {
+            **stats,
+            "reused": reused,
+            "reuse_ratio": round(reused / requests, 4) if requests else 0.0,
+            "http2": HTTP2_ENABLED and HTTP2_AVAILABLE,
+            "breaker": _breaker(host).as_dict(),
+        }
+    return report
+
+
+def cache_stats() -> Dict:
+    return {**_cache_stats, "entries": len(_cache), "validators": len(_validators), "inflight": len(_inflight)}
+
+
+async def close_clients() -> None:
+    for session in list(_clients.values()):
+        await session.aclose()
+    _clients.clear()
@@ -0,0 +1,52 @@
+import asyncio
+import os
+import signal
+import sys
+
+import replay
+import upstream
+from ingestion import Ingestion, MONGO_DB
+from leagues import league_rules_watcher
+from logs import get_logger
+from persistence import ensure_indexes
+
+log = get_logger("worker")
+
+# Processo só de ingestão: rode com `python worker.py` e a API com SCRAPER_MODE=off.
+# Vários workers podem subir juntos; o lease "scraper" deixa só um ativo, os outros ficam de reserva.
+MONGO_URI = os.getenv("MONGO_URI")
+
+
+async def run() -> int:
+    upstream_replay = replay.install()
+    client = replay.mongo_client(MONGO_URI)
+    ingestion = Ingestion(client[MONGO_DB])
+
+    try:
+        await ensure_indexes(ingestion.matches)
+    except Exception as e:
+        log.error("Erro ao criar índices: %s", e)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    tasks = [asyncio.create_task(ingestion.run()), asyncio.create_task(league_rules_watcher())]
+    log.info("🚀 Worker de ingestão iniciado (%s), aguardando lease", ingestion.lease.holder)
+    await stop.wait()
+
+    log.info("🛑 Worker encerrando...")
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    # Grava o que ficou no buffer e libera o lease para outro worker assumir na hora
+    await ingestion.close()
+    await upstream.close_clients()
+    if isinstance(upstream_replay, replay.Recorder):
+        upstream_replay.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run()))